@@ -0,0 +1,120 @@
+"""
+离线评测用嵌入模型.
+
+- HashEmbeddings: 字符 n-gram 哈希向量, 无需任何模型服务, 结果确定
+- CachedEmbeddings: 包装真实嵌入模型, 向量按文本哈希落盘;
+  offline 模式下只读缓存, 缺失即报错, 保证评测可在断网环境重放
+"""
+import hashlib
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class HashEmbeddings(Embeddings):
+    """字符 n-gram 特征哈希嵌入（中英文通用的词袋近似）"""
+
+    def __init__(self, dim: int = 512, ngram_range: tuple = (1, 3)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        normalized = "".join(text.lower().split())
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for start in range(len(normalized) - n + 1):
+                digest = hashlib.md5(normalized[start:start + n].encode("utf-8")).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vector[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """带磁盘缓存的嵌入模型包装"""
+
+    def __init__(
+        self,
+        cache_path: Path,
+        base: Optional[Embeddings] = None,
+        model_name: str = "",
+        offline: bool = False,
+    ):
+        """
+        Args:
+            cache_path: 缓存文件路径（JSON: {"model": ..., "vectors": {sha1: [...]}}）
+            base: 实际嵌入模型, offline 模式下可为 None
+            model_name: 模型名, 与缓存文件中的记录不一致时拒绝加载
+            offline: 仅使用缓存, 不调用 base
+        """
+        if base is None and not offline:
+            raise ValueError("非 offline 模式需要提供实际嵌入模型")
+        self.cache_path = Path(cache_path)
+        self.base = base
+        self.model_name = model_name
+        self.offline = offline
+        self.vectors: Dict[str, List[float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_path.exists():
+            return
+        data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        cached_model = data.get("model", "")
+        if self.model_name and cached_model and cached_model != self.model_name:
+            raise ValueError(
+                f"缓存模型不匹配: {cached_model} != {self.model_name} ({self.cache_path})"
+            )
+        self.model_name = self.model_name or cached_model
+        self.vectors = data.get("vectors", {})
+
+    def save(self) -> None:
+        """写回缓存（仅在有新增向量时）"""
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_path.write_text(
+            json.dumps({"model": self.model_name, "vectors": self.vectors}),
+            encoding="utf-8",
+        )
+        self._dirty = False
+
+    def _lookup(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self.vectors]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            if self.offline:
+                raise KeyError(
+                    f"offline 模式下缓存缺失 {len(missing)} 条向量: {self.cache_path}"
+                )
+            computed = self.base.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                self.vectors[keys[i]] = vector
+            self._dirty = True
+        return [self.vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._lookup(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._lookup([text])[0]
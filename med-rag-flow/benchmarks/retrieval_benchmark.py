@@ -0,0 +1,396 @@
+"""
+检索质量/延迟评测.
+
+按 (分块策略 × chunk_size × 索引类型) 组合分别建库, 用黄金问题集评测:
+recall@k、MRR、索引大小、建库耗时（分块/向量化/建索引）与检索延迟。
+
+黄金集为 JSONL, 每行一个问题::
+
+    {"question": "如何校准探头", "expected_section": "探头校准", "expected_source": "manual.md"}
+
+- expected_section: 期望命中的章节标题（与分块元数据中任一级标题匹配即可）
+- expected_source: 可选, 限定来源文件名
+
+用法::
+
+    # 完全离线（字符 n-gram 哈希嵌入）
+    python -m benchmarks.retrieval_benchmark --corpus ../data/output/markdown/test02 \\
+        --golden golden.jsonl
+
+    # 真实模型 + 向量缓存（首次联网生成, 之后 --offline 重放）
+    python -m benchmarks.retrieval_benchmark --corpus ... --golden golden.jsonl \\
+        --embedding ollama --embedding-cache cache/bge-m3.json
+    python -m benchmarks.retrieval_benchmark ... --embedding ollama \\
+        --embedding-cache cache/bge-m3.json --offline
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 添加项目根目录到系统路径
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from langchain.schema import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+from benchmarks.embeddings import CachedEmbeddings, HashEmbeddings
+from flows.embed_vectorstorage_flow import _dispatch_processor
+
+# 仅依赖文档结构、无需 LLM 的分块策略, 离线评测默认使用
+OFFLINE_CHUNKERS = ("header", "header_hybrid")
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+HEADER_KEY = re.compile(r"^[Hh][1-6]$")
+
+
+@dataclass
+class GoldenItem:
+    question: str
+    expected_section: str
+    expected_source: Optional[str] = None
+
+
+@dataclass
+class BenchmarkRow:
+    """单个配置的评测结果"""
+
+    chunker: str
+    chunk_size: int
+    index: str
+    chunks: int
+    chunk_s: float
+    embed_s: float
+    index_s: float
+    index_kb: float
+    recall: Dict[int, float] = field(default_factory=dict)
+    mrr: float = 0.0
+    search_p50_ms: float = 0.0
+    search_p95_ms: float = 0.0
+    query_embed_p50_ms: float = 0.0
+
+
+def load_golden(path: Path) -> List[GoldenItem]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if "question" not in data or "expected_section" not in data:
+                raise ValueError(f"{path}:{line_no} 缺少 question/expected_section")
+            items.append(GoldenItem(
+                question=data["question"],
+                expected_section=data["expected_section"],
+                expected_source=data.get("expected_source"),
+            ))
+    return items
+
+
+def load_corpus(path: Path) -> List[Document]:
+    """加载 Markdown 语料（与入库流程相同的元数据）"""
+    files = [path] if path.is_file() else sorted(
+        p for p in path.rglob("*") if p.suffix.lower() in (".md", ".markdown")
+    )
+    return [
+        Document(
+            page_content=file.read_text(encoding="utf-8"),
+            metadata={"source": str(file.resolve()), "filename": file.name},
+        )
+        for file in files
+    ]
+
+
+def _normalize(text: str) -> str:
+    return "".join(text.lower().split())
+
+
+def is_relevant(doc: Document, item: GoldenItem) -> bool:
+    """分块是否对应期望章节（标题匹配, 可选限定来源文件）"""
+    if item.expected_source:
+        source = doc.metadata.get("filename") or Path(doc.metadata.get("source", "")).name
+        if source != Path(item.expected_source).name:
+            return False
+    expected = _normalize(item.expected_section)
+    return any(
+        expected == _normalize(str(value))
+        for key, value in doc.metadata.items()
+        if HEADER_KEY.match(key)
+    )
+
+
+def build_index(index_type: str, vectors: np.ndarray, hnsw_m: int = 32):
+    """按类型构建 FAISS 索引（内积 + 归一化向量 = 余弦相似度）"""
+    faiss = dependable_faiss_import()
+    count, dim = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    elif index_type == "ivf":
+        nlist = max(1, min(int(math.sqrt(count)), count // 39 or 1))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = max(1, nlist // 4)
+    else:
+        raise ValueError(f"未知索引类型: {index_type}")
+    index.add(vectors)
+    return index
+
+
+def index_size_bytes(index) -> int:
+    return int(dependable_faiss_import().serialize_index(index).nbytes)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """最近秩百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _as_matrix(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    dependable_faiss_import().normalize_L2(matrix)
+    return matrix
+
+
+def evaluate(
+    store: FAISS,
+    golden: List[GoldenItem],
+    query_vectors: np.ndarray,
+    ks: Sequence[int],
+) -> Dict:
+    """逐条检索, 统计 recall@k / MRR / 检索延迟"""
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    latencies = []
+    for item, vector in zip(golden, query_vectors):
+        start = time.perf_counter()
+        results = store.similarity_search_with_score_by_vector(vector.tolist(), k=max_k)
+        latencies.append(time.perf_counter() - start)
+
+        rank = next(
+            (i + 1 for i, (doc, _) in enumerate(results) if is_relevant(doc, item)),
+            None,
+        )
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in ks:
+            if rank and rank <= k:
+                hits[k] += 1
+    total = len(golden) or 1
+    return {
+        "recall": {k: round(hits[k] / total, 4) for k in ks},
+        "mrr": round(sum(reciprocal_ranks) / total, 4),
+        "search_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "search_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+    }
+
+
+def run_benchmark(
+    corpus: List[Document],
+    golden: List[GoldenItem],
+    embeddings,
+    chunkers: Sequence[str],
+    chunk_sizes: Sequence[int],
+    index_types: Sequence[str],
+    ks: Sequence[int],
+) -> List[BenchmarkRow]:
+    rows: List[BenchmarkRow] = []
+
+    # 问题向量与分块配置无关, 只算一次; 逐条计时得到查询向量化延迟
+    query_embed_latencies = []
+    query_vectors = []
+    for item in golden:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(item.question))
+        query_embed_latencies.append(time.perf_counter() - start)
+    query_matrix = _as_matrix(query_vectors)
+    query_embed_p50_ms = round(percentile(query_embed_latencies, 50) * 1000, 3)
+
+    for chunker in chunkers:
+        for chunk_size in chunk_sizes:
+            start = time.perf_counter()
+            chunks = _dispatch_processor(
+                [Document(page_content=d.page_content, metadata=dict(d.metadata)) for d in corpus],
+                chunker,
+                {"chunk_size": chunk_size},
+            )
+            chunk_s = time.perf_counter() - start
+            if not chunks:
+                print(f"⚠️ {chunker}/{chunk_size} 分块结果为空, 跳过")
+                continue
+
+            start = time.perf_counter()
+            chunk_matrix = _as_matrix(
+                embeddings.embed_documents([c.page_content for c in chunks])
+            )
+            embed_s = time.perf_counter() - start
+
+            for index_type in index_types:
+                start = time.perf_counter()
+                index = build_index(index_type, chunk_matrix)
+                index_s = time.perf_counter() - start
+
+                ids = [str(i) for i in range(len(chunks))]
+                store = FAISS(
+                    embedding_function=embeddings,
+                    index=index,
+                    docstore=InMemoryDocstore(dict(zip(ids, chunks))),
+                    index_to_docstore_id=dict(enumerate(ids)),
+                    normalize_L2=True,
+                )
+                metrics = evaluate(store, golden, query_matrix, ks)
+                rows.append(BenchmarkRow(
+                    chunker=chunker,
+                    chunk_size=chunk_size,
+                    index=index_type,
+                    chunks=len(chunks),
+                    chunk_s=round(chunk_s, 3),
+                    embed_s=round(embed_s, 3),
+                    index_s=round(index_s, 4),
+                    index_kb=round(index_size_bytes(index) / 1024, 1),
+                    query_embed_p50_ms=query_embed_p50_ms,
+                    **metrics,
+                ))
+    return rows
+
+
+def format_table(rows: List[BenchmarkRow], ks: Sequence[int]) -> str:
+    headers = [
+        "chunker", "size", "index", "chunks", "chunk_s", "embed_s", "index_s",
+        "index_kb", *[f"R@{k}" for k in ks], "MRR", "p50_ms", "p95_ms",
+    ]
+    table = [
+        [
+            r.chunker, r.chunk_size, r.index, r.chunks, r.chunk_s, r.embed_s,
+            r.index_s, r.index_kb, *[r.recall[k] for k in ks], r.mrr,
+            r.search_p50_ms, r.search_p95_ms,
+        ]
+        for r in rows
+    ]
+    widths = [
+        max(len(str(h)), *(len(str(row[i])) for row in table)) if table else len(h)
+        for i, h in enumerate(headers)
+    ]
+    lines = ["  ".join(str(h).ljust(w) for h, w in zip(headers, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(str(v).ljust(w) for v, w in zip(row, widths)) for row in table)
+    return "\n".join(lines)
+
+
+def format_csv(rows: List[BenchmarkRow], ks: Sequence[int]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([
+        "chunker", "chunk_size", "index", "chunks", "chunk_s", "embed_s", "index_s",
+        "index_kb", *[f"recall@{k}" for k in ks], "mrr", "search_p50_ms",
+        "search_p95_ms", "query_embed_p50_ms",
+    ])
+    for r in rows:
+        writer.writerow([
+            r.chunker, r.chunk_size, r.index, r.chunks, r.chunk_s, r.embed_s,
+            r.index_s, r.index_kb, *[r.recall[k] for k in ks], r.mrr,
+            r.search_p50_ms, r.search_p95_ms, r.query_embed_p50_ms,
+        ])
+    return buffer.getvalue()
+
+
+def _build_embeddings(args):
+    if args.embedding == "hash":
+        return HashEmbeddings(dim=args.hash_dim)
+    if args.embedding_cache is None and args.offline:
+        raise SystemExit("--offline 需要配合 --embedding-cache 使用")
+    base = None
+    if not args.offline:
+        from langchain_ollama import OllamaEmbeddings
+        base = OllamaEmbeddings(model=args.model, base_url=args.base_url)
+    if args.embedding_cache is None:
+        return base
+    return CachedEmbeddings(
+        args.embedding_cache,
+        base=base,
+        model_name=args.model,
+        offline=args.offline,
+    )
+
+
+def _csv_list(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="检索质量/延迟评测")
+    parser.add_argument("--corpus", type=Path, required=True, help="Markdown 文件或目录")
+    parser.add_argument("--golden", type=Path, required=True, help="黄金问题集 JSONL")
+    parser.add_argument("--chunkers", default=",".join(OFFLINE_CHUNKERS))
+    parser.add_argument("--chunk-sizes", default="500,1000")
+    parser.add_argument("--index-types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--k", default="1,3,5,10", help="recall@k 的 k 值列表")
+    parser.add_argument("--embedding", choices=("hash", "ollama"), default="hash")
+    parser.add_argument("--hash-dim", type=int, default=512)
+    parser.add_argument("--model", default="bge-m3:latest")
+    parser.add_argument("--base-url", default="http://127.0.0.1:11434")
+    parser.add_argument("--embedding-cache", type=Path, help="向量缓存文件（JSON）")
+    parser.add_argument("--offline", action="store_true", help="只读向量缓存")
+    parser.add_argument("--format", choices=("table", "csv", "json"), default="table")
+    parser.add_argument("--output", type=Path, help="结果写入文件（默认输出到终端）")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    corpus = load_corpus(args.corpus)
+    if not golden or not corpus:
+        print("❌ 黄金集或语料为空")
+        return 1
+    ks = sorted({int(k) for k in _csv_list(args.k)})
+    embeddings = _build_embeddings(args)
+
+    try:
+        rows = run_benchmark(
+            corpus=corpus,
+            golden=golden,
+            embeddings=embeddings,
+            chunkers=_csv_list(args.chunkers),
+            chunk_sizes=[int(s) for s in _csv_list(args.chunk_sizes)],
+            index_types=_csv_list(args.index_types),
+            ks=ks,
+        )
+    finally:
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.save()
+            print(f"向量缓存: 命中 {embeddings.hits} / 未命中 {embeddings.misses}")
+
+    if args.format == "json":
+        report = json.dumps([asdict(r) for r in rows], indent=2, ensure_ascii=False)
+    elif args.format == "csv":
+        report = format_csv(rows, ks)
+    else:
+        report = format_table(rows, ks)
+
+    print(f"语料 {len(corpus)} 个文件 | 问题 {len(golden)} 条 | 嵌入 {args.embedding}")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report, encoding="utf-8")
+        print(f"✅ 结果已写入: {args.output}")
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,13 +14,17 @@ from pathlib import Path
 from datetime import datetime
 import re
 import shutil
-from typing import Dict
+import time
+from typing import Any, Dict, List, Optional, Tuple
 import sys
 
 # ------------------------ 第三方库导入 ------------------------
 import requests
 from prefect import flow, get_run_logger
-from prefect.task_runners import ConcurrentTaskRunner
+from prefect.task_runners import ThreadPoolTaskRunner
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import contextvars
+import multiprocessing
 # ------------------------ 编码强制设置 ------------------------
 import sys
 import os
@@ -40,9 +44,26 @@ sys.path.append(str(src_dir))
 
 from utils.str_utils import optimize_str
 from tasks.doc_task.base_task import *
-from tasks.doc_task.process_pdf_task import process_pdf_file
+from tasks.doc_task.process_pdf_task import (
+    process_pdf_file, init_pdf_worker, run_process_pdf_file,
+    DEFAULT_SHARD_PAGES, DEFAULT_SHARD_WORKERS
+)
+from tasks.doc_task.extraction_cache import file_sha256
+from tasks.doc_task.image_store import IMAGE_STORE_DIRNAME, ImageStore
+from tasks.doc_task.mineru_workers import get_worker_pool
+from tasks.doc_task.ingest_report import build_ingestion_report, write_ingestion_report
+from tasks.doc_task.checkpoint import (
+    CHECKPOINT_DIRNAME, ProcessingCheckpoint, resume_full_rebuild, validate_force_stages
+)
+from tasks.doc_task.scheduler import (
+    DEFAULT_SCHEDULE_POLICY, ProgressTracker, read_page_count, schedule_order, validate_schedule_policy
+)
+from utils.timing import StageTimer
+from tasks.doc_task.kb_state import (
+    KB_STATE_FILENAME, KBState, embedding_signature, group_chunks_by_source
+)
 from utils.file_utils import ensure_directory
-from flows.embed_vectorstorage_flow import process_and_store_directory
+from flows.embed_vectorstorage_flow import process_and_store_directory, update_store_incrementally
 from flows.test_flow import my_flow
 
 # ------------------------ 全局配置 ------------------------
@@ -50,6 +71,7 @@ DEFAULT_INPUT_DIR = Path("data/raw/pdf")       # 默认PDF输入目录
 DEFAULT_OUTPUT_DIR = Path("data/processed")    # 中间文件输出目录
 FINAL_OUTPUT_DIR = Path("data/output/markdown")# 最终Markdown存储目录
 MAX_CONCURRENCY = 4                            # 最大并发任务数（根据CPU核心数调整）
+EXECUTION_MODE = "thread"                      # 并行模式: thread（Prefect线程池）/ process（进程池）/ pool（常驻模型进程池）
 SAFE_MODE = True                               # 安全模式开关（防止误删文件）
 
 
@@ -68,7 +90,21 @@ def pdf_to_markdown(
     output_root: str,
     final_output_dir: str,
     kb_id: int,
-    image_path: str
+    image_path: str,
+    generate_questions: bool = False,
+    max_concurrency: int = MAX_CONCURRENCY,
+    execution_mode: str = EXECUTION_MODE,
+    shard_pages: int = DEFAULT_SHARD_PAGES,
+    shard_workers: int = DEFAULT_SHARD_WORKERS,
+    cache_root: str = "",
+    visualize: bool = False,
+    incremental: bool = True,
+    image_store_root: str = "",
+    pool_options: Optional[Dict] = None,
+    resume: bool = True,
+    force_stages: Optional[List[str]] = None,
+    schedule_policy: str = DEFAULT_SCHEDULE_POLICY,
+    priorities: Optional[Dict[str, int]] = None
 ) -> Dict:
     """
     PDF文档处理全流程控制器
@@ -84,6 +120,29 @@ def pdf_to_markdown(
         input_dir: PDF源文件根目录（支持嵌套子目录）
         output_root: 中间文件输出根目录
         final_output_dir: 最终Markdown存储路径
+        generate_questions: 是否构建假设问题索引（入库时为每个分块生成问题）
+        max_concurrency: 并行处理的PDF数量
+        execution_mode: 并行模式，thread（Prefect线程池）、process（进程池，适合CPU推理）
+            或 pool（常驻进程池，模型每个进程只加载一次，跨多次触发复用）
+        shard_pages: 超大PDF分片页数（0 表示不分片）
+        shard_workers: 单个PDF的分片并行进程数
+        cache_root: 缓存根目录（MinerU解析结果 / 假设问题），默认为 output_root 同级的 .cache，
+            不随每次触发清理，未变化的PDF直接复用解析结果
+        visualize: 是否生成 MinerU 模型/版面可视化PDF（调试用，默认关闭）
+        incremental: 是否增量处理。按 output_root/kb_state.json 与当前PDF对账，只处理新增/变化的
+            文件并移除已删除文件的分块；首次运行、状态或上一版本存储缺失、嵌入参数变化时自动全量重建
+        image_store_root: 内容寻址图片存储目录，默认为 output_root/.image_store（不对外提供访问，
+            全量重建时随 output_root 清空，增量处理后删除不再被引用的对象；与静态目录位于
+            同一文件系统时发布可直接硬链接）。自定义目录不能在知识库之间共享
+        pool_options: pool 模式的 worker 参数（torch_threads / max_rss_mb / max_jobs_per_worker /
+            job_timeout / heartbeat_interval / warmup），worker 数为 max_concurrency
+        resume: 上次运行未完成（output_root/.checkpoints/run.json 仍在）时不清理目录，
+            每个文件从最后完成的阶段（extraction / markdown）继续
+        force_stages: 强制重跑的阶段: extraction（同时刷新解析缓存）/ markdown 对全部PDF生效，
+            其后阶段一并重跑；embedding 表示全量重新嵌入
+        schedule_policy: 文件处理顺序: sjf（页数少的优先）/ largest_first（页数多的优先）/
+            priority（按 priorities，同优先级内页数少的优先）/ name（按文件名）
+        priorities: {相对路径或通配符: 优先级}，数值越大越先处理
 
     返回:
         包含处理元数据的字典:
@@ -94,125 +153,243 @@ def pdf_to_markdown(
             "start_time": ISO格式开始时间,
             "duration": 总耗时(秒),
             "output_dir": 输出目录路径,
-            "error_logs": [错误信息列表]
+            "error_logs": [错误信息列表],
+            "performance": 性能报告摘要（完整报告写入 output_root/reports/ingest_*.json）
         }
     """
     logger = get_run_logger()
+    flow_start = time.perf_counter()
+    flow_timer = StageTimer()
     
     try:
-        # ====================== 前置清理阶段 ======================
-        logger.info("🧹 初始化目录清理...")
-        dirs_to_clean = [
-            Path(output_root),
-            Path(final_output_dir),
-            Path(image_path)
-        ]
-        
-        for dir_path in dirs_to_clean:
-            if dir_path.exists():
-                logger.warning(f"⚠️ 正在强制清理目录: {dir_path}")
-                shutil.rmtree(dir_path, ignore_errors=False)
-                dir_path.mkdir(parents=True, exist_ok=True)
-                logger.debug(f"✅ 已重建目录: {dir_path}")
-            else:
-                logger.debug(f"⏩ 目录不存在无需清理: {dir_path}")
+        # 缓存目录位于清理范围之外，跨次触发（以及跨知识库）复用
+        cache_path = Path(cache_root) if cache_root else Path(output_root).parent / ".cache"
+        extraction_cache_dir = cache_path / "extraction"
+
+        # 配置向量存储参数（模型与分块参数签名变化时必须全量重建）
+        embed_config = {
+            "models": {
+                "name": "bge-m3:latest",
+                "base_url": "http://127.0.0.1:11434"
+            },
+            "vector_store": {
+                "base_path": "../../server/med_rag_server/vectorstorage",
+                "naming_template": f"kb_{kb_id}_" + "{model_hash}_{doc_hash}"
+            }
+        }
+        processor_type = "header_parent_child"
+        processor_params = {
+            "child_chunk_size": 400,   # 子段落：向量匹配粒度
+            "parent_chunk_size": 3000  # 父段落：回答时的上下文粒度
+        }
+        question_params = {
+            "model": "deepseek-r1:8b",
+            "num_questions": 3,
+            "max_workers": MAX_CONCURRENCY,
+            "cache_dir": str(cache_path / "questions"),
+        } if generate_questions else None
+        signature = embedding_signature(embed_config["models"]["name"], processor_type, processor_params)
 
         # ====================== 阶段0：路径预处理 ======================
         logger.debug("🔄 正在规范化路径结构...")
         input_path, output_path = convert_paths(input_dir, output_root)
         final_output_path = Path(final_output_dir).resolve()
+        image_store_path = Path(image_store_root) if image_store_root else output_path / IMAGE_STORE_DIRNAME
         
         # ====================== 阶段0_1：目录验证 ======================
         logger.info("🔍 执行目录完整性检查...")
         validated_dir = validate_input_dir(input_path)
-        ensure_directory(output_path)
-        ensure_directory(final_output_path)
         
-        # ====================== 阶段3：文件收集 ======================
+        # ====================== 阶段1：文件收集与对账 ======================
         logger.debug("📂 扫描目录结构...")
         # subdirs = get_subdirectories(validated_dir)
         subdirs = [validated_dir]
-        pdf_files = collect_all_pdf_files(subdirs)
-        logger.info(f"✅ 发现 {len(pdf_files)} 个待处理文件")
+        with flow_timer.stage("scan"):
+            pdf_files = collect_all_pdf_files(subdirs)
+            pdf_hashes = {
+                pdf.relative_to(validated_dir).as_posix(): file_sha256(pdf)
+                for group in pdf_files for pdf in group["files"]
+            }
+        logger.info(f"✅ 发现 {len(pdf_hashes)} 个PDF文件")
+
+        force = validate_force_stages(force_stages)
+        validate_schedule_policy(schedule_policy)
+        checkpoint = ProcessingCheckpoint(output_path / CHECKPOINT_DIRNAME)
+        resume_run = checkpoint.load_run() if resume else None
+        if resume_run:
+            logger.info(f"♻️ 检测到未完成的运行（开始于 {resume_run.get('started_at')}），从检查点恢复")
+
+        state = KBState(output_path / KB_STATE_FILENAME)
+        previous_store = state.vector_store or {}
+        full_rebuild = not (
+            incremental
+            and state.documents
+            and previous_store.get("name")
+            and previous_store.get("signature") == signature
+            and (Path(embed_config["vector_store"]["base_path"]) / previous_store["name"]).exists()
+        )
+        # 中断前的运行可能已改写状态与向量库，恢复时不能重新判定模式
+        full_rebuild = resume_full_rebuild(resume_run, full_rebuild)
+
+        # ====================== 阶段2：清理 ======================
+        if full_rebuild and resume_run:
+            logger.info("⏭️ 全量重建恢复中，跳过目录清理")
+            state.reset()
+            changes = state.reconcile(pdf_hashes)
+            removed_ids = {"chunk_ids": [], "parent_ids": []}
+            stale_images = set()
+        elif full_rebuild:
+            logger.info("🧹 全量重建，初始化目录清理...")
+            for dir_path in [output_path, final_output_path, Path(image_path)]:
+                if dir_path.exists():
+                    logger.warning(f"⚠️ 正在强制清理目录: {dir_path}")
+                    shutil.rmtree(dir_path, ignore_errors=False)
+                    dir_path.mkdir(parents=True, exist_ok=True)
+                    logger.debug(f"✅ 已重建目录: {dir_path}")
+                else:
+                    logger.debug(f"⏩ 目录不存在无需清理: {dir_path}")
+            state.reset()
+            changes = state.reconcile(pdf_hashes)
+            removed_ids = {"chunk_ids": [], "parent_ids": []}
+            stale_images = set()
+        else:
+            changes = state.reconcile(pdf_hashes)
+            if force & {"extraction", "markdown"}:
+                changes.force_reprocess()
+            removed_ids = state.removed_ids(changes.to_remove)
+            stale_images = {
+                name for rel_path in changes.to_remove
+                for name in state.documents[rel_path].get("images", [])
+            }
+            logger.info(f"🔁 增量处理 ➔ {changes.summary()}")
+            for rel_path in changes.to_remove:
+                # 已写入检查点的文件输出已是新版本（上次中断前生成），不能删除
+                if resume_run and checkpoint.has_file(rel_path, pdf_hashes.get(rel_path)):
+                    continue
+                remove_document_outputs(state.documents[rel_path], Path(image_path))
+        ensure_directory(output_path)
+        ensure_directory(final_output_path)
+        ensure_directory(Path(image_path))
+        if not resume_run:
+            checkpoint.start_run({"kb_id": kb_id, "full_rebuild": full_rebuild, "force_stages": sorted(force)})
+
+        to_process = set(changes.to_process)
+        pdf_files = [
+            {**group, "files": [pdf for pdf in group["files"]
+                                if pdf.relative_to(validated_dir).as_posix() in to_process]}
+            for group in pdf_files
+        ]
+        for group in pdf_files:
+            group["count"] = len(group["files"])
+        logger.info(f"✅ 待处理 {len(to_process)} 个文件")
         
         # ====================== 阶段4：并行处理 ======================
         logger.info("🚀 启动文档处理引擎...")
-        processing_results = mineru_process_pdf_flow(
-            pdf_files, 
-            validated_dir, 
-            output_path,
-            final_output_path
-        )
+        with flow_timer.stage("processing"):
+            processing_results = mineru_process_pdf_flow(
+                pdf_files, 
+                validated_dir, 
+                output_path,
+                final_output_path,
+                max_concurrency=max_concurrency,
+                execution_mode=execution_mode,
+                shard_pages=shard_pages,
+                shard_workers=shard_workers,
+                cache_dir=str(extraction_cache_dir),
+                visualize=visualize,
+                image_base_url=f'http://127.0.0.1:9090/static/images/{kb_id}',
+                publish_dir=str(Path(image_path).resolve()),
+                image_store_root=str(image_store_path.resolve()),
+                pool_options=pool_options,
+                checkpoint_dir=str(checkpoint.dir),
+                pdf_hashes=pdf_hashes,
+                force_stages=sorted(force),
+                schedule_policy=schedule_policy,
+                priorities=priorities,
+                progress_url=f"http://localhost:9090/api/knowledge-bases/{kb_id}/processing-progress"
+            )
         
         # ====================== 阶段5：结果分析 ======================
         logger.info("📊 生成处理报告...")
         result_stats = analyze_results(processing_results)
+        result_stats["incremental"] = {
+            "mode": "full" if full_rebuild else "incremental",
+            "added": len(changes.added),
+            "changed": len(changes.changed),
+            "deleted": len(changes.deleted),
+            "unchanged": len(changes.unchanged),
+        }
+
+        processed_docs = [
+            item for group in processing_results for item in group["processed_files"]
+        ]
+        failed_docs = [
+            Path(item["file"]).relative_to(validated_dir).as_posix()
+            for group in processing_results for item in group["failed_files"]
+        ]
         
         # ====================== 阶段6：资源清理 ======================
         if not SAFE_MODE:
             logger.warning("⚠️ 安全模式已关闭，执行清理操作")
             perform_cleanup(output_path)
             
-        # ====================== 阶段7：复制图片目录到服务器 ======================
-        logger.info("🖼️ 开始复制图片目录到服务器...")
-        image_subdirs = get_subdirectories(validate_input_dir(output_root))
-        copied_dirs = []
-        error_logs = []
-
-        # 确保目标目录存在
-        ensure_directory(Path(image_path))
-
-        for src_dir in image_subdirs:
-            dest_dir = Path(image_path) / src_dir.name
-            try:
-                # 覆盖式复制目录（需要Python 3.8+）
-                shutil.copytree(
-                    src_dir, 
-                    dest_dir,
-                    dirs_exist_ok=True
-                )
-                copied_dirs.append(str(dest_dir))
-                logger.debug(f"✅ 成功复制目录: {src_dir.name} -> {dest_dir}")
-            except Exception as e:
-                error_msg = f"目录复制失败 [{src_dir.name}]: {str(e)}"
-                error_logs.append(error_msg)
-                logger.error(error_msg, exc_info=True)
-
-        logger.info(f"📦 完成目录复制：{len(copied_dirs)}成功 / {len(error_logs)}失败")
-        
-        image_base_url = f'http://127.0.0.1:9090/static/images/{kb_id}'
-        for md_file in final_output_path.rglob('*.md'):
-            try:
-                replace_image_paths(md_file,image_base_url)
-            except Exception as e:
-                logger.error(f"文件处理失败 [{md_file.name}]: {str(e)}", exc_info=True)
-      
         # ====================== 阶段8：分块文档并得到嵌入数据库 ======================
         logger.info("🧠 启动知识库嵌入流程...")
+        vector_manager = None
+        embedding_start = time.perf_counter()
         try:
-            # 配置向量存储参数
-            embed_config = {
-                "models": {
-                    "name": "bge-m3:latest",
-                    "base_url": "http://127.0.0.1:11434"
-                },
-                "vector_store": {
-                    "base_path": "../../server/med_rag_server/vectorstorage",
-                    "naming_template": f"kb_{kb_id}_" + "{model_hash}_{doc_hash}"
-                }
-            }
+            if not full_rebuild and "embedding" not in force:
+                vector_manager = update_store_incrementally(
+                    previous_store["name"],
+                    embed_config,
+                    [Path(item["markdown_result"]["markdown_path"]) for item in processed_docs],
+                    removed_ids["chunk_ids"],
+                    removed_ids["parent_ids"],
+                    processor_type=processor_type,
+                    processor_params=processor_params,
+                    question_params=question_params
+                )
+                if vector_manager is None:
+                    logger.warning("⚠️ 上一版本向量存储不可用，回退为全量嵌入")
+
+            if vector_manager is None:
+                # 执行嵌入流程
+                vector_manager = process_and_store_directory(
+                    content_source=final_output_path,
+                    config=embed_config,
+                    processor_type=processor_type,
+                    processor_params=processor_params,
+                    question_params=question_params,
+                    recursive=True
+                )
 
-            # 执行嵌入流程
-            vector_manager = process_and_store_directory(
-                content_source=final_output_path,
-                config=embed_config,
-                processor_type="header_hybrid",
-                processor_params={
-                    "chunk_size": 1500,
-                    "semantic_threshold": 0.85
-                },
-                recursive=True
-            )
+            flow_timer.add("embedding", time.perf_counter() - embedding_start)
+
+            # 记录处理状态，下次触发只处理变化的文档
+            if vector_manager and vector_manager.is_ready:
+                for item in processed_docs:
+                    rel_path = Path(item["file"]).relative_to(validated_dir).as_posix()
+                    state.set_document(rel_path, pdf_hashes[rel_path], {
+                        "markdown_path": str(Path(item["markdown_result"]["markdown_path"]).resolve()),
+                        "image_dir": item["working_files"]["image_dir"],
+                        "images": item["markdown_result"].get("published_images", []),
+                    })
+                for rel_path in changes.deleted + failed_docs:
+                    state.remove_document(rel_path)
+                state.attach_chunks(group_chunks_by_source(vector_manager.docs))
+                state.set_vector_store(vector_manager.vector_store_path_name, signature)
+                state.save()
+                checkpoint.finish_run()
+                # 已发布的图片可能被其他文档共用，只删除不再被引用的
+                referenced = {
+                    name for entry in state.documents.values() for name in entry.get("images", [])
+                }
+                for name in stale_images - referenced:
+                    (Path(image_path) / name).unlink(missing_ok=True)
+                pruned = ImageStore(image_store_path).prune(referenced)
+                if pruned:
+                    logger.info(f"🧹 图片存储清理 {pruned} 个未引用对象")
+                logger.info(f"🗂️ 知识库状态已更新 ➔ {changes.summary()} | 失败 {len(failed_docs)}")
 
             # 结果处理与状态更新
             if vector_manager and vector_manager.is_ready:
@@ -280,74 +457,71 @@ def pdf_to_markdown(
         finally:
             # 最终资源清理（可选）
             pass
-        
+
+        # ====================== 阶段9：性能报告 ======================
+        report = build_ingestion_report(
+            processing_results,
+            flow_timer,
+            time.perf_counter() - flow_start,
+            embedding_timings=vector_manager.timer.durations if vector_manager else None
+        )
+        report_path = write_ingestion_report(report, output_path / "reports")
+        result_stats["performance"] = {
+            **{key: value for key, value in report.items() if key != "per_file"},
+            "report_path": str(report_path)
+        }
+        logger.info(
+            f"⏱️ 入库性能 ➔ {report['pages']} 页 / {report['wall_seconds']:.1f}s "
+            f"({report['pages_per_sec']} 页/秒) | VLM调用 {report['vlm']['calls']} 次 "
+            f"(缓存命中 {report['vlm']['cache_hits']}) | 解析缓存命中 {report['extraction_cache_hits']} | "
+            f"峰值内存 {report['peak_rss_mb']} | 报告: {report_path}"
+        )
+        return result_stats
         
     except Exception as e:
         logger.critical(f"‼️ 关键系统故障: {type(e).__name__}", exc_info=True)
         raise RuntimeError("批处理流程异常终止") from e
 
-@task
-def replace_image_paths(md_file: Path, replace_path: str) -> bool:
-    """
-    安全替换单个Markdown文件的图片路径
-    :param md_file: Markdown文件路径
-    :param replace_path: 替换的基础URL
-    :return: 是否成功替换
-    """
+def remove_document_outputs(entry: Dict, image_root: Path) -> None:
+    """删除变化/删除文档的旧输出（Markdown、中间图片目录及服务器图片目录）"""
     logger = get_run_logger()
-    
-    try:
-        # 读取文件内容
-        with open(md_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        modified = False
-        new_lines = []
-        
-        for line in content.split('\n'):
-            # 仅处理包含图片的行
-            if line.startswith('![') and 'images_' in line:
-                # 定位关键分隔符
-                bracket_pos = line.find('](')
-                images_pos = line.find('images_')
-                
-                if bracket_pos != -1 and images_pos > bracket_pos:
-                    # 提取图片描述和文件名
-                    desc_part = line[:bracket_pos+2]
-                    file_part = line[images_pos:]
-                    
-                    # 构建新路径（确保URL格式正确）
-                    new_url = f"{replace_path.rstrip('/')}/{file_part}"
-                    new_line = f"{desc_part}{new_url}"
-                    
-                    new_lines.append(new_line)
-                    modified = True
-                    logger.debug(f"替换成功 | 文件: {md_file.name}")
-                    continue
-            
-            new_lines.append(line)
-        
-        # 写回修改内容
-        if modified:
-            with open(md_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(new_lines))
-            return True
-        return False
-        
-    except Exception as e:
-        logger.error(f"文件处理失败 [{md_file.name}]: {str(e)}", exc_info=True)
-        return False
+    markdown_path = entry.get("markdown_path")
+    if markdown_path:
+        Path(markdown_path).unlink(missing_ok=True)
+    image_dir = entry.get("image_dir")
+    if image_dir:
+        for dir_path in (Path(image_dir), image_root / Path(image_dir).name):
+            if dir_path.exists():
+                shutil.rmtree(dir_path, ignore_errors=True)
+    logger.debug(f"🗑️ 已清理旧输出: {markdown_path}")
 
 
 # ------------------------ MinerU 处理PDF的流程 ------------------------
-@flow(name="mineru_process_pdf_flow")
+# 任务运行器不设上限：文件内部的嵌套任务也提交到这里，文件级并发由各执行模式单独限制
+@flow(name="mineru_process_pdf_flow", task_runner=ThreadPoolTaskRunner())
 def mineru_process_pdf_flow(
     pdf_file_groups: List[Dict[str, Any]], 
     input_dir: Path, 
     output_root: Path,
-    final_output_path: Path
+    final_output_path: Path,
+    max_concurrency: int = MAX_CONCURRENCY,
+    execution_mode: str = EXECUTION_MODE,
+    shard_pages: int = DEFAULT_SHARD_PAGES,
+    shard_workers: int = DEFAULT_SHARD_WORKERS,
+    cache_dir: Optional[str] = None,
+    visualize: bool = False,
+    image_base_url: str = "",
+    publish_dir: str = "",
+    image_store_root: str = "",
+    pool_options: Optional[Dict] = None,
+    checkpoint_dir: str = "",
+    pdf_hashes: Optional[Dict[str, str]] = None,
+    force_stages: Optional[List[str]] = None,
+    schedule_policy: str = DEFAULT_SCHEDULE_POLICY,
+    priorities: Optional[Dict[str, int]] = None,
+    progress_url: str = ""
 ) -> List[Dict]:
-    """批量文件处理任务（结构化版本）
+    """批量文件处理任务（结构化版本，文件级并行）
     
     参数:
         pdf_file_groups: 结构化PDF文件列表，每个元素包含:
@@ -358,6 +532,24 @@ def mineru_process_pdf_flow(
         input_dir: 输入根目录
         output_root: 中间输出根目录
         final_output_path: 最终输出根目录
+        max_concurrency: 最大并行文件数
+        execution_mode: thread - 线程池（作为 flow 的子任务运行，嵌套任务使用 flow 的任务运行器）;
+                        process - 使用进程池，每个进程限制 CPU 线程数;
+                        pool - 使用常驻 MinerU worker 池（模型预加载，跨触发复用）
+        shard_pages: 页数超过该值的PDF按页段拆分并行解析（0 表示不分片）
+        shard_workers: 单个PDF的分片并行进程数
+        cache_dir: MinerU解析结果缓存目录（None 表示不使用缓存）
+        visualize: 是否生成可视化PDF
+        image_base_url: 图片访问基础URL，生成Markdown时直接写入最终地址
+        publish_dir: 图片发布目录（服务器静态目录）
+        image_store_root: 内容寻址图片存储目录（位于静态目录之外）
+        pool_options: pool 模式的 worker 参数
+        checkpoint_dir: 检查点目录（为空时不使用检查点）
+        pdf_hashes: {相对路径: 内容sha256}，检查点按此判断文件是否变化
+        force_stages: 强制重跑的文件阶段
+        schedule_policy: 调度策略（sjf / largest_first / priority / name）
+        priorities: priority 策略的 {相对路径或通配符: 优先级}
+        progress_url: 进度上报地址（为空时只记录日志），包含每个文件的状态与预计完成秒数
         
     返回:
         处理结果列表，每个元素包含:
@@ -370,35 +562,93 @@ def mineru_process_pdf_flow(
             }
     """
     logger = get_run_logger()
+    if execution_mode not in ("thread", "process", "pool"):
+        raise ValueError(f"未知并行模式: {execution_mode}")
+
     try:
+        # 一次性展开所有文件，全部提交后再统一收集结果
+        jobs = []
+        for group_idx, group in enumerate(pdf_file_groups):
+            relative_path = group["path"].relative_to(input_dir)
+            for pdf in group["files"]:
+                jobs.append((group_idx, pdf, {
+                    "pdf_file": pdf,
+                    "input_dir": input_dir,
+                    "output_root": output_root,
+                    "final_output_dir": final_output_path / relative_path,
+                    "shard_pages": shard_pages,
+                    "shard_workers": shard_workers,
+                    "cache_dir": cache_dir,
+                    "visualize": visualize,
+                    "image_base_url": image_base_url,
+                    "publish_dir": publish_dir,
+                    "image_store_root": image_store_root,
+                    "checkpoint": {
+                        "dir": checkpoint_dir,
+                        "key": pdf.relative_to(input_dir).as_posix(),
+                        "sha256": (pdf_hashes or {}).get(pdf.relative_to(input_dir).as_posix()),
+                        "force": list(force_stages or [])
+                    } if checkpoint_dir else None
+                }))
+
+        # 各执行模式都按提交顺序领取作业，先读页数再按策略排序
+        page_counts = {pdf.relative_to(input_dir).as_posix(): read_page_count(pdf) for _, pdf, _ in jobs}
+        order = schedule_order(page_counts, schedule_policy, priorities)
+        position = {name: index for index, name in enumerate(order)}
+        jobs.sort(key=lambda job: position[job[1].relative_to(input_dir).as_posix()])
+        tracker = ProgressTracker(
+            [(name, page_counts[name]) for name in order],
+            max_concurrency,
+            policy=schedule_policy,
+            publish=_progress_publisher(progress_url) if progress_url else None
+        )
+        logger.info(
+            f"🚀 并行处理 {len(jobs)} 个文件 ({sum(page_counts.values())} 页) | 模式: {execution_mode} | "
+            f"并发: {max_concurrency} | 调度: {schedule_policy}"
+        )
+        if jobs:
+            logger.debug("📋 处理顺序: " + ", ".join(f"{name}({page_counts[name]}页)" for name in order))
+
+        tracker.start()
+        if execution_mode == "pool":
+            outcomes = _run_jobs_in_pool(jobs, max_concurrency, pool_options or {}, tracker, input_dir)
+        elif execution_mode == "process":
+            outcomes = _run_jobs_in_processes(jobs, max_concurrency, tracker, input_dir)
+        else:
+            outcomes = _run_jobs_in_threads(jobs, max_concurrency, tracker, input_dir)
+        tracker.maybe_publish(force=True)
+
+        cache_hits = sum(
+            1 for _, _, result, error in outcomes
+            if error is None and result.get("working_files", {}).get("cache_hit")
+        )
+        logger.info(f"♻️ 解析缓存命中 {cache_hits}/{len(jobs)} | 实际解析 {len(jobs) - cache_hits} 个文件")
+        resumed = sum(
+            1 for _, _, result, error in outcomes
+            if error is None and result.get("resumed_from")
+        )
+        if resumed:
+            logger.info(f"⏭️ 从检查点恢复 {resumed}/{len(jobs)} 个文件")
+
         results = []
-        for group in pdf_file_groups:
+        for group_idx, group in enumerate(pdf_file_groups):
             original_subdir = group["path"]
-            files = group["files"]
-            
-            # 计算对应的输出子目录路径
             relative_path = original_subdir.relative_to(input_dir)
             output_subdir = output_root / relative_path
             final_output_subdir = final_output_path / relative_path
             
             processed = []
             failed = []
-            
-            for pdf in files:
-                try:
-                    result = process_pdf_file.submit(
-                        pdf_file=pdf,
-                        input_dir=input_dir,
-                        output_root=output_root,
-                        final_output_dir=final_output_subdir
-                    ).result()
+            for job_group, pdf, result, error in outcomes:
+                if job_group != group_idx:
+                    continue
+                if error is not None:
+                    logger.warning(f"文件处理失败: {pdf} - {error}")
+                    failed.append({"file": pdf, "error": error})
+                elif result.get("status") == "failed":
+                    failed.append({"file": pdf, "error": result.get("error", "unknown")})
+                else:
                     processed.append(result)
-                except Exception as e:
-                    logger.warning(f"文件处理失败: {pdf} - {str(e)}")
-                    failed.append({
-                        "file": pdf,
-                        "error": str(e)
-                    })
             
             results.append({
                 "original_path": original_subdir,
@@ -421,6 +671,107 @@ def mineru_process_pdf_flow(
         raise
 
 
+def _progress_publisher(progress_url: str):
+    """进度快照上报服务器，失败只记录日志，不影响处理"""
+    logger = get_run_logger()
+
+    def publish(snapshot: Dict) -> None:
+        try:
+            response = requests.put(progress_url, json=snapshot, timeout=5)
+            if response.status_code != 200:
+                logger.warning(f"进度上报失败: {response.text}")
+        except Exception as e:
+            logger.warning(f"进度上报异常: {str(e)}")
+    return publish
+
+
+def _record_outcome(
+    tracker: ProgressTracker, input_dir: Path, pdf: Path, result: Optional[Dict], error: Optional[str]
+) -> None:
+    """更新进度；解析缓存命中、检查点恢复的文件不计入吞吐"""
+    success = error is None and result.get("status") != "failed"
+    measured = success and not (
+        result.get("working_files", {}).get("cache_hit") or result.get("resumed_from")
+    )
+    tracker.complete(pdf.relative_to(input_dir).as_posix(), success, measured=measured)
+
+
+def _run_jobs_in_threads(
+    jobs: List[Tuple], max_workers: int, tracker: ProgressTracker, input_dir: Path
+) -> List[Tuple]:
+    """
+    线程模式：独立线程池限制同时处理的文件数（按提交顺序领取）
+
+    每个作业在复制的 flow 上下文中直接调用 process_pdf_file，作为 flow 的子任务运行；
+    文件内部的嵌套任务提交到 flow 的无界任务运行器，不会与文件作业争抢线程而死锁。
+    """
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="pdf-file") as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, process_pdf_file, **kwargs): (group_idx, pdf)
+            for group_idx, pdf, kwargs in jobs
+        }
+        for future in as_completed(futures):
+            group_idx, pdf = futures[future]
+            try:
+                outcome = (group_idx, pdf, future.result(), None)
+            except Exception as e:
+                outcome = (group_idx, pdf, None, str(e))
+            outcomes.append(outcome)
+            _record_outcome(tracker, input_dir, *outcome[1:])
+    return outcomes
+
+
+def _run_jobs_in_processes(
+    jobs: List[Tuple], max_workers: int, tracker: ProgressTracker, input_dir: Path
+) -> List[Tuple]:
+    """进程池模式：spawn 启动，按 CPU 核数平均分配每个进程的计算线程"""
+    torch_threads = max(1, (os.cpu_count() or 1) // max(1, max_workers))
+    outcomes = []
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_pdf_worker,
+        initargs=(torch_threads,)
+    ) as executor:
+        futures = {
+            executor.submit(run_process_pdf_file, kwargs): (group_idx, pdf)
+            for group_idx, pdf, kwargs in jobs
+        }
+        for future in as_completed(futures):
+            group_idx, pdf = futures[future]
+            try:
+                outcome = (group_idx, pdf, future.result(), None)
+            except Exception as e:
+                outcome = (group_idx, pdf, None, f"{type(e).__name__}: {str(e)}")
+            outcomes.append(outcome)
+            _record_outcome(tracker, input_dir, *outcome[1:])
+    return outcomes
+
+
+def _run_jobs_in_pool(
+    jobs: List[Tuple], workers: int, pool_options: Dict, tracker: ProgressTracker, input_dir: Path
+) -> List[Tuple]:
+    """常驻进程池模式：worker 已加载模型，作业由监督线程按提交顺序分派给空闲进程"""
+    logger = get_run_logger()
+    pool = get_worker_pool(workers, **pool_options)
+    futures = {pool.submit(kwargs): (group_idx, pdf) for group_idx, pdf, kwargs in jobs}
+    outcomes = []
+    for future in as_completed(futures):
+        group_idx, pdf = futures[future]
+        try:
+            outcome = (group_idx, pdf, future.result(), None)
+        except Exception as e:
+            outcome = (group_idx, pdf, None, str(e))
+        outcomes.append(outcome)
+        _record_outcome(tracker, input_dir, *outcome[1:])
+    for worker in pool.health():
+        logger.info(
+            f"🩺 worker-{worker['slot']} | pid: {worker['pid']} | 状态: {worker['state']} | "
+            f"作业: {worker['jobs_done']} | 重启: {worker['restarts']} | 内存: {worker['rss_mb']}MB"
+            + (f" | 上次退出: {worker['last_exit_reason']}" if worker['last_exit_reason'] else "")
+        )
+    return outcomes
 
 
 # ------------------------ 执行入口 ------------------------
@@ -436,16 +787,6 @@ if __name__ == "__main__":
 
     # 部署这个flow
     pdf_to_markdown.serve(name="pdf_to_markdown-deployment")
-    # 原始Markdown内容示例
-    # original_content = """![方程 11-1: 噪声指数因数](E:\MySpeace\med_rag\med-rag-flow\data\processed\test01\images_RevolutionMaximaUserManualCN452-454/efee5da2e6ab47efb1e95387366050513a90bebf5b164318b8b9c7b03864502c.jpg)
-    # """
-    # final_output_path = Path('../data/output/markdown/test01').resolve()
-    # image_base_url = f'http://10.20.92.21/static/123'
-    # for md_file in final_output_path.rglob('*.md'):
-    #         replace_image_paths(md_file,image_base_url)
-    # 替换路径前缀
-    # new_content = replace_image_paths(original_content, "replace_path")
-    # print(new_content)
     # result = pdf_to_markdown(
     #     input_dir="../data/raw/pdf",
     #     output_root="../data/processed",
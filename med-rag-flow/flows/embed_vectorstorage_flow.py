@@ -1,6 +1,8 @@
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List
+import hashlib
+import time
 import sys
 
 from prefect import flow, get_run_logger, task
@@ -31,6 +33,7 @@ def process_and_store_directory(
     processor_params: Optional[Dict] = None,
     recursive: bool = True,
     file_extensions: List[str] = [".md", ".markdown"],
+    question_params: Optional[Dict] = None,
     **kwargs
 ) -> Optional[VectorStoreManager]:
     """
@@ -45,6 +48,7 @@ def process_and_store_directory(
         processor_params: 分块处理器专用参数
         recursive: 是否递归搜索子目录（默认True）
         file_extensions: 处理的文件扩展名（默认[.md, .markdown]）
+        question_params: 假设问题索引参数（None表示不生成），见 VectorStoreManager.build_question_index
         ​**kwargs: 通用参数（chunk_size等）
 
     Returns:
@@ -80,19 +84,35 @@ def process_and_store_directory(
             raise TypeError("不支持的输入类型")
 
         # 分块处理
+        chunk_start = time.perf_counter()
         processed_docs = _dispatch_processor(
             docs,
             processor_type,
             {**processor_params, **kwargs}
         )
+        chunk_seconds = time.perf_counter() - chunk_start
 
         # 存储处理
         if not processed_docs:
             logger.error("分块结果为空")
             return None
 
-        manager = VectorStoreManager(config, processed_docs)
+        # 父子分块：父段落不进入向量索引, 单独写入父段落存储
+        parent_store = _extract_parent_store(processed_docs)
+        if parent_store:
+            logger.info(f"父子分块 ➔ 子段落 {len(processed_docs)} 个 | 父段落 {len(parent_store)} 个")
+
+        manager = VectorStoreManager(config, processed_docs, parent_store=parent_store)
+        manager.timer.add("chunking", chunk_seconds)
         logger.info(f"存储成功 ➔ {manager.get_store_info()}")
+
+        # 可选阶段：假设问题索引（失败不影响主索引）
+        if question_params and manager.is_ready:
+            try:
+                count = manager.build_question_index(question_params)
+                logger.info(f"假设问题索引完成 ➔ {count} 条问题")
+            except Exception as e:
+                logger.warning(f"假设问题索引构建失败: {str(e)}", exc_info=True)
         return manager
 
     except Exception as e:
@@ -152,19 +172,9 @@ def _load_markdown_from_directory(
         file_count = 0
         for file_path in matched_files:
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    docs.append(Document(
-                        page_content=content,
-                        metadata={
-                            "source": str(file_path.resolve()),
-                            "filename": file_path.name,
-                            "extension": file_path.suffix,
-                            "last_modified": file_path.stat().st_mtime
-                        }
-                    ))
-                    file_count += 1
-                    logger.debug(f"已加载: {file_path.name}")
+                docs.append(_markdown_document(file_path))
+                file_count += 1
+                logger.debug(f"已加载: {file_path.name}")
             except UnicodeDecodeError:
                 logger.warning(f"解码失败（可能为二进制文件）: {file_path}")
             except Exception as e:
@@ -183,6 +193,74 @@ def _load_markdown_from_directory(
         logger.error(f"目录遍历失败: {str(e)}")
         return []
 
+def _markdown_document(file_path: Path) -> Document:
+    """读取Markdown文件为文档（source 为绝对路径，增量更新按此归属分块）"""
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    return Document(
+        page_content=content,
+        metadata={
+            "source": str(file_path.resolve()),
+            "filename": file_path.name,
+            "extension": file_path.suffix,
+            "last_modified": file_path.stat().st_mtime
+        }
+    )
+
+
+@flow(name="update_store_incrementally")
+def update_store_incrementally(
+    previous_store_name: str,
+    config: Dict,
+    markdown_files: List[Path],
+    remove_chunk_ids: List[str],
+    remove_parent_ids: List[str],
+    processor_type: str = "header",
+    processor_params: Optional[Dict] = None,
+    question_params: Optional[Dict] = None,
+) -> Optional[VectorStoreManager]:
+    """
+    增量更新已有向量存储
+
+    Args:
+        previous_store_name: 上一版本存储目录名
+        config: 向量存储配置
+        markdown_files: 需要（重新）入库的Markdown文件
+        remove_chunk_ids: 需要移除的分块（变化/删除的文档）
+        remove_parent_ids: 需要移除的父段落
+        processor_type: 分块处理器类型（须与上一版本一致）
+        processor_params: 分块处理器参数
+        question_params: 假设问题索引参数（None表示不更新问题索引）
+
+    Returns:
+        更新后的 VectorStoreManager；上一版本不可用时返回 None（由调用方全量重建）
+    """
+    logger = get_run_logger()
+    manager = VectorStoreManager.load_existing(config, previous_store_name)
+    if manager is None:
+        logger.warning(f"上一版本存储不可用: {previous_store_name}")
+        return None
+
+    docs = [_markdown_document(Path(path)) for path in markdown_files]
+    with manager.timer.stage("chunking"):
+        processed_docs = _dispatch_processor(docs, processor_type, processor_params or {}) if docs else []
+    parent_store = _extract_parent_store(processed_docs)
+    logger.info(
+        f"增量更新 ➔ 入库文档 {len(docs)} 个 / 新分块 {len(processed_docs)} 个 | "
+        f"移除分块 {len(remove_chunk_ids)} 个"
+    )
+
+    manager.apply_changes(
+        remove_chunk_ids,
+        processed_docs,
+        remove_parent_ids=remove_parent_ids,
+        new_parents=parent_store,
+        question_params=question_params,
+    )
+    logger.info(f"增量更新完成 ➔ {manager.get_store_info()} | 耗时: {manager.timer.summary()}")
+    return manager
+
+
 def _dispatch_processor(
     docs: List[Document],
     processor_type: str,
@@ -195,6 +273,7 @@ def _dispatch_processor(
         "header_hybrid": _process_header_hybrid,
         "header_hybrid_semantic": _process_header_hybrid_semantic,
         "propositions": _process_propositions,
+        "header_parent_child": _process_header_parent_child,
     }
     
     if processor_type not in processor_map:
@@ -314,6 +393,94 @@ def _process_header_hybrid(
     return processed_docs
 
 
+PARENT_CONTENT_KEY = "_parent_content"
+
+
+def _header_path(metadata: Dict) -> str:
+    """标题路径（如 "第3章 > 3.2 校准 > 探头"）"""
+    levels = sorted(
+        (key for key in metadata if len(key) == 2 and key[0] in "hH" and key[1].isdigit()),
+        key=lambda key: int(key[1]),
+    )
+    return " > ".join(str(metadata[key]) for key in levels)
+
+
+def _process_header_parent_child(
+    docs: List[Document],
+    params: Dict
+) -> List[Document]:
+    """
+    父子分块处理管道（small-to-big）
+
+    按标题层级切出父段落（章节, 超过 parent_chunk_size 时再按大小切分）,
+    再把每个父段落切成 child_chunk_size 的子段落用于向量匹配。
+    子段落元数据记录 parent_id 与 header_path, 父段落内容暂存在
+    PARENT_CONTENT_KEY 中, 由 _extract_parent_store 取出后单独存储。
+
+    Args:
+        docs: 原始文档
+        params: child_chunk_size（默认400）、parent_chunk_size（默认3000）
+
+    Returns:
+        子段落文档列表
+    """
+    parent_splitter = MarkdownHeaderTextSplitter(
+        chunk_size=params.get("parent_chunk_size", 3000),
+    )
+    child_splitter = MarkdownHeaderTextSplitter(
+        chunk_size=params.get("child_chunk_size", 400),
+    )
+    children = []
+
+    for doc in docs:
+        original_meta = doc.metadata.copy()
+        source = str(original_meta.get("source", ""))
+        path_counts: Dict[str, int] = {}
+
+        for parent in parent_splitter.split_text(doc.page_content):
+            parent_content = parent.content.strip()
+            if not parent_content:
+                continue
+            header_path = _header_path(parent.metadata)
+            # 同一标题路径被切成多段时追加序号
+            part = path_counts.get(header_path, 0)
+            path_counts[header_path] = part + 1
+            parent_key = f"{header_path}#{part}" if part else header_path
+            parent_id = hashlib.sha1(f"{source}\x00{parent_key}".encode("utf-8")).hexdigest()[:16]
+
+            for child in child_splitter._split_chunk_by_size(parent):
+                child_content = child.content.strip()
+                if not child_content:
+                    continue
+                children.append(Document(
+                    page_content=f"{header_path}\n{child_content}" if header_path else child_content,
+                    metadata={
+                        **original_meta,
+                        **child.metadata,
+                        "header_path": parent_key,
+                        "parent_id": parent_id,
+                        PARENT_CONTENT_KEY: parent_content,
+                    },
+                ))
+
+    return children
+
+
+def _extract_parent_store(docs: List[Document]) -> Dict[str, Dict]:
+    """从子段落元数据中取出父段落内容, 构建 {parent_id: 父段落} 存储"""
+    parent_store: Dict[str, Dict] = {}
+    for doc in docs:
+        content = doc.metadata.pop(PARENT_CONTENT_KEY, None)
+        if content is None:
+            continue
+        parent_store.setdefault(doc.metadata["parent_id"], {
+            "source": doc.metadata.get("source"),
+            "header_path": doc.metadata.get("header_path"),
+            "content": content,
+        })
+    return parent_store
+
+
 if __name__ == '__main__':
     # 配置参数
     CONFIG = {
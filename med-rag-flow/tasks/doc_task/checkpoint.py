@@ -0,0 +1,146 @@
+"""
+文件级 / 阶段级处理检查点
+
+每个PDF一个检查点文件（按相对路径哈希命名，原子写入，进程池 worker 也可直接写），
+记录已完成阶段的结果:
+- extraction: extract_pdf_content 的结果（content_list / middle.json / 图片目录）
+- markdown:   generate_markdown 的结果（最终 Markdown 路径、已发布图片）
+
+run.json 标记一次未完成的运行。流程中断（Ollama 重启、节点被抢占）后再次触发时，
+若 run.json 仍在则不清理目录，沿用原运行模式，每个文件从最后完成的阶段继续。
+运行成功后整个检查点目录被删除。
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from tasks.doc_task.kb_state import pipeline_version
+
+CHECKPOINT_DIRNAME = ".checkpoints"
+RUN_FILENAME = "run.json"
+# 按处理顺序排列；强制重跑某阶段时其后的阶段一并重跑
+FILE_STAGES = ("extraction", "markdown")
+FORCEABLE_STAGES = FILE_STAGES + ("embedding",)
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def resume_full_rebuild(resume_run: Optional[Dict], full_rebuild: bool) -> bool:
+    """恢复运行时沿用 run.json 记录的运行模式，否则使用本次判定的结果"""
+    if resume_run and "full_rebuild" in resume_run:
+        return bool(resume_run["full_rebuild"])
+    return full_rebuild
+
+
+def validate_force_stages(force_stages: Optional[Iterable[str]]) -> set:
+    stages = set(force_stages or [])
+    unknown = stages - set(FORCEABLE_STAGES)
+    if unknown:
+        raise ValueError(f"未知阶段: {sorted(unknown)}，可选: {list(FORCEABLE_STAGES)}")
+    return stages
+
+
+def _outputs_exist(stage: str, result: Dict) -> bool:
+    """阶段结果引用的文件仍在磁盘上才可复用"""
+    if stage == "extraction":
+        paths = [result.get("content_list_path"), result.get("middle_json_path"), result.get("image_dir")]
+    else:
+        paths = [result.get("markdown_path")]
+    return all(path and Path(path).exists() for path in paths)
+
+
+class ProcessingCheckpoint:
+    """检查点目录读写"""
+
+    def __init__(self, checkpoint_dir):
+        self.dir = Path(checkpoint_dir)
+
+    # ------------------------ 运行标记 ------------------------
+    def load_run(self) -> Optional[Dict]:
+        """未完成运行的标记；不存在表示上次运行已正常结束"""
+        return _read_json(self.dir / RUN_FILENAME)
+
+    def start_run(self, info: Dict[str, Any]) -> None:
+        _write_json(self.dir / RUN_FILENAME, {**info, "started_at": datetime.now().isoformat()})
+
+    def finish_run(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    # ------------------------ 文件阶段 ------------------------
+    def _file_path(self, key: str) -> Path:
+        return self.dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def load(self, key: str, sha256: str) -> Dict[str, Dict]:
+        """
+        读取文件已完成且输出仍有效的阶段
+
+        内容或流水线版本变化、或中间某阶段失效时，该阶段及其后阶段均视为未完成。
+        """
+        data = _read_json(self._file_path(key))
+        if not data or data.get("sha256") != sha256 or data.get("pipeline_version") != pipeline_version():
+            return {}
+        stages = {}
+        for stage in FILE_STAGES:
+            result = data.get("stages", {}).get(stage)
+            if result is None or not _outputs_exist(stage, result):
+                break
+            stages[stage] = result
+        return stages
+
+    def has_file(self, key: str, sha256: str) -> bool:
+        return bool(self.load(key, sha256))
+
+    def save_stage(self, key: str, sha256: str, stage: str, result: Dict) -> None:
+        path = self._file_path(key)
+        data = _read_json(path) or {}
+        if data.get("sha256") != sha256 or data.get("pipeline_version") != pipeline_version():
+            data = {"key": key, "sha256": sha256, "pipeline_version": pipeline_version(), "stages": {}}
+        # 之后的阶段基于旧结果生成，一并作废
+        for later in FILE_STAGES[FILE_STAGES.index(stage) + 1:]:
+            data["stages"].pop(later, None)
+        data["stages"][stage] = result
+        data["updated_at"] = datetime.now().isoformat()
+        _write_json(path, data)
+
+
+def resumable_stages(checkpoint: Optional[Dict]) -> Dict[str, Dict]:
+    """
+    按作业中的检查点参数取出可跳过的阶段
+
+    Args:
+        checkpoint: {"dir", "key", "sha256", "force": [阶段]}，None 表示不使用检查点
+    """
+    if not checkpoint or not checkpoint.get("sha256"):
+        return {}
+    stages = ProcessingCheckpoint(checkpoint["dir"]).load(checkpoint["key"], checkpoint["sha256"])
+    force = set(checkpoint.get("force") or [])
+    for index, stage in enumerate(FILE_STAGES):
+        if stage in force:
+            for later in FILE_STAGES[index:]:
+                stages.pop(later, None)
+            break
+    return stages
+
+
+def save_checkpoint_stage(checkpoint: Optional[Dict], stage: str, result: Dict) -> None:
+    if checkpoint and checkpoint.get("sha256"):
+        ProcessingCheckpoint(checkpoint["dir"]).save_stage(
+            checkpoint["key"], checkpoint["sha256"], stage, result
+        )
@@ -0,0 +1,171 @@
+"""
+MinerU 解析结果缓存（内容寻址）
+
+键为 PDF 内容 sha256 + MinerU 版本 + 流水线版本，条目包含 content_list、middle.json、
+model.json、图片与 Markdown。未变化的 PDF 命中缓存后直接恢复到工作目录，跳过 doc_analyze。
+
+缓存中的路径均为相对形式（图片只记文件名），恢复时再按当前文件名重建，
+因此同一内容改名后仍可命中。
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+# 解析/拼接逻辑变化时递增，使旧缓存失效
+PIPELINE_VERSION = "1"
+
+CONTENT_LIST_FILENAME = "content_list.json"
+MIDDLE_JSON_FILENAME = "middle.json"
+MARKDOWN_FILENAME = "content.md"
+MODEL_JSON_FILENAME = "model.json"
+IMAGES_DIRNAME = "images"
+META_FILENAME = "meta.json"
+
+
+def mineru_version() -> str:
+    """当前安装的 MinerU(magic_pdf) 版本"""
+    try:
+        from magic_pdf.libs.version import __version__
+        return __version__
+    except ImportError:
+        return "unknown"
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    """分块计算文件 sha256，避免大文件一次读入内存"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """MinerU 解析结果的磁盘缓存"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(pdf_sha256: str) -> str:
+        raw = f"{pdf_sha256}\x00{mineru_version()}\x00{PIPELINE_VERSION}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def has(self, key: str) -> bool:
+        return (self.entry_dir(key) / META_FILENAME).exists()
+
+    def invalidate(self, key: str) -> None:
+        """删除缓存条目（强制重新解析时使用）"""
+        entry = self.entry_dir(key)
+        if entry.exists():
+            trash = entry.parent / f".{key}.{uuid.uuid4().hex}.del"
+            try:
+                os.rename(entry, trash)
+            except OSError:
+                return
+            shutil.rmtree(trash, ignore_errors=True)
+
+    def store(
+        self,
+        key: str,
+        pdf_stem: str,
+        content_list_path: Path,
+        middle_json_path: Path,
+        markdown_path: Path,
+        image_dir: Path,
+        model_json_path: Optional[Path] = None,
+    ) -> Path:
+        """写入缓存条目（先写临时目录再原子改名，并发写入同一键时以先完成者为准）"""
+        entry = self.entry_dir(key)
+        if self.has(key):
+            return entry
+        tmp_entry = entry.parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        tmp_entry.mkdir(parents=True)
+        try:
+            with open(content_list_path, "r", encoding="utf-8") as f:
+                content_list = json.load(f)
+            for item in content_list:
+                if item.get("img_path"):
+                    item["img_path"] = Path(item["img_path"]).name
+            with open(tmp_entry / CONTENT_LIST_FILENAME, "w", encoding="utf-8") as f:
+                json.dump(content_list, f, ensure_ascii=False)
+
+            shutil.copy2(middle_json_path, tmp_entry / MIDDLE_JSON_FILENAME)
+            shutil.copy2(markdown_path, tmp_entry / MARKDOWN_FILENAME)
+            shutil.copytree(image_dir, tmp_entry / IMAGES_DIRNAME)
+            if model_json_path and model_json_path.exists():
+                shutil.copy2(model_json_path, tmp_entry / MODEL_JSON_FILENAME)
+
+            with open(tmp_entry / META_FILENAME, "w", encoding="utf-8") as f:
+                json.dump({
+                    "pdf_stem": pdf_stem,
+                    "image_dir_name": image_dir.name,
+                    "mineru_version": mineru_version(),
+                    "pipeline_version": PIPELINE_VERSION,
+                    "created_at": datetime.now().isoformat(),
+                }, f, ensure_ascii=False, indent=2)
+            try:
+                os.rename(tmp_entry, entry)
+            except OSError:
+                # 其他进程已写入同一键
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+        return entry
+
+    def restore(self, key: str, output_dir: Path, image_dir: Path, pdf_stem: str) -> Optional[Dict]:
+        """
+        将缓存条目恢复到工作目录
+
+        Returns:
+            与 extract_pdf_content 相同结构的结果字典；未命中返回 None
+        """
+        if not self.has(key):
+            return None
+        entry = self.entry_dir(key)
+        with open(entry / META_FILENAME, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        image_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copytree(entry / IMAGES_DIRNAME, image_dir, dirs_exist_ok=True)
+
+        with open(entry / CONTENT_LIST_FILENAME, "r", encoding="utf-8") as f:
+            content_list = json.load(f)
+        for item in content_list:
+            if item.get("img_path"):
+                item["img_path"] = str(image_dir.resolve() / item["img_path"])
+        content_list_path = output_dir / f"{pdf_stem}_content_list.json"
+        with open(content_list_path, "w", encoding="utf-8") as f:
+            json.dump(content_list, f, ensure_ascii=False, indent=4)
+
+        middle_json_path = output_dir / f"{pdf_stem}_middle.json"
+        shutil.copy2(entry / MIDDLE_JSON_FILENAME, middle_json_path)
+        if (entry / MODEL_JSON_FILENAME).exists():
+            shutil.copy2(entry / MODEL_JSON_FILENAME, output_dir / f"{pdf_stem}_model.json")
+
+        # Markdown 中的图片目录名与标题随当前文件名替换
+        markdown = (entry / MARKDOWN_FILENAME).read_text(encoding="utf-8")
+        markdown = markdown.replace(f"]({meta['image_dir_name']}/", f"]({image_dir.name}/")
+        if markdown.startswith(f"# {meta['pdf_stem']}\n"):
+            markdown = f"# {pdf_stem}\n" + markdown[len(f"# {meta['pdf_stem']}\n"):]
+        (output_dir / f"{pdf_stem}.md").write_text(markdown, encoding="utf-8")
+
+        return {
+            "status": "success",
+            "pdf_stem": pdf_stem,
+            "content_list_path": str(content_list_path),
+            "middle_json_path": str(middle_json_path),
+            "image_dir": str(image_dir),
+            "visualization_files": [],
+            "cache_hit": True,
+        }
@@ -0,0 +1,123 @@
+"""
+内容寻址图片存储
+
+图片按内容 sha256 只保存一份（<root>/<前两位>/<sha256><扩展名>），发布到静态目录时
+优先使用硬链接，其次 reflink（写时复制），最后才回退为复制。Markdown 直接引用
+<sha256><扩展名>，同一图片重复发布不产生新的数据写入。
+
+存储目录必须位于静态目录之外（默认 output_root/.image_store），只有已发布的对象对外可见；
+不再被任何文档引用的对象由 prune 清理。
+"""
+import os
+import shutil
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+from tasks.doc_task.extraction_cache import file_sha256
+
+try:
+    import fcntl
+    FICLONE = 0x40049409  # Linux ioctl：btrfs / xfs 等文件系统的 reflink
+except ImportError:
+    fcntl = None
+
+IMAGE_STORE_DIRNAME = ".image_store"
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    if fcntl is None:
+        raise OSError("reflink 不受支持")
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink(missing_ok=True)
+            raise
+
+
+def link_or_copy(src, dst) -> str:
+    """
+    以最低代价把 src 放到 dst（dst 不能已存在）
+
+    Returns:
+        实际使用的方式: hardlink / reflink / copy
+    """
+    src, dst = Path(src), Path(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        _reflink(src, dst)
+        shutil.copystat(src, dst)
+        return "reflink"
+    except OSError:
+        pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+class ImageStore:
+    """图片对象存储与发布"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats: Counter = Counter()
+
+    @staticmethod
+    def object_name(digest: str, suffix: str) -> str:
+        return f"{digest}{suffix.lower()}"
+
+    def object_path(self, name: str) -> Path:
+        return self.root / name[:2] / name
+
+    def put(self, image_path) -> str:
+        """写入图片（已存在则跳过），返回对象名 <sha256><扩展名>"""
+        image_path = Path(image_path)
+        name = self.object_name(file_sha256(image_path), image_path.suffix)
+        target = self.object_path(name)
+        if target.exists():
+            self.stats["stored"] += 1
+            return name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{name}.{uuid.uuid4().hex}.tmp")
+        self.stats[f"store_{link_or_copy(image_path, tmp_path)}"] += 1
+        try:
+            os.replace(tmp_path, target)
+        except OSError:
+            tmp_path.unlink(missing_ok=True)
+            if not target.exists():
+                raise
+        return name
+
+    def publish(self, name: str, dest_dir) -> Path:
+        """将对象发布到静态目录（同名文件已存在即视为已发布）"""
+        dest = Path(dest_dir) / name
+        if dest.exists():
+            self.stats["published"] += 1
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self.stats[link_or_copy(self.object_path(name), dest)] += 1
+        except FileExistsError:
+            self.stats["published"] += 1
+        return dest
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """删除不在 keep 中的对象，返回删除数量"""
+        keep = set(keep)
+        removed = 0
+        for path in self.root.glob("*/*"):
+            if path.is_file() and not path.name.startswith(".") and path.name not in keep:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def summary(self) -> str:
+        return (f"硬链接 {self.stats['hardlink']} | reflink {self.stats['reflink']} | "
+                f"复制 {self.stats['copy']} | 已发布 {self.stats['published']}")
@@ -0,0 +1,115 @@
+"""
+入库性能报告
+
+汇总每个文件的阶段耗时（解析 / OCR 与文本模式 / 清洗 / 大纲匹配 / VLM 增强）与
+流程级阶段（扫描、解析、分块、嵌入、索引），计算页/秒、VLM 调用数、缓存命中与峰值内存，
+写入 JSON 以便定位入库时间花在哪里。
+"""
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils.memory import peak_rss_mb
+from utils.timing import StageTimer
+
+
+def _file_entry(item: Dict) -> Dict[str, Any]:
+    working = item.get("working_files", {})
+    markdown = item.get("markdown_result", {})
+    extraction = working.get("timings", {})
+    generation = markdown.get("timings", {})
+    seconds = sum(extraction.values()) + sum(generation.values())
+    pages = working.get("page_count", 0)
+    return {
+        "file": item.get("file"),
+        "pages": pages,
+        "parse_mode": working.get("parse_mode", "unknown"),
+        "cache_hit": bool(working.get("cache_hit")),
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(pages / seconds, 3) if seconds else None,
+        "extraction": extraction,
+        "generation": generation,
+        "enrichment": markdown.get("enrichment", {}),
+        "peak_rss_mb": item.get("peak_rss_mb"),
+    }
+
+
+def build_ingestion_report(
+    processing_results: List[Dict],
+    flow_timer: StageTimer,
+    wall_seconds: float,
+    embedding_timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Args:
+        processing_results: mineru_process_pdf_flow 的返回结果
+        flow_timer: 流程级阶段耗时
+        wall_seconds: 流程总墙钟时间
+        embedding_timings: VectorStoreManager.timer 的阶段耗时（chunking / embedding / indexing）
+    """
+    files = [
+        _file_entry(item)
+        for group in processing_results for item in group["processed_files"]
+    ]
+    failed = sum(len(group["failed_files"]) for group in processing_results)
+
+    stage_totals = StageTimer()
+    parse_modes: Dict[str, Dict[str, float]] = {}
+    vlm = {"calls": 0, "cache_hits": 0, "tables": 0, "html_tables": 0, "images": 0}
+    for entry in files:
+        stage_totals.merge(entry["extraction"])
+        stage_totals.merge(entry["generation"])
+        mode = parse_modes.setdefault(entry["parse_mode"], {"files": 0, "pages": 0, "seconds": 0.0})
+        mode["files"] += 1
+        mode["pages"] += entry["pages"]
+        mode["seconds"] += sum(entry["extraction"].values())
+        enrichment = entry["enrichment"]
+        vlm["calls"] += enrichment.get("vlm_calls", 0)
+        vlm["cache_hits"] += enrichment.get("vlm_cache_hits", 0)
+        vlm["tables"] += enrichment.get("tables", 0)
+        vlm["html_tables"] += enrichment.get("html_tables", 0)
+        vlm["images"] += enrichment.get("images", 0)
+    for mode in parse_modes.values():
+        mode["pages_per_sec"] = round(mode["pages"] / mode["seconds"], 3) if mode["seconds"] else None
+        mode["seconds"] = round(mode["seconds"], 3)
+    lookups = vlm["calls"] + vlm["cache_hits"]
+    vlm["cache_hit_rate"] = round(vlm["cache_hits"] / lookups, 3) if lookups else None
+
+    pages = sum(entry["pages"] for entry in files)
+    worker_peaks = [entry["peak_rss_mb"] for entry in files if entry["peak_rss_mb"]]
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "wall_seconds": round(wall_seconds, 3),
+        "files": {"processed": len(files), "failed": failed},
+        "pages": pages,
+        "pages_per_sec": round(pages / wall_seconds, 3) if wall_seconds else None,
+        "extraction_cache_hits": sum(1 for entry in files if entry["cache_hit"]),
+        "parse_modes": parse_modes,
+        "vlm": vlm,
+        # 文件级阶段在并发下累加，总和可能大于墙钟时间
+        "file_stages": stage_totals.as_dict(),
+        "flow_stages": flow_timer.as_dict(),
+        "embedding_stages": {k: round(v, 3) for k, v in (embedding_timings or {}).items()},
+        "peak_rss_mb": {
+            "flow": round(peak_rss_mb(), 1),
+            "workers": max(worker_peaks) if worker_peaks else None,
+        },
+        "per_file": files,
+    }
+
+
+def write_ingestion_report(report: Dict[str, Any], report_dir: Path) -> Path:
+    """写入 ingest_<时间戳>.json，并更新 ingest_latest.json"""
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    path = report_dir / f"ingest_{datetime.now():%Y%m%d_%H%M%S}.json"
+    path.write_text(payload, encoding="utf-8")
+    latest = report_dir / "ingest_latest.json"
+    tmp_path = latest.with_name(f".{latest.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(payload, encoding="utf-8")
+    os.replace(tmp_path, latest)
+    return path
@@ -0,0 +1,167 @@
+"""
+知识库增量处理状态
+
+kb_state.json 记录每个PDF的内容哈希、流水线版本、输出路径及其在向量存储中的
+chunk_id / parent_id。每次触发时与磁盘上的PDF对账：新增与变化的文件重新处理，
+删除的文件移除其分块，未变化的文件保持不动。
+"""
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from tasks.doc_task.extraction_cache import PIPELINE_VERSION, mineru_version
+
+KB_STATE_FILENAME = "kb_state.json"
+KB_STATE_VERSION = 1
+
+
+def pipeline_version() -> str:
+    """影响解析输出的版本组合（MinerU 版本 + 流水线版本）"""
+    return f"{mineru_version()}:{PIPELINE_VERSION}"
+
+
+def embedding_signature(model: str, processor_type: str, processor_params: Dict) -> str:
+    """嵌入模型与分块参数签名，变化时需要全量重建向量存储"""
+    raw = json.dumps(
+        {"model": model, "processor_type": processor_type, "processor_params": processor_params},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def group_chunks_by_source(docs: Iterable[Any]) -> Dict[str, Dict[str, List[str]]]:
+    """按来源 Markdown 汇总分块：{source: {"chunk_ids": [...], "parent_ids": [...]}}"""
+    groups: Dict[str, Dict[str, List[str]]] = {}
+    for doc in docs:
+        source = str(doc.metadata.get("source", ""))
+        group = groups.setdefault(source, {"chunk_ids": [], "parent_ids": []})
+        group["chunk_ids"].append(doc.metadata["chunk_id"])
+        parent_id = doc.metadata.get("parent_id")
+        if parent_id and parent_id not in group["parent_ids"]:
+            group["parent_ids"].append(parent_id)
+    return groups
+
+
+@dataclass
+class KBChanges:
+    """对账结果（均为相对输入目录的PDF路径）"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def to_process(self) -> List[str]:
+        return self.added + self.changed
+
+    @property
+    def to_remove(self) -> List[str]:
+        return self.changed + self.deleted
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def force_reprocess(self) -> None:
+        """未变化的文件也重新处理（强制重跑某阶段时使用）"""
+        self.changed = sorted(self.changed + self.unchanged)
+        self.unchanged = []
+
+    def summary(self) -> str:
+        return (f"新增 {len(self.added)} | 变化 {len(self.changed)} | "
+                f"删除 {len(self.deleted)} | 未变化 {len(self.unchanged)}")
+
+
+class KBState:
+    """kb_state.json 读写与对账"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data: Dict[str, Any] = {"version": KB_STATE_VERSION, "vector_store": None, "documents": {}}
+        if self.path.exists():
+            try:
+                loaded = json.loads(self.path.read_text(encoding="utf-8"))
+                if loaded.get("version") == KB_STATE_VERSION:
+                    self.data = loaded
+            except (OSError, ValueError):
+                pass
+
+    @property
+    def documents(self) -> Dict[str, Dict]:
+        return self.data["documents"]
+
+    @property
+    def vector_store(self) -> Optional[Dict]:
+        return self.data.get("vector_store")
+
+    def reset(self) -> None:
+        """全量重建前清空记录"""
+        self.data = {"version": KB_STATE_VERSION, "vector_store": None, "documents": {}}
+
+    def reconcile(self, pdf_hashes: Dict[str, str]) -> KBChanges:
+        """
+        与当前PDF集合对账
+
+        Args:
+            pdf_hashes: {相对路径: 内容sha256}
+        """
+        changes = KBChanges()
+        current_version = pipeline_version()
+        for rel_path, sha256 in sorted(pdf_hashes.items()):
+            entry = self.documents.get(rel_path)
+            if entry is None:
+                changes.added.append(rel_path)
+            elif entry.get("sha256") != sha256 or entry.get("pipeline_version") != current_version:
+                changes.changed.append(rel_path)
+            else:
+                changes.unchanged.append(rel_path)
+        changes.deleted = sorted(set(self.documents) - set(pdf_hashes))
+        return changes
+
+    def removed_ids(self, rel_paths: Iterable[str]) -> Dict[str, List[str]]:
+        """待移除文档在向量存储中的 chunk_id / parent_id"""
+        chunk_ids: List[str] = []
+        parent_ids: List[str] = []
+        for rel_path in rel_paths:
+            entry = self.documents.get(rel_path, {})
+            chunk_ids.extend(entry.get("chunk_ids", []))
+            parent_ids.extend(entry.get("parent_ids", []))
+        return {"chunk_ids": chunk_ids, "parent_ids": parent_ids}
+
+    def set_document(self, rel_path: str, sha256: str, outputs: Dict[str, str]) -> None:
+        self.documents[rel_path] = {
+            "sha256": sha256,
+            "pipeline_version": pipeline_version(),
+            **outputs,
+            "chunk_ids": [],
+            "parent_ids": [],
+            "updated_at": datetime.now().isoformat(),
+        }
+
+    def remove_document(self, rel_path: str) -> Optional[Dict]:
+        return self.documents.pop(rel_path, None)
+
+    def attach_chunks(self, chunk_groups: Dict[str, Dict[str, List[str]]]) -> None:
+        """按 markdown_path 写入各文档的 chunk_id / parent_id"""
+        for entry in self.documents.values():
+            group = chunk_groups.get(entry.get("markdown_path", ""), {})
+            entry["chunk_ids"] = group.get("chunk_ids", [])
+            entry["parent_ids"] = group.get("parent_ids", [])
+
+    def set_vector_store(self, store_name: str, signature: str) -> None:
+        self.data["vector_store"] = {
+            "name": store_name,
+            "signature": signature,
+            "updated_at": datetime.now().isoformat(),
+        }
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(self.data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,335 @@
+"""
+常驻 MinerU 推理进程池
+
+每个 worker 进程启动时加载一次 MinerU 模型（ModelSingleton 为进程级单例），
+之后持续从自己的任务队列领取 PDF 作业，跨多次 flow 触发复用，避免每个文件/每次
+触发都重新初始化版面、OCR、公式模型。
+
+监督线程负责:
+- 分派: 只把作业交给空闲 worker，任何时刻都知道作业在哪个进程上
+- 健康检查: worker 后台线程定期上报心跳与内存，心跳超时或作业超时则终止并重启
+- 内存回收: 作业完成后常驻内存超过 max_rss_mb（或处理数达到 max_jobs_per_worker）
+  的 worker 主动退出，由监督线程补充新进程
+"""
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+from tasks.doc_task.process_pdf_task import init_pdf_worker, run_process_pdf_file
+from utils.memory import current_rss_mb
+
+# 默认参数
+DEFAULT_MAX_RSS_MB = 6144          # 作业后常驻内存超过该值即回收（0 表示不限制）
+DEFAULT_MAX_JOBS_PER_WORKER = 0    # 单个进程最多处理的作业数（0 表示不限制）
+DEFAULT_JOB_TIMEOUT = 0            # 单个作业超时秒数（0 表示不限制）
+DEFAULT_HEARTBEAT_INTERVAL = 10    # 心跳间隔（秒），超过 3 个间隔未上报视为失去响应
+STARTUP_GRACE = 120                # 新进程导入依赖、加载模型期间额外允许的静默时间（秒）
+
+
+def _warm_up_models() -> None:
+    """预加载 MinerU 模型（与 doc_analyze 内部使用相同的键，OCR 与文本层两种模式各一份）"""
+    from magic_pdf.model.doc_analyze_by_custom_model import ModelSingleton
+    for ocr in (True, False):
+        ModelSingleton().get_model(
+            ocr=ocr, show_log=False, lang=None,
+            layout_model=None, formula_enable=None, table_enable=None
+        )
+
+
+def _heartbeat(slot: int, events, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        events.put(("heartbeat", slot, current_rss_mb()))
+
+
+def _worker_main(
+    slot: int,
+    inbox,
+    events,
+    torch_threads: int,
+    max_rss_mb: int,
+    max_jobs: int,
+    heartbeat_interval: float,
+    warmup: bool,
+) -> None:
+    """worker 进程入口（模块级函数以便 spawn 序列化）"""
+    init_pdf_worker(torch_threads)
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat, args=(slot, events, heartbeat_interval, stop), daemon=True
+    ).start()
+    try:
+        if warmup:
+            try:
+                _warm_up_models()
+            except Exception as e:
+                events.put(("log", slot, f"模型预加载失败，首个作业时加载: {type(e).__name__}: {e}"))
+        events.put(("ready", slot, os.getpid(), current_rss_mb()))
+
+        handled = 0
+        while True:
+            job = inbox.get()
+            if job is None:
+                break
+            job_id, kwargs = job
+            try:
+                result, error = run_process_pdf_file(kwargs), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {str(e)}"
+            handled += 1
+            rss = current_rss_mb()
+            recycle = None
+            if max_rss_mb and rss > max_rss_mb:
+                recycle = f"内存 {rss:.0f}MB 超过上限 {max_rss_mb}MB"
+            elif max_jobs and handled >= max_jobs:
+                recycle = f"已处理 {handled} 个作业"
+            # 回收标记随结果一起上报，监督线程不会再向即将退出的进程分派作业
+            events.put(("done", slot, job_id, result, error, rss, recycle))
+            if recycle:
+                break
+    finally:
+        stop.set()
+
+
+class MinerUWorkerPool:
+    """常驻 MinerU worker 进程池"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        torch_threads: Optional[int] = None,
+        max_rss_mb: int = DEFAULT_MAX_RSS_MB,
+        max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER,
+        job_timeout: float = DEFAULT_JOB_TIMEOUT,
+        heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+        warmup: bool = True,
+    ):
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.max_rss_mb = max_rss_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.warmup = warmup
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._slots: Dict[int, Dict[str, Any]] = {}
+        self._pending: deque = deque()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    # ------------------------ 生命周期 ------------------------
+    def start(self) -> "MinerUWorkerPool":
+        if self._supervisor is not None:
+            return self
+        for slot in range(self.workers):
+            self._spawn(slot)
+        self._supervisor = threading.Thread(target=self._supervise, name="mineru-pool", daemon=True)
+        self._supervisor.start()
+        return self
+
+    def shutdown(self, timeout: float = 30) -> None:
+        """停止全部 worker，未完成的作业以异常结束"""
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=5)
+        with self._lock:
+            slots = list(self._slots.values())
+        for info in slots:
+            try:
+                info["inbox"].put(None)
+            except (OSError, ValueError):
+                pass
+        deadline = time.monotonic() + timeout
+        for info in slots:
+            info["process"].join(max(0.0, deadline - time.monotonic()))
+            if info["process"].is_alive():
+                info["process"].terminate()
+        with self._lock:
+            for future in self._futures.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("worker 进程池已关闭"))
+            self._futures.clear()
+            self._pending.clear()
+
+    @property
+    def alive(self) -> bool:
+        return self._supervisor is not None and not self._stopping.is_set()
+
+    def _spawn(self, slot: int) -> None:
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(slot, inbox, self._events, self.torch_threads, self.max_rss_mb,
+                  self.max_jobs_per_worker, self.heartbeat_interval, self.warmup),
+            name=f"mineru-worker-{slot}",
+            # 非守护进程: 分片解析会在 worker 内再开进程池，守护进程不允许创建子进程；
+            # 退出由 shutdown()（含 atexit）发送停止信号并在超时后 terminate 保证
+            daemon=False,
+        )
+        process.start()
+        previous = self._slots.get(slot, {})
+        self._slots[slot] = {
+            "process": process,
+            "inbox": inbox,
+            "state": "starting",
+            "job": None,
+            "job_started": None,
+            "jobs_done": previous.get("jobs_done", 0),
+            "restarts": previous.get("restarts", -1) + 1,
+            "rss_mb": 0.0,
+            "last_seen": time.monotonic(),
+        }
+
+    # ------------------------ 作业提交 ------------------------
+    def submit(self, kwargs: Dict) -> Future:
+        """提交 process_pdf_file 参数，返回结果 Future"""
+        if not self.alive:
+            raise RuntimeError("worker 进程池未启动或已关闭")
+        future: Future = Future()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._futures[job_id] = future
+            self._pending.append((job_id, kwargs))
+        return future
+
+    # ------------------------ 监督线程 ------------------------
+    def _supervise(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._handle_event(self._events.get(timeout=0.2))
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                self._check_workers()
+                self._dispatch()
+
+    def _handle_event(self, event) -> None:
+        kind, slot = event[0], event[1]
+        with self._lock:
+            info = self._slots.get(slot)
+            if info is None:
+                return
+            info["last_seen"] = time.monotonic()
+            if kind == "ready":
+                info.update(state="idle", pid=event[2], rss_mb=event[3])
+            elif kind == "heartbeat":
+                info["rss_mb"] = event[2]
+            elif kind == "done":
+                _, _, job_id, result, error, rss, recycle = event
+                info.update(state="recycling" if recycle else "idle",
+                            job=None, job_kwargs=None, job_started=None, rss_mb=rss)
+                if recycle:
+                    info["recycle_reason"] = recycle
+                info["jobs_done"] += 1
+                future = self._futures.pop(job_id, None)
+                if future is not None and not future.done():
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RuntimeError(error))
+            elif kind == "log":
+                info["last_log"] = event[2]
+            self._dispatch()
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for slot, info in list(self._slots.items()):
+            process = info["process"]
+            reason = None
+            if not process.is_alive():
+                reason = info.get("recycle_reason") or f"进程退出 (exitcode={process.exitcode})"
+            elif info["job"] and self.job_timeout and now - info["job_started"] > self.job_timeout:
+                reason = f"作业超时 ({self.job_timeout}s)"
+            elif now - info["last_seen"] > 3 * self.heartbeat_interval + (STARTUP_GRACE if info["state"] == "starting" else 0):
+                reason = "心跳超时"
+            if reason is None:
+                continue
+
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+            if info["job"] and process.exitcode == 0 and info.get("job_kwargs") is not None:
+                # 正常退出的进程不会再执行已分派的作业，重新排队
+                self._pending.appendleft((info["job"], info["job_kwargs"]))
+            elif info["job"]:
+                future = self._futures.pop(info["job"], None)
+                if future is not None and not future.done():
+                    future.set_exception(RuntimeError(f"worker-{slot} 异常: {reason}"))
+            info["last_exit_reason"] = reason
+            self._spawn(slot)
+
+    def _dispatch(self) -> None:
+        for info in self._slots.values():
+            if not self._pending:
+                return
+            if info["state"] != "idle":
+                continue
+            job_id, kwargs = self._pending.popleft()
+            info.update(state="busy", job=job_id, job_kwargs=kwargs, job_started=time.monotonic(),
+                        job_file=str(kwargs.get("pdf_file", "")))
+            info["inbox"].put((job_id, kwargs))
+
+    # ------------------------ 状态 ------------------------
+    def health(self) -> List[Dict[str, Any]]:
+        """各 worker 状态（用于日志与巡检）"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "slot": slot,
+                    "pid": info.get("pid"),
+                    "alive": info["process"].is_alive(),
+                    "state": info["state"],
+                    "jobs_done": info["jobs_done"],
+                    "restarts": info["restarts"],
+                    "rss_mb": round(info["rss_mb"], 1),
+                    "current_file": info.get("job_file") if info["job"] else None,
+                    "busy_seconds": round(now - info["job_started"], 1) if info["job"] else 0,
+                    "last_exit_reason": info.get("last_exit_reason"),
+                }
+                for slot, info in sorted(self._slots.items())
+            ]
+
+
+_pool: Optional[MinerUWorkerPool] = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool(workers: int, **options) -> MinerUWorkerPool:
+    """进程内共享的常驻 worker 池；参数变化时重建"""
+    global _pool, _pool_key
+    key = (workers, tuple(sorted(options.items())))
+    with _pool_lock:
+        if _pool is not None and (_pool_key != key or not _pool.alive):
+            _pool.shutdown()
+            _pool = None
+        if _pool is None:
+            _pool = MinerUWorkerPool(workers, **options).start()
+            _pool_key = key
+        return _pool
+
+
+def shutdown_worker_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_worker_pool)
@@ -1,17 +1,34 @@
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import json
 import fitz
+import time
 from prefect import flow, task, get_run_logger
+from prefect.task_runners import ThreadPoolTaskRunner
 from utils.str_utils import optimize_str
 from magic_pdf.data.dataset import PymuDocDataset
 from magic_pdf.config.enums import SupportedPdfParseMethod
 from magic_pdf.model.doc_analyze_by_custom_model import doc_analyze
 from magic_pdf.data.data_reader_writer import FileBasedDataWriter, FileBasedDataReader
+from magic_pdf.libs.draw_bbox import draw_layout_bbox, draw_model_bbox
 from tasks.llm_task.chat_task import *
 from tasks.doc_task.base_task import prepare_output_path
+from tasks.doc_task.extraction_cache import ExtractionCache, file_sha256
+from tasks.doc_task.image_store import ImageStore
+from tasks.doc_task.checkpoint import resumable_stages, save_checkpoint_stage
+from utils.timing import StageTimer
+from utils.memory import peak_rss_mb
+from utils.config_loader import ConfigLoader
+from utils.image_hash import group_similar_images
+from utils.outline_index import OutlineIndex
+
+# 分片模式默认参数（shard_pages=0 表示不分片）
+DEFAULT_SHARD_PAGES = 0
+DEFAULT_SHARD_WORKERS = 2
 
 # ------------------------ 核心处理任务 ------------------------
 @task(name="process_pdf_file")
@@ -20,6 +37,14 @@ def process_pdf_file(
     input_dir: Path, 
     output_root: Path,
     final_output_dir: Path,
+    shard_pages: int = DEFAULT_SHARD_PAGES,
+    shard_workers: int = DEFAULT_SHARD_WORKERS,
+    cache_dir: Optional[str] = None,
+    visualize: bool = False,
+    image_base_url: str = "",
+    publish_dir: str = "",
+    image_store_root: str = "",
+    checkpoint: Optional[Dict] = None,
 ) -> Dict:
     """单个文件处理包装任务"""
     logger = get_run_logger()
@@ -28,8 +53,19 @@ def process_pdf_file(
         result = process_pdf_workflow.submit(
             pdf_file=pdf_file,
             working_dir=output_dir,
-            final_output_dir=final_output_dir
+            final_output_dir=final_output_dir,
+            shard_pages=shard_pages,
+            shard_workers=shard_workers,
+            cache_dir=cache_dir,
+            visualize=visualize,
+            image_base_url=image_base_url,
+            publish_dir=publish_dir,
+            image_store_root=image_store_root,
+            checkpoint=checkpoint
         ).result()
+        result["file"] = str(pdf_file)
+        # 进程池模式下为 worker 进程的峰值内存
+        result["peak_rss_mb"] = round(peak_rss_mb(), 1)
         return result
     except Exception as e:
         logger.error(f"文件处理流程失败: {pdf_file.name} - {str(e)}")
@@ -39,19 +75,85 @@ def process_pdf_file(
             "file": str(pdf_file)
         }
 
+# ------------------------ 进程池模式 ------------------------
+def init_pdf_worker(torch_threads: int) -> None:
+    """进程池 worker 初始化：限制每个进程的计算线程数，避免多进程争抢CPU"""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+
+@flow(name="process_pdf_file_worker", task_runner=ThreadPoolTaskRunner())
+def process_pdf_file_worker(kwargs: Dict) -> Dict:
+    """
+    worker 进程内的单文件 flow
+
+    进程池 / 常驻 worker 中没有外层 flow 上下文，process_pdf_file 内部嵌套任务的
+    submit 需要 flow 提供任务运行器。
+    """
+    return process_pdf_file(**kwargs)
+
+
+def run_process_pdf_file(kwargs: Dict) -> Dict:
+    """进程池 worker 入口（需为模块级函数以便序列化）"""
+    return process_pdf_file_worker(kwargs)
+
+
 @task
 def process_pdf_workflow(pdf_file: Path, 
                        working_dir: Path, 
-                       final_output_dir: Path) -> Dict:
-    """PDF处理完整工作流"""
+                       final_output_dir: Path,
+                       shard_pages: int = DEFAULT_SHARD_PAGES,
+                       shard_workers: int = DEFAULT_SHARD_WORKERS,
+                       cache_dir: Optional[str] = None,
+                       visualize: bool = False,
+                       image_base_url: str = "",
+                       publish_dir: str = "",
+                       image_store_root: str = "",
+                       checkpoint: Optional[Dict] = None) -> Dict:
+    """PDF处理完整工作流
+
+    checkpoint 为 {"dir", "key", "sha256", "force"} 时，每个阶段完成后写入检查点，
+    再次处理同一文件时从最后完成的阶段继续；force 中的阶段（及其后阶段）强制重跑，
+    强制重跑 extraction 时同时刷新解析缓存。
+    """
     logger = get_run_logger()
     
     try:
+        completed = resumable_stages(checkpoint)
+        if "markdown" in completed:
+            logger.info(f"⏭️ 检查点: 全部阶段已完成，跳过 {pdf_file.name}")
+            return {
+                "status": "success",
+                "working_files": completed["extraction"],
+                "markdown_result": completed["markdown"],
+                "copy_result": True,
+                "resumed_from": "markdown"
+            }
+
         # 1. 提取内容
-        extract_result = extract_pdf_content.submit(pdf_file, working_dir).result()
+        if "extraction" in completed:
+            logger.info(f"⏭️ 检查点: 解析已完成，从Markdown生成继续 {pdf_file.name}")
+            extract_result = completed["extraction"]
+        else:
+            extract_result = extract_pdf_content.submit(
+                pdf_file, working_dir,
+                shard_pages=shard_pages, shard_workers=shard_workers,
+                cache_dir=cache_dir, visualize=visualize,
+                refresh_cache="extraction" in ((checkpoint or {}).get("force") or [])
+            ).result()
+            save_checkpoint_stage(checkpoint, "extraction", extract_result)
         
         # 2. 生成Markdown
-        markdown_result = generate_markdown.submit(pdf_file, extract_result, working_dir, final_output_dir).result()
+        markdown_result = generate_markdown.submit(
+            pdf_file, extract_result, working_dir, final_output_dir,
+            image_base_url=image_base_url, publish_dir=publish_dir, image_store_root=image_store_root
+        ).result()
+        save_checkpoint_stage(checkpoint, "markdown", markdown_result)
         
         # 3. 复制到最终位置
         # copy_result = copy_to_final_location.submit(markdown_result, final_output_dir).result()
@@ -61,7 +163,8 @@ def process_pdf_workflow(pdf_file: Path,
             "status": "success",
             "working_files": extract_result,
             "markdown_result": markdown_result,
-            "copy_result": copy_result
+            "copy_result": copy_result,
+            "resumed_from": "extraction" if "extraction" in completed else None
         }
         
     except Exception as e:
@@ -75,19 +178,32 @@ def process_pdf_workflow(pdf_file: Path,
     tags=["pdf-processing", "data-extraction", "ocr", "MinerU"],
     log_prints=True
 )
-def extract_pdf_content(pdf_file: Path, output_dir: Path) -> Dict:
+def extract_pdf_content(
+    pdf_file: Path,
+    output_dir: Path,
+    shard_pages: int = DEFAULT_SHARD_PAGES,
+    shard_workers: int = DEFAULT_SHARD_WORKERS,
+    cache_dir: Optional[str] = None,
+    visualize: bool = False,
+    refresh_cache: bool = False
+) -> Dict:
     """PDF文档内容解析流水线 task
     
     核心功能:
     - 使用 MinerU 解析PDF，得到初版的 markdown
     - 自动检测PDF类型（可编辑文本/扫描图像）
     - 生成结构化数据(JSON)和图片资源
-    - 输出可视化分析报告(PDF)
+    - 可选输出可视化分析报告(PDF)，由 middle/model JSON 渲染，缓存命中时同样可生成
     - 生成带图片引用的Markdown文档
 
     参数:
         pdf_file (Path): PDF文件路径，支持本地或网络存储路径
         output_dir (Path): 输出目录，建议使用独立目录防止文件覆盖
+        shard_pages (int): 分片页数，页数超过该值时按页段拆分并行解析（0 表示不分片）
+        shard_workers (int): 分片并行进程数
+        cache_dir (str): 解析结果缓存目录，命中时跳过 MinerU 解析（None 表示不使用缓存）
+        visualize (bool): 是否生成 model/layout 可视化PDF（耗时较大，默认关闭）
+        refresh_cache (bool): 丢弃已有缓存条目重新解析（强制重跑 extraction 阶段）
 
     返回:
         Dict: 包含生成文件元数据的字典，结构如下:
@@ -97,7 +213,10 @@ def extract_pdf_content(pdf_file: Path, output_dir: Path) -> Dict:
             "content_list": "内容清单json路径",
             "middleware_data": "中间数据json结构路径",
             "assets_dir": "资源目录路径",
-            "visualizations": ["可视化报告路径1", "路径2"]
+            "visualizations": ["可视化报告路径1", "路径2"],
+            "page_count": 页数,
+            "parse_mode": "ocr | txt | cached",
+            "timings": {阶段: 耗时秒数}
         }
 
     异常策略:
@@ -105,6 +224,7 @@ def extract_pdf_content(pdf_file: Path, output_dir: Path) -> Dict:
     """
     logger = get_run_logger()
     flow_tracker = f"[PDF:{pdf_file.name}]"
+    timer = StageTimer()
 
     try:
         # 预处理阶段
@@ -117,6 +237,28 @@ def extract_pdf_content(pdf_file: Path, output_dir: Path) -> Dict:
         logger.info(f"🛠️ 创建资源目录: {image_dir.name}")
         image_dir.mkdir(exist_ok=True)
         logger.debug(f"✅ 目录创建验证: {image_dir.exists()}")
+
+        # 解析缓存：PDF内容 + MinerU版本 + 流水线版本 未变化时直接恢复
+        cache = ExtractionCache(cache_dir) if cache_dir else None
+        cache_key = None
+        if cache:
+            with timer.stage("cache_restore"):
+                cache_key = cache.key(file_sha256(pdf_file))
+                if refresh_cache:
+                    cache.invalidate(cache_key)
+                cached = cache.restore(cache_key, output_dir, image_dir, pdf_stem)
+            if cached:
+                logger.info(f"♻️ 命中解析缓存，跳过MinerU解析 {flow_tracker} | 键: {cache_key[:12]}")
+                with fitz.open(pdf_file) as doc:
+                    cached.update(page_count=doc.page_count, parse_mode="cached")
+                if visualize:
+                    with timer.stage("visualize"):
+                        cached["visualization_files"] = render_visualizations(
+                            pdf_file.read_bytes(), output_dir, pdf_stem
+                        )
+                cached["timings"] = timer.as_dict()
+                logger.info(f"⏱️ 阶段耗时 {flow_tracker}: {timer.summary()}")
+                return cached
         
         # 初始化读写器
         logger.debug("🔄 初始化文件读写器...")
@@ -126,106 +268,367 @@ def extract_pdf_content(pdf_file: Path, output_dir: Path) -> Dict:
         
         # 核心处理流程
         logger.info("🔍 开始解析PDF文件结构...")
-        reader = FileBasedDataReader("")
-        pdf_bytes = reader.read(str(pdf_file))
+        with timer.stage("read"):
+            reader = FileBasedDataReader("")
+            pdf_bytes = reader.read(str(pdf_file))
         logger.debug(f"📊 PDF字节大小: {len(pdf_bytes)/1024:.2f} KB")
         
-        ds = PymuDocDataset(pdf_bytes)
         logger.info(f"🤖 PDF类型检测中...")
-        if ds.classify() == SupportedPdfParseMethod.OCR:
-            logger.warning("⚠️ 检测到扫描版PDF，启用OCR识别模式")
-            infer_result = ds.apply(doc_analyze, ocr=True)
-            pipe_result = infer_result.pipe_ocr_mode(image_writer)
-            logger.debug("🖼️ OCR模式处理完成，图片提取数量: %d", len(os.listdir(image_dir)))
+        with timer.stage("classify"):
+            ds = PymuDocDataset(pdf_bytes)
+            ocr = ds.classify() == SupportedPdfParseMethod.OCR
+        page_count = len(ds)
+        if shard_pages > 0 and page_count > shard_pages:
+            # 超大文档：整本统一判定解析模式后按页段拆分并行解析
+            logger.info(f"✂️ 启用分片模式 | 总页数: {page_count} | 每片: {shard_pages} 页 | 并行: {shard_workers}")
+            with timer.stage("shard_parse"):
+                result = extract_pdf_sharded(
+                    pdf_bytes, ocr, output_dir, image_dir, pdf_stem, shard_pages, shard_workers
+                )
         else:
-            logger.info("✅ 检测到可编辑PDF，使用文本提取模式")
-            infer_result = ds.apply(doc_analyze, ocr=False)
-            pipe_result = infer_result.pipe_txt_mode(image_writer)
-            # logger.debug("📝 文本提取完成",)
-
-        # 生成中间文件
-        logger.info("📦 生成结构化数据文件...")
-        content_list_path = output_dir / f"{pdf_stem}_content_list.json"
-        pipe_result.dump_content_list(md_writer, content_list_path.name, image_dir.resolve())
-        logger.debug(f"🗂️ 内容清单文件生成: {content_list_path.stat().st_size} bytes")
-        
-        middle_json_path = output_dir / f"{pdf_stem}_middle.json"
-        pipe_result.dump_middle_json(md_writer, middle_json_path.name)
-        logger.debug(f"📊 中间数据文件生成: {middle_json_path.stat().st_size} bytes")
-
-        # 生成可视化结果
-        logger.info("🎨 生成可视化分析报告...")
-        model_output = output_dir / f"{pdf_stem}_model.pdf"
-        infer_result.draw_model(str(model_output))
-        logger.debug(f"🖼️ 模型可视化文件: {model_output.stat().st_size} bytes")
-        
-        layout_output = output_dir / f"{pdf_stem}_layout.pdf"
-        pipe_result.draw_layout(str(layout_output))
-        logger.debug(f"📐 版面分析文件: {layout_output.stat().st_size} bytes")
-
-        # 生成Markdown内容
-        logger.info("📝 生成Markdown文档...")
-        md_content = pipe_result.get_markdown(os.path.basename(image_dir))
-        md_output = output_dir / f"{pdf_stem}.md"
-        with open(md_output, 'w', encoding='utf-8') as f:
-            f.write(f"# {pdf_stem}\n\n")
-            f.write(md_content)
-        logger.debug(f"📄 Markdown文档生成: {md_output.stat().st_size} chars")
+            with timer.stage("doc_analyze"):
+                if ocr:
+                    logger.warning("⚠️ 检测到扫描版PDF，启用OCR识别模式")
+                    infer_result = ds.apply(doc_analyze, ocr=True)
+                else:
+                    logger.info("✅ 检测到可编辑PDF，使用文本提取模式")
+                    infer_result = ds.apply(doc_analyze, ocr=False)
+            with timer.stage("pipe"):
+                pipe_result = infer_result.pipe_ocr_mode(image_writer) if ocr else infer_result.pipe_txt_mode(image_writer)
+            logger.debug("🖼️ 解析完成，图片提取数量: %d", len(os.listdir(image_dir)))
+
+            # 生成中间文件（model JSON 体积小，保留以便按需渲染可视化）
+            logger.info("📦 生成结构化数据文件...")
+            with timer.stage("dump"):
+                content_list_path = output_dir / f"{pdf_stem}_content_list.json"
+                pipe_result.dump_content_list(md_writer, content_list_path.name, image_dir.resolve())
+                middle_json_path = output_dir / f"{pdf_stem}_middle.json"
+                pipe_result.dump_middle_json(md_writer, middle_json_path.name)
+                infer_result.dump_model(md_writer, f"{pdf_stem}_model.json")
+            logger.debug(f"🗂️ 内容清单文件生成: {content_list_path.stat().st_size} bytes")
+            logger.debug(f"📊 中间数据文件生成: {middle_json_path.stat().st_size} bytes")
+
+            # 生成Markdown内容
+            logger.info("📝 生成Markdown文档...")
+            with timer.stage("markdown"):
+                md_content = pipe_result.get_markdown(os.path.basename(image_dir))
+                md_output = output_dir / f"{pdf_stem}.md"
+                with open(md_output, 'w', encoding='utf-8') as f:
+                    f.write(f"# {pdf_stem}\n\n")
+                    f.write(md_content)
+            logger.debug(f"📄 Markdown文档生成: {md_output.stat().st_size} chars")
+
+            result = {
+                "status": "success",
+                "pdf_stem": pdf_stem,
+                "content_list_path": str(content_list_path),
+                "middle_json_path": str(middle_json_path),
+                "image_dir": str(image_dir),
+                "visualization_files": []
+            }
 
+        with timer.stage("cache_store"):
+            store_extraction_cache(cache, cache_key, result, output_dir)
+
+        # 可视化报告（按需）：从 middle/model JSON 渲染
+        if visualize:
+            logger.info("🎨 生成可视化分析报告...")
+            with timer.stage("visualize"):
+                result["visualization_files"] = render_visualizations(pdf_bytes, output_dir, pdf_stem)
+
+        result.update(
+            page_count=page_count,
+            parse_mode="ocr" if ocr else "txt",
+            timings=timer.as_dict()
+        )
+        logger.info(f"⏱️ 阶段耗时 {flow_tracker}: {timer.summary()}")
         logger.debug(f"🎉 成功完成处理 {flow_tracker}")
-        return {
-            "status": "success",
-            "pdf_stem": pdf_stem,
-            "content_list_path": str(content_list_path),
-            "middle_json_path": str(middle_json_path),
-            "image_dir": str(image_dir),
-            "visualization_files": [str(model_output), str(layout_output)]
-        }
+        return result
         
     except Exception as e:
         logger.error(f"❌ 严重错误 {flow_tracker} 类型: {type(e).__name__}", exc_info=True)
         logger.debug(f"🛑 错误发生时的临时文件状态: {[f.name for f in output_dir.glob('*') if f.is_file()]}")
         raise
 
+def store_extraction_cache(
+    cache: Optional[ExtractionCache],
+    cache_key: Optional[str],
+    result: Dict,
+    output_dir: Path
+) -> None:
+    """写入解析缓存（缓存写入失败只告警，不影响本次处理）"""
+    if not cache:
+        return
+    logger = get_run_logger()
+    try:
+        cache.store(
+            cache_key,
+            result["pdf_stem"],
+            Path(result["content_list_path"]),
+            Path(result["middle_json_path"]),
+            output_dir / f"{result['pdf_stem']}.md",
+            Path(result["image_dir"]),
+            output_dir / f"{result['pdf_stem']}_model.json"
+        )
+        logger.info(f"💾 解析结果已写入缓存 | 键: {cache_key[:12]}")
+    except Exception as e:
+        logger.warning(f"⚠️ 解析缓存写入失败: {str(e)}")
+
+def render_visualizations(pdf_bytes: bytes, output_dir: Path, pdf_stem: str) -> List[str]:
+    """由 middle/model JSON 渲染版面与模型可视化PDF（无需重新推理）"""
+    files = []
+    middle_json_path = output_dir / f"{pdf_stem}_middle.json"
+    if middle_json_path.exists():
+        with open(middle_json_path, 'r', encoding='utf-8') as f:
+            pdf_info = json.load(f)["pdf_info"]
+        layout_name = f"{pdf_stem}_layout.pdf"
+        draw_layout_bbox(pdf_info, pdf_bytes, str(output_dir), layout_name)
+        files.append(str(output_dir / layout_name))
+
+    model_json_path = output_dir / f"{pdf_stem}_model.json"
+    if model_json_path.exists():
+        with open(model_json_path, 'r', encoding='utf-8') as f:
+            model_list = json.load(f)
+        model_name = f"{pdf_stem}_model.pdf"
+        draw_model_bbox(model_list, PymuDocDataset(pdf_bytes), str(output_dir), model_name)
+        files.append(str(output_dir / model_name))
+    return files
+
+
+@task(name="render-pdf-visualizations", description="按需从已有解析结果渲染可视化报告", tags=["pdf-processing", "visualization"])
+def render_pdf_visualizations(pdf_file: Path, output_dir: Path) -> List[str]:
+    """对已解析（或由缓存恢复）的PDF单独补生成可视化报告"""
+    logger = get_run_logger()
+    files = render_visualizations(pdf_file.read_bytes(), output_dir, pdf_file.stem)
+    logger.info(f"🎨 可视化报告生成完成: {[Path(f).name for f in files]}")
+    return files
+
+# ------------------------ 分片模式 ------------------------
+def split_page_ranges(page_count: int, shard_pages: int) -> List[Tuple[int, int]]:
+    """按固定页数切分页段，返回 [(起始页, 结束页(不含)), ...]（页码从0开始）"""
+    return [
+        (start, min(start + shard_pages, page_count))
+        for start in range(0, page_count, shard_pages)
+    ]
+
+
+def extract_pdf_shard(
+    pdf_bytes: bytes,
+    ocr: bool,
+    shard_dir: str,
+    image_dir: str,
+    shard_name: str
+) -> Dict:
+    """解析单个页段（进程池 worker 入口，不依赖 Prefect 运行上下文）
+
+    所有分片共用同一图片目录：MinerU 以裁剪内容哈希命名图片，不会互相覆盖。
+    """
+    timer = StageTimer()
+    Path(shard_dir).mkdir(parents=True, exist_ok=True)
+    image_writer = FileBasedDataWriter(image_dir)
+    md_writer = FileBasedDataWriter(shard_dir)
+
+    with timer.stage("doc_analyze"):
+        ds = PymuDocDataset(pdf_bytes)
+        infer_result = ds.apply(doc_analyze, ocr=ocr)
+    with timer.stage("pipe"):
+        pipe_result = infer_result.pipe_ocr_mode(image_writer) if ocr else infer_result.pipe_txt_mode(image_writer)
+
+    with timer.stage("dump"):
+        content_list_path = Path(shard_dir) / f"{shard_name}_content_list.json"
+        pipe_result.dump_content_list(md_writer, content_list_path.name, str(Path(image_dir).resolve()))
+        middle_json_path = Path(shard_dir) / f"{shard_name}_middle.json"
+        pipe_result.dump_middle_json(md_writer, middle_json_path.name)
+        model_json_path = Path(shard_dir) / f"{shard_name}_model.json"
+        infer_result.dump_model(md_writer, model_json_path.name)
+
+    with timer.stage("markdown"):
+        markdown = pipe_result.get_markdown(os.path.basename(image_dir))
+
+    return {
+        "content_list_path": str(content_list_path),
+        "middle_json_path": str(middle_json_path),
+        "model_json_path": str(model_json_path),
+        "markdown": markdown,
+        "timings": timer.as_dict()
+    }
+
+
+def stitch_shard_results(
+    shard_results: List[Dict],
+    page_offsets: List[int],
+    output_dir: Path,
+    pdf_stem: str
+) -> Tuple[Path, Path, Path]:
+    """按页段顺序拼接分片结果，page_idx 加上分片起始页偏移以保持全局页码"""
+    content_list: List[Dict] = []
+    middle_json: Dict[str, Any] = {}
+    model_list: List[Dict] = []
+    markdown_parts: List[str] = []
+
+    for result, offset in zip(shard_results, page_offsets):
+        with open(result["content_list_path"], 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                item["page_idx"] = item.get("page_idx", 0) + offset
+                content_list.append(item)
+
+        with open(result["middle_json_path"], 'r', encoding='utf-8') as f:
+            shard_middle = json.load(f)
+        for page in shard_middle.get("pdf_info", []):
+            page["page_idx"] = page.get("page_idx", 0) + offset
+        if not middle_json:
+            middle_json = {**shard_middle, "pdf_info": []}
+        middle_json["pdf_info"].extend(shard_middle.get("pdf_info", []))
+
+        with open(result["model_json_path"], 'r', encoding='utf-8') as f:
+            for page in json.load(f):
+                page["page_info"]["page_no"] = page["page_info"].get("page_no", 0) + offset
+                model_list.append(page)
+
+        markdown_parts.append(result["markdown"])
+
+    content_list_path = output_dir / f"{pdf_stem}_content_list.json"
+    with open(content_list_path, 'w', encoding='utf-8') as f:
+        json.dump(content_list, f, ensure_ascii=False, indent=4)
+
+    middle_json_path = output_dir / f"{pdf_stem}_middle.json"
+    with open(middle_json_path, 'w', encoding='utf-8') as f:
+        json.dump(middle_json, f, ensure_ascii=False, indent=4)
+
+    with open(output_dir / f"{pdf_stem}_model.json", 'w', encoding='utf-8') as f:
+        json.dump(model_list, f, ensure_ascii=False, indent=4)
+
+    md_output = output_dir / f"{pdf_stem}.md"
+    with open(md_output, 'w', encoding='utf-8') as f:
+        f.write(f"# {pdf_stem}\n\n")
+        f.write("\n\n".join(markdown_parts))
+
+    return content_list_path, middle_json_path, md_output
+
+
+def extract_pdf_sharded(
+    pdf_bytes: bytes,
+    ocr: bool,
+    output_dir: Path,
+    image_dir: Path,
+    pdf_stem: str,
+    shard_pages: int,
+    shard_workers: int
+) -> Dict:
+    """拆分页段 → 进程池并行解析 → 拼接结果（返回结构与整本解析一致）"""
+    logger = get_run_logger()
+    shard_root = output_dir / f"shards_{pdf_stem}"
+    shard_root.mkdir(parents=True, exist_ok=True)
+
+    src = fitz.open(stream=pdf_bytes, filetype="pdf")
+    ranges = split_page_ranges(src.page_count, shard_pages)
+    shard_jobs = []
+    for start, end in ranges:
+        shard_doc = fitz.open()
+        shard_doc.insert_pdf(src, from_page=start, to_page=end - 1)
+        shard_name = f"{pdf_stem}_p{start + 1:05d}-{end:05d}"
+        shard_jobs.append((shard_doc.tobytes(), str(shard_root / shard_name), shard_name))
+        shard_doc.close()
+    src.close()
+
+    # 每个分片进程平分 CPU 线程
+    torch_threads = max(1, (os.cpu_count() or 1) // max(1, shard_workers))
+    with ProcessPoolExecutor(
+        max_workers=shard_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_pdf_worker,
+        initargs=(torch_threads,)
+    ) as executor:
+        futures = [
+            executor.submit(extract_pdf_shard, shard_bytes, ocr, shard_dir, str(image_dir), shard_name)
+            for shard_bytes, shard_dir, shard_name in shard_jobs
+        ]
+        # 任一分片失败则整份文档失败（缺页会导致页码错位）
+        shard_results = [future.result() for future in futures]
+    shard_timer = StageTimer()
+    for result in shard_results:
+        shard_timer.merge(result["timings"])
+    logger.info(f"🧩 分片解析完成 | 分片数: {len(shard_results)} | 分片内耗时: {shard_timer.summary()}")
+
+    content_list_path, middle_json_path, md_output = stitch_shard_results(
+        shard_results, [start for start, _ in ranges], output_dir, pdf_stem
+    )
+    logger.info(f"🧵 分片结果拼接完成 | 内容清单: {content_list_path.name} | Markdown: {md_output.name}")
+
+    return {
+        "status": "success",
+        "pdf_stem": pdf_stem,
+        "content_list_path": str(content_list_path),
+        "middle_json_path": str(middle_json_path),
+        "image_dir": str(image_dir),
+        "visualization_files": [],
+        "shards": len(shard_results),
+        # 各分片子进程内的阶段耗时累加（并行执行，总和大于墙钟时间）
+        "shard_timings": shard_timer.as_dict()
+    }
+
 @task(name="enhance-markdown-generation", description="Markdown生成优化任务｜集成结构化数据清洗与大纲智能匹配｜MinerU增强版")
 def generate_markdown(
     pdf_file: Path,
     extract_result: Dict,
     output_dir: Path,
-    final_output_dir: Path
+    final_output_dir: Path,
+    image_base_url: str = "",
+    publish_dir: str = "",
+    image_store_root: str = ""
 ) -> Dict:
-    """主协调流程"""
+    """主协调流程
+
+    image_base_url 与 publish_dir 均提供时，图片在生成阶段写入内容寻址存储并发布到
+    publish_dir，Markdown 直接引用最终URL，文件只写一次。
+    """
     logger = get_run_logger()
     trace_id = f"[{extract_result['pdf_stem']}]"
+    timer = StageTimer()
     
     try:
         # 阶段1：数据加载
-        raw_data, content_list_path = load_initial_data.submit(extract_result).result()
+        with timer.stage("load"):
+            raw_data, content_list_path = load_initial_data.submit(extract_result).result()
         
         # 阶段2：数据清洗
-        cleaned_data = clean_text_data.submit(raw_data).result()
+        with timer.stage("clean"):
+            cleaned_data = clean_text_data.submit(raw_data).result()
         
         # 阶段3：大纲处理
-        outline_data, outline_index = process_outline.submit(pdf_file, extract_result['pdf_stem']).result()
+        with timer.stage("outline"):
+            outline_data, outline_index = process_outline.submit(pdf_file, extract_result['pdf_stem']).result()
         
         # 新增阶段3.5：大纲-数据匹配
-        matched_data = match_outline_to_data.submit(cleaned_data, outline_index, extract_result['pdf_stem']).result()
+        with timer.stage("outline_match"):
+            matched_data = match_outline_to_data.submit(cleaned_data, outline_index, extract_result['pdf_stem']).result()
         
-        # 阶段4：内容生成
-        markdown_content = generate_markdown_content.submit(matched_data).result()
+        # 阶段4：内容生成（内部细分为图片发布 / VLM增强 / 拼装）
+        markdown_content, published_images, generation_stats = generate_markdown_content.submit(
+            matched_data,
+            image_base_url=image_base_url,
+            publish_dir=publish_dir,
+            image_store_root=image_store_root
+        ).result()
+        timer.merge(generation_stats.pop("timings"))
         
         # 阶段5：输出持久化
-        output_metadata = persist_output_files(
-            extract_result['pdf_stem'],
-            matched_data,
-            markdown_content,
-            output_dir,
-            final_output_dir
-        )
+        with timer.stage("persist"):
+            output_metadata = persist_output_files(
+                extract_result['pdf_stem'],
+                matched_data,
+                markdown_content,
+                output_dir,
+                final_output_dir
+            )
+        logger.info(f"⏱️ Markdown生成耗时 {trace_id}: {timer.summary()}")
         
         return {
             "status": "success",
             "pdf_stem": extract_result['pdf_stem'],
+            "published_images": published_images,
+            "timings": timer.as_dict(),
+            "enrichment": generation_stats,
             **output_metadata
         }
         
@@ -298,11 +701,14 @@ def extract_outline(pdf_path):
 @task(name="match_outline_to_data", description="执行大纲与数据匹配", tags=["data-matching"])
 def match_outline_to_data(
     cleaned_data: List[Dict], 
-    outline_index: Dict,
+    outline_index: OutlineIndex,
     pdf_stem: str
 ) -> List[Dict]:
     """执行大纲与文本数据的智能匹配
     
+    对 cleaned_data 做一次线性扫描：每个文本条目只在所在页附近的标题中查找
+    （精确匹配优先，其次字符二元组 Dice 相似度），命中后写入大纲层级。
+    
     Args:
         cleaned_data: 清洗后的结构化数据
         outline_index: 大纲索引结构
@@ -313,32 +719,26 @@ def match_outline_to_data(
     """
     logger = get_run_logger()
     trace_id = f"[{pdf_stem}]"
-    total_matches = 0
-    total_items = len(outline_index.get(0, {}).items())
+    total_items = len(outline_index)
     
     try:
-        # 构建反向索引加速匹配
-        text_index = defaultdict(list)
-        for idx, item in enumerate(cleaned_data):
-            if item.get('type') == 'text':
-                clean_text = optimize_str(item.get('text', ''))
-                text_index[clean_text].append(idx)
         # 处理空数据集情况
         if total_items == 0:
             logger.warning(f"⚠️ 检测到空数据集 | 无法执行匹配流程")
             return cleaned_data
-          
-        for outline in outline_index.get(0, {}).items():  # 假设第一页为大纲基准页
-            norm_title, outline_level = outline
-            matched_items = text_index.get(norm_title, [])
-                        
-            # 应用匹配结果
-            for idx in matched_items:
-                item = cleaned_data[idx]
-                item['text_level'] = outline_level
-                total_matches += 1
+
+        used = set()
+        for item in cleaned_data:
+            if item.get('type') != 'text':
+                continue
+            entry_id = outline_index.match(item.get('text', ''), item.get('page_idx', 0), used)
+            if entry_id is None:
+                continue
+            used.add(entry_id)
+            item['text_level'] = outline_index.entries[entry_id]['level']
                 
-        logger.info(f"🔗 匹配完成 | 总匹配: {total_matches}/{total_items} | 准确率: {total_matches/total_items:.1%}")
+        total_matches = len(used)
+        logger.info(f"🔗 匹配完成 | 总匹配: {total_matches}/{total_items} | 覆盖率: {total_matches/total_items:.1%}")
         return cleaned_data
     except Exception as e:
         logger.error(f"❌ 匹配失败 {trace_id}", exc_info=True)
@@ -411,7 +811,7 @@ def clean_text_data(raw_data: List[Dict]) -> List[Dict]:
     return cleaned_data
 
 @task(name="process_outline", description="处理文档大纲", tags=["outline-processing"])
-def process_outline(pdf_file: Path, pdf_stem: str) -> Tuple[List[Dict], Dict]:
+def process_outline(pdf_file: Path, pdf_stem: str) -> Tuple[List[Dict], OutlineIndex]:
     """执行大纲处理与匹配
     
     Args:
@@ -425,48 +825,175 @@ def process_outline(pdf_file: Path, pdf_stem: str) -> Tuple[List[Dict], Dict]:
     trace_id = f"[{pdf_stem}]"
     
     try:
-        # 实际场景应调用真实大纲提取
-        outline_data = extract_outline.submit(pdf_file)
-        outline_data = [
-            {
-              "level": 1,
-              "title": "剂量调整因数 - 使用 Auto/Smart mA 时的噪声指数调整方法",
-              "page": 0
-            },
-            {
-              "level": 2,
-              "title": "例如，若要计算基于已选 ASiR-V 级别的噪声指数 (NI) 的剂量减少，可将下表用于标准重建算法。",
-              "page": 0
-            },
-        ]
+        # 读取PDF内置目录（书签）
+        outline_data = extract_outline.submit(pdf_file).result()
+        if not outline_data:
+            logger.warning(f"⚠️ PDF无内置目录 {trace_id} | 标题层级沿用解析结果")
         
-        # 构建大纲索引
-        outline_index = {}
-        for outline in outline_data:
-            page = outline['page']
-            norm_title = optimize_str(outline['title'])
-            
-            if page not in outline_index:
-                outline_index[page] = {}
-            outline_index[page][norm_title] = outline['level']
+        # 构建按页的大纲索引
+        outline_index = OutlineIndex(outline_data)
                 
-        logger.info(f"📑 大纲处理完成 | 条目: {len(outline_data)} | 索引页数: {len(outline_index)}")
+        logger.info(f"📑 大纲处理完成 | 条目: {len(outline_index)} | 索引页数: {outline_index.pages}")
         return outline_data, outline_index
     except Exception as e:
         logger.error(f"❌ 大纲处理失败 {trace_id}", exc_info=True)
         raise
 
+def enrich_tables_and_images(
+    cleaned_data: List[Dict],
+    max_concurrency: int,
+    dedup_distance: int = -1
+) -> Tuple[Dict[int, str], Dict[str, int]]:
+    """并发执行表格/图片的 VLM 增强，返回 ({条目索引: Markdown片段}, 统计)
+
+    所有请求一次性提交到有界线程池，单项失败只影响该条目（降级为空内容）。
+    dedup_distance >= 0 时先按感知哈希对图片分组，每组只描述代表图，描述分发给组内所有图片。
+    表格不参与去重（数值不同的表格图像可能非常相似）。
+    """
+    logger = get_run_logger()
+    tables = [(idx, item) for idx, item in enumerate(cleaned_data) if item.get('type') == "table"]
+    images = [(idx, item) for idx, item in enumerate(cleaned_data) if item.get('type') == "image"]
+    stats = {"tables": len(tables), "images": len(images), "html_tables": 0,
+             "vlm_calls": 0, "vlm_cache_hits": 0}
+    if not tables and not images:
+        return {}, stats
+
+    start = time.perf_counter()
+
+    # 图片去重预处理：{图片路径: 代表图片路径}
+    image_paths = [item['img_path'] for _, item in images if item.get('img_path')]
+    if dedup_distance >= 0:
+        representative_of = group_similar_images(image_paths, max_distance=dedup_distance)
+    else:
+        representative_of = {path: path for path in image_paths}
+    representatives = list(dict.fromkeys(representative_of.values()))
+    if len(representatives) < len(image_paths):
+        logger.info(f"🧬 近似重复图片去重 | 图片: {len(image_paths)} → 需描述: {len(representatives)}")
+
+    enriched: Dict[int, str] = {}
+    descriptions: Dict[str, str] = {}
+    # 按调用统计缓存命中（全局缓存计数在线程模式下会混入其他文件的查询）
+    image_hits: List[bool] = []
+    with ThreadPoolTaskRunner(max_workers=max_concurrency) as runner:
+        table_futures = [
+            (idx, runner.submit(handle_table, parameters={"item": item, "data": cleaned_data, "index": idx}))
+            for idx, item in tables
+        ]
+        image_futures = [
+            (path, runner.submit(describe_image, parameters={"img_path": path}))
+            for path in representatives
+        ]
+        for idx, future in table_futures:
+            try:
+                enriched[idx] = future.result()
+            except Exception as e:
+                logger.warning(f"⚠️ 条目{idx} 增强失败: {str(e)}")
+                enriched[idx] = ""
+        for path, future in image_futures:
+            try:
+                descriptions[path], hit = future.result()
+                image_hits.append(hit)
+            except Exception as e:
+                logger.warning(f"⚠️ 图片描述失败 {Path(path).name}: {str(e)}")
+                descriptions[path] = ""
+                image_hits.append(False)
+
+    # 按组分发描述（本地渲染，不再产生 VLM 调用）
+    for idx, item in images:
+        representative = representative_of.get(item.get('img_path'))
+        try:
+            enriched[idx] = handle_image.fn(
+                item, cleaned_data, idx,
+                description=descriptions.get(representative, "") if representative else None
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 条目{idx} 增强失败: {str(e)}")
+            enriched[idx] = ""
+
+    table_hits = [item['vlm_cache_hit'] for _, item in tables if 'vlm_cache_hit' in item]
+    hits = sum(table_hits) + sum(image_hits)
+    lookups = len(table_hits) + len(image_hits)
+    # 未命中缓存的查询即实际发出的 VLM 请求（描述失败的图片按未命中计）
+    stats.update(
+        html_tables=sum(1 for _, item in tables if item.get('conversion_method') == "html"),
+        vlm_calls=lookups - hits,
+        vlm_cache_hits=hits
+    )
+    logger.info(
+        f"🖼️ 表格/图片增强完成 | 表格: {len(tables)} | 图片: {len(images)} | 并发: {max_concurrency} | "
+        f"耗时: {time.perf_counter() - start:.1f}s | "
+        f"VLM缓存命中: {hits}/{lookups} ({hits / max(lookups, 1):.1%})"
+    )
+    return enriched, stats
+
+def publish_images(
+    cleaned_data: List[Dict],
+    image_base_url: str,
+    publish_dir: str,
+    image_store_root: str = ""
+) -> List[str]:
+    """将图片条目写入内容寻址存储并发布，为条目写入最终访问地址 image_url
+
+    Returns:
+        已发布的对象名列表
+    """
+    logger = get_run_logger()
+    if not image_store_root:
+        raise ValueError("未指定图片存储目录（应位于静态目录之外）")
+    store = ImageStore(image_store_root)
+    published = []
+    for item in cleaned_data:
+        if item.get('type') != "image" or not item.get('img_path'):
+            continue
+        try:
+            name = store.put(item['img_path'])
+            store.publish(name, publish_dir)
+        except OSError as e:
+            logger.warning(f"⚠️ 图片发布失败 {Path(item['img_path']).name}: {str(e)}")
+            continue
+        item['image_url'] = f"{image_base_url.rstrip('/')}/{name}"
+        published.append(name)
+    logger.info(f"📦 图片发布完成 | {len(published)} 张 | {store.summary()}")
+    return sorted(set(published))
+
 @task(name="generate_markdown", description="生成Markdown内容", tags=["content-generation"])
-def generate_markdown_content(cleaned_data: List[Dict]) -> str:
+def generate_markdown_content(
+    cleaned_data: List[Dict],
+    max_concurrency: Optional[int] = None,
+    image_base_url: str = "",
+    publish_dir: str = "",
+    image_store_root: str = ""
+) -> Tuple[str, List[str], Dict]:
     """生成最终Markdown文档
     
     Args:
         cleaned_data: 清洗后的结构化数据
+        max_concurrency: VLM 并发数（None 时读取转换配置 global.max_concurrency）
+        image_base_url: 图片访问基础URL（为空时保留本地路径）
+        publish_dir: 图片发布目录（服务器静态目录）
+        image_store_root: 内容寻址图片存储目录（位于静态目录之外，发布时必填）
         
     Returns:
-        格式化后的Markdown字符串
+        (格式化后的Markdown字符串, 已发布的图片对象名列表, 统计信息（含 timings 与 VLM 调用数）)
     """
     logger = get_run_logger()
+    timer = StageTimer()
+    converter_config = ConfigLoader(CONVERTER_CONFIG_PATH).config['global']
+    if max_concurrency is None:
+        max_concurrency = converter_config.get('max_concurrency', 4)
+
+    published_images = []
+    if image_base_url and publish_dir:
+        with timer.stage("publish_images"):
+            published_images = publish_images(cleaned_data, image_base_url, publish_dir, image_store_root)
+
+    # 先并发完成全部表格/图片增强，再按原始顺序拼装
+    with timer.stage("vlm_enrichment"):
+        enriched, stats = enrich_tables_and_images(
+            cleaned_data, max_concurrency, converter_config.get('image_dedup_distance', -1)
+        )
+    assemble_start = time.perf_counter()
+
     md_builder = []
     last_page = -1
     
@@ -480,10 +1007,8 @@ def generate_markdown_content(cleaned_data: List[Dict]) -> str:
         content_type = item.get('type')
         if content_type == "text":
             processed = handle_text(item)
-        elif content_type == "table":
-            processed = handle_table.submit(item, cleaned_data, idx).result()
-        elif content_type == "image":
-            processed = handle_image.submit(item, cleaned_data, idx).result()
+        elif content_type in ("table", "image"):
+            processed = enriched[idx]
         elif content_type == "equation":
             processed = handle_equation(item)
         else:
@@ -492,7 +1017,9 @@ def generate_markdown_content(cleaned_data: List[Dict]) -> str:
         md_builder.append(processed)
         logger.debug(f"✏️ 内容处理 @条目{idx} | 类型: {content_type} | 长度: {len(processed)}")
         
-    return "\n".join(md_builder)
+    timer.add("assemble", time.perf_counter() - assemble_start)
+    stats["timings"] = timer.as_dict()
+    return "\n".join(md_builder), published_images, stats
 
 @task(name="persist_outputs", description="持久化输出文件", tags=["output-persistence"])
 def persist_output_files(
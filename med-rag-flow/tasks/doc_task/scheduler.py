@@ -0,0 +1,213 @@
+"""
+PDF 作业调度与进度估算
+
+处理前先读取每个PDF的页数（只解析交叉引用表，不渲染页面），按策略排列提交顺序:
+- sjf:           页数少的先处理（默认），小文档不会被超大手册阻塞
+- largest_first: 页数多的先处理，尾部用小文件填满 worker，总耗时更短
+- priority:      按用户优先级（数值大者优先），同优先级内按 sjf
+- name:          按文件名（原行为）
+
+线程池 / 进程池 / 常驻 worker 池都按提交顺序先进先出领取作业，ProgressTracker
+据此推算每个文件的开始与完成时间，按已完成文件的实际吞吐（页/秒）估算ETA。
+"""
+import heapq
+import time
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fitz
+
+SCHEDULE_POLICIES = ("sjf", "largest_first", "priority", "name")
+DEFAULT_SCHEDULE_POLICY = "sjf"
+DEFAULT_PAGES_PER_SEC = 0.5        # 尚无完成文件时单个 worker 的吞吐假设（页/秒）
+DEFAULT_PUBLISH_INTERVAL = 5.0     # 进度上报最小间隔（秒）
+
+
+def validate_schedule_policy(policy: str) -> str:
+    if policy not in SCHEDULE_POLICIES:
+        raise ValueError(f"未知调度策略: {policy}，可选: {list(SCHEDULE_POLICIES)}")
+    return policy
+
+
+def read_page_count(pdf_file) -> int:
+    """读取PDF页数，无法打开时返回 0"""
+    try:
+        with fitz.open(pdf_file) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+
+def file_priority(key: str, priorities: Optional[Dict[str, int]]) -> int:
+    """
+    文件优先级
+
+    priorities 的键可以是相对路径或通配符（如 "urgent/*.pdf"），
+    精确匹配优先，否则取匹配到的通配符中的最大值，未匹配为 0。
+    """
+    if not priorities:
+        return 0
+    if key in priorities:
+        return priorities[key]
+    matched = [value for pattern, value in priorities.items() if fnmatch(key, pattern)]
+    return max(matched) if matched else 0
+
+
+def schedule_order(
+    page_counts: Dict[str, int],
+    policy: str = DEFAULT_SCHEDULE_POLICY,
+    priorities: Optional[Dict[str, int]] = None,
+) -> List[str]:
+    """
+    Args:
+        page_counts: {相对路径: 页数}
+        policy: 调度策略
+        priorities: {相对路径或通配符: 优先级}，仅 priority 策略使用
+
+    Returns:
+        按处理顺序排列的相对路径
+    """
+    validate_schedule_policy(policy)
+
+    def sort_key(name: str) -> tuple:
+        if policy == "sjf":
+            return (page_counts[name], name)
+        if policy == "largest_first":
+            return (-page_counts[name], name)
+        if policy == "priority":
+            return (-file_priority(name, priorities), page_counts[name], name)
+        return (name,)
+
+    return sorted(page_counts, key=sort_key)
+
+
+class ProgressTracker:
+    """按先进先出的提交顺序跟踪文件状态并估算ETA"""
+
+    def __init__(
+        self,
+        files: List[Tuple[str, int]],
+        concurrency: int,
+        policy: str = DEFAULT_SCHEDULE_POLICY,
+        publish: Optional[Callable[[Dict], None]] = None,
+        publish_interval: float = DEFAULT_PUBLISH_INTERVAL,
+        default_pages_per_sec: float = DEFAULT_PAGES_PER_SEC,
+    ):
+        """
+        Args:
+            files: [(相对路径, 页数)]，与提交顺序一致
+            concurrency: 同时处理的文件数
+            publish: 进度快照回调（如上报服务器），异常由调用方自行处理
+        """
+        self.concurrency = max(1, concurrency)
+        self.policy = policy
+        self.publish = publish
+        self.publish_interval = publish_interval
+        self.default_pages_per_sec = default_pages_per_sec
+        self._order = [name for name, _ in files]
+        self._files = {
+            name: {"file": name, "pages": pages, "status": "queued", "started": None, "seconds": None}
+            for name, pages in files
+        }
+        self._measured_pages = 0
+        self._measured_seconds = 0.0
+        self._last_publish = 0.0
+
+    def start(self) -> None:
+        self._promote()
+        self.maybe_publish(force=True)
+
+    def _promote(self) -> None:
+        """空出的 worker 依提交顺序领取下一个排队文件"""
+        running = sum(1 for info in self._files.values() if info["status"] == "running")
+        now = time.monotonic()
+        for name in self._order:
+            if running >= self.concurrency:
+                break
+            info = self._files[name]
+            if info["status"] == "queued":
+                info.update(status="running", started=now)
+                running += 1
+
+    def complete(self, name: str, success: bool, measured: bool = True) -> None:
+        """
+        标记文件完成
+
+        Args:
+            measured: 是否计入吞吐统计（解析缓存命中、检查点恢复的文件不计入）
+        """
+        info = self._files.get(name)
+        if info is None:
+            return
+        started = info["started"] or time.monotonic()
+        info.update(status="completed" if success else "failed", seconds=time.monotonic() - started)
+        if success and measured and info["pages"]:
+            self._measured_pages += info["pages"]
+            self._measured_seconds += info["seconds"]
+        self._promote()
+        self.maybe_publish()
+
+    def pages_per_sec(self) -> float:
+        """单个 worker 的实测吞吐，尚无样本时使用默认值"""
+        if self._measured_pages and self._measured_seconds > 0:
+            return self._measured_pages / self._measured_seconds
+        return self.default_pages_per_sec
+
+    def estimate(self) -> Dict[str, float]:
+        """{相对路径: 距完成的预计秒数}，模拟 worker 依次领取排队文件"""
+        rate = self.pages_per_sec()
+        now = time.monotonic()
+        workers: List[float] = []
+        etas: Dict[str, float] = {}
+        for name in self._order:
+            info = self._files[name]
+            if info["status"] == "running":
+                remaining = max(0.0, max(info["pages"], 1) / rate - (now - info["started"]))
+                etas[name] = remaining
+                workers.append(remaining)
+        workers += [0.0] * (self.concurrency - len(workers))
+        heapq.heapify(workers)
+        for name in self._order:
+            info = self._files[name]
+            if info["status"] == "queued":
+                finish = heapq.heappop(workers) + max(info["pages"], 1) / rate
+                etas[name] = finish
+                heapq.heappush(workers, finish)
+        return etas
+
+    def snapshot(self) -> Dict:
+        etas = self.estimate()
+        files = []
+        for name in self._order:
+            info = self._files[name]
+            files.append({
+                "file": name,
+                "pages": info["pages"],
+                "status": info["status"],
+                "eta_seconds": round(etas[name], 1) if name in etas else None,
+                "seconds": round(info["seconds"], 1) if info["seconds"] is not None else None,
+            })
+        done = [info for info in self._files.values() if info["status"] in ("completed", "failed")]
+        return {
+            "policy": self.policy,
+            "total_files": len(self._files),
+            "completed_files": sum(1 for info in done if info["status"] == "completed"),
+            "failed_files": sum(1 for info in done if info["status"] == "failed"),
+            "total_pages": sum(info["pages"] for info in self._files.values()),
+            "completed_pages": sum(info["pages"] for info in done),
+            "pages_per_sec": round(self.pages_per_sec() * self.concurrency, 3),
+            "eta_seconds": round(max(etas.values()), 1) if etas else 0.0,
+            "files": files,
+            "updated_at": datetime.now().isoformat(),
+        }
+
+    def maybe_publish(self, force: bool = False) -> None:
+        if self.publish is None:
+            return
+        now = time.monotonic()
+        remaining = any(info["status"] in ("queued", "running") for info in self._files.values())
+        if not force and remaining and now - self._last_publish < self.publish_interval:
+            return
+        self._last_publish = now
+        self.publish(self.snapshot())
@@ -1,21 +1,50 @@
 import os
+import json
 import hashlib
 import logging
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from langchain.schema import Document
 from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import FAISS
 
+from utils.timing import StageTimer
+from tasks.embedding.question_index import (
+    QUESTION_INDEX_DIRNAME,
+    build_question_index,
+    generate_questions_for_chunks,
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 父段落存储文件名（与服务端加载逻辑保持一致）
+PARENT_STORE_FILENAME = "parents.json"
+
+
+def assign_chunk_ids(docs: List[Document]) -> None:
+    """为分块分配确定性 chunk_id（来源 + 内容哈希），已有则保留"""
+    used = {doc.metadata["chunk_id"] for doc in docs if "chunk_id" in doc.metadata}
+    for doc in docs:
+        if "chunk_id" in doc.metadata:
+            continue
+        base_id = hashlib.sha1(
+            f"{doc.metadata.get('source', '')}\x00{doc.page_content}".encode("utf-8")
+        ).hexdigest()[:16]
+        chunk_id, suffix = base_id, 1
+        while chunk_id in used:
+            chunk_id = f"{base_id}-{suffix}"
+            suffix += 1
+        used.add(chunk_id)
+        doc.metadata["chunk_id"] = chunk_id
+
 class VectorStoreManager:
     """向量存储管理器，支持内容感知存储和增量更新"""
     
     def __init__(self, 
                  config: Dict,
                  docs: List[Document],
-                 auto_init: bool = True):
+                 auto_init: bool = True,
+                 parent_store: Optional[Dict[str, Dict]] = None):
         """
         参数说明：
         config: 配置字典，结构示例：
@@ -31,16 +60,22 @@ class VectorStoreManager:
             }
         docs: 预处理完成的文档列表
         auto_init: 是否自动初始化存储
+        parent_store: 父子分块的父段落存储 {parent_id: {"source", "header_path", "content"}}，
+            保存为存储目录下的 parents.json
         """
         # 配置验证
         if not self._validate_config(config):
             raise ValueError("Invalid configuration structure")
             
         self.config = config
+        assign_chunk_ids(docs)
         self._original_docs = docs.copy()
         self.docs = docs
+        self.parent_store = parent_store or {}
         self.vectorstore: Optional[FAISS] = None
         self.vector_store_path = self._generate_store_path()
+        # 阶段耗时：embedding（向量计算）/ indexing（索引增删与落盘）/ question_index
+        self.timer = StageTimer()
         
         if auto_init:
             self.initialize_store()
@@ -103,10 +138,14 @@ class VectorStoreManager:
     def create_vector_store(self, docs: List[Document]):
         """创建/覆盖向量存储"""
         logger.info(f"重建向量存储，处理文档数: {len(docs)}")
-        self.vectorstore = FAISS.from_documents(
-            docs,
-            self.get_embeddings()
-        )
+        assign_chunk_ids(docs)
+        # 以 chunk_id 作为 docstore 键，便于二级索引（假设问题）映射回分块
+        with self.timer.stage("embedding"):
+            self.vectorstore = FAISS.from_documents(
+                docs,
+                self.get_embeddings(),
+                ids=[doc.metadata["chunk_id"] for doc in docs]
+            )
         self._save_vector_store()
 
     def update_documents(self, new_docs: List[Document]):
@@ -117,6 +156,7 @@ class VectorStoreManager:
             return
 
         # 替换当前文档集合
+        assign_chunk_ids(new_docs)
         self.docs = new_docs.copy()
         
         # 重新生成存储路径（可选，根据需求决定是否保留路径）
@@ -137,7 +177,12 @@ class VectorStoreManager:
         os.makedirs(os.path.dirname(self.vector_store_path), exist_ok=True)
         logger.info(f"保存存储到: {self.vector_store_path}")
         try:
-            self.vectorstore.save_local(self.vector_store_path)
+            with self.timer.stage("indexing"):
+                self.vectorstore.save_local(self.vector_store_path)
+                if self.parent_store:
+                    parent_path = os.path.join(self.vector_store_path, PARENT_STORE_FILENAME)
+                    with open(parent_path, "w", encoding="utf-8") as f:
+                        json.dump(self.parent_store, f, ensure_ascii=False)
         except Exception as e:
             logger.error(f"存储保存失败: {str(e)}")
             raise
@@ -158,6 +203,152 @@ class VectorStoreManager:
                 return False
         return False
 
+    def build_question_index(self, question_params: Dict) -> int:
+        """
+        构建假设问题子索引（保存到 <存储路径>/questions）
+
+        参数说明：
+        question_params: model / base_url / num_questions / max_workers / cache_dir / batch_size
+
+        返回：索引中的问题数（已存在时跳过并返回 0）
+        """
+        if not self.vectorstore:
+            raise RuntimeError("向量存储未初始化")
+        index_path = os.path.join(self.vector_store_path, QUESTION_INDEX_DIRNAME)
+        if os.path.exists(index_path):
+            logger.info(f"问题索引已存在，跳过: {index_path}")
+            return 0
+
+        with self.timer.stage("question_index"):
+            question_store = self._generate_question_store(self.docs, question_params)
+            if question_store is None:
+                logger.warning("未生成任何假设问题，跳过问题索引")
+                return 0
+            question_store.save_local(index_path)
+        count = question_store.index.ntotal
+        logger.info(f"问题索引保存到: {index_path}（{count} 条）")
+        return count
+
+    def _generate_question_store(self, docs: List[Document], question_params: Dict) -> Optional[FAISS]:
+        """为给定分块生成假设问题并构建问题索引"""
+        questions = generate_questions_for_chunks(
+            docs,
+            model=question_params.get("model", "deepseek-r1:8b"),
+            base_url=question_params.get("base_url", self.config["models"]["base_url"]),
+            num_questions=question_params.get("num_questions", 3),
+            max_workers=question_params.get("max_workers", 4),
+            cache_dir=question_params.get("cache_dir"),
+        )
+        return build_question_index(
+            questions,
+            self.get_embeddings(),
+            batch_size=question_params.get("batch_size", 64),
+        )
+
+    # ------------------ 增量更新 ------------------
+    @classmethod
+    def load_existing(cls, config: Dict, store_name: str) -> Optional["VectorStoreManager"]:
+        """加载已有存储（含父段落存储），不存在或加载失败时返回 None"""
+        store_path = os.path.join(config["vector_store"]["base_path"], store_name)
+        if not os.path.exists(store_path):
+            return None
+        manager = cls(config, [], auto_init=False)
+        manager.vector_store_path = store_path
+        manager.vector_store_path_name = store_name
+        if not manager._try_load_existing_store():
+            return None
+        manager.docs = manager._stored_docs()
+        manager._original_docs = manager.docs.copy()
+        parent_path = os.path.join(store_path, PARENT_STORE_FILENAME)
+        if os.path.exists(parent_path):
+            with open(parent_path, "r", encoding="utf-8") as f:
+                manager.parent_store = json.load(f)
+        return manager
+
+    def _stored_docs(self) -> List[Document]:
+        """按索引顺序取出存储中的全部分块"""
+        return [
+            self.vectorstore.docstore.search(doc_id)
+            for doc_id in self.vectorstore.index_to_docstore_id.values()
+        ]
+
+    def apply_changes(
+        self,
+        remove_chunk_ids: Iterable[str],
+        new_docs: List[Document],
+        remove_parent_ids: Iterable[str] = (),
+        new_parents: Optional[Dict[str, Dict]] = None,
+        question_params: Optional[Dict] = None,
+    ) -> bool:
+        """
+        增量更新：删除指定分块、追加新分块，保存为新的内容版本
+
+        旧版本目录保持不变（服务端切换路径前仍可使用）。
+
+        返回：是否产生了新版本
+        """
+        if not self.vectorstore:
+            raise RuntimeError("向量存储未初始化")
+        existing_ids = set(self.vectorstore.index_to_docstore_id.values())
+        to_delete = [chunk_id for chunk_id in dict.fromkeys(remove_chunk_ids) if chunk_id in existing_ids]
+        if not to_delete and not new_docs:
+            logger.info("向量存储无变化，沿用当前版本")
+            return False
+
+        if to_delete:
+            with self.timer.stage("indexing"):
+                self.vectorstore.delete(to_delete)
+            logger.info(f"移除分块: {len(to_delete)} 个")
+        if new_docs:
+            assign_chunk_ids(new_docs)
+            with self.timer.stage("embedding"):
+                self.vectorstore.add_documents(new_docs, ids=[doc.metadata["chunk_id"] for doc in new_docs])
+            logger.info(f"新增分块: {len(new_docs)} 个")
+
+        for parent_id in remove_parent_ids:
+            self.parent_store.pop(parent_id, None)
+        self.parent_store.update(new_parents or {})
+
+        previous_path = self.vector_store_path
+        self.docs = self._stored_docs()
+        self.vector_store_path = self._generate_store_path()
+        self._save_vector_store()
+
+        if question_params:
+            with self.timer.stage("question_index"):
+                self._update_question_index(previous_path, to_delete, new_docs, question_params)
+        return True
+
+    def _update_question_index(
+        self,
+        previous_path: str,
+        removed_chunk_ids: List[str],
+        new_docs: List[Document],
+        question_params: Dict,
+    ) -> None:
+        """增量更新问题索引：删除已移除分块的问题，只为新分块生成问题"""
+        previous_index = os.path.join(previous_path, QUESTION_INDEX_DIRNAME)
+        if not os.path.exists(previous_index):
+            self.build_question_index(question_params)
+            return
+        question_store = FAISS.load_local(
+            previous_index, self.get_embeddings(), allow_dangerous_deserialization=True
+        )
+        removed = set(removed_chunk_ids)
+        stale = [
+            doc_id for doc_id, doc in question_store.docstore._dict.items()
+            if doc.metadata.get("chunk_id") in removed
+        ]
+        if stale:
+            question_store.delete(stale)
+        if new_docs:
+            new_store = self._generate_question_store(new_docs, question_params)
+            if new_store is not None:
+                question_store.merge_from(new_store)
+        index_path = os.path.join(self.vector_store_path, QUESTION_INDEX_DIRNAME)
+        question_store.save_local(index_path)
+        logger.info(f"问题索引增量更新: 移除 {len(stale)} 条 | 当前 {question_store.index.ntotal} 条")
+
     def get_embeddings(self) -> OllamaEmbeddings:
         """获取嵌入模型实例"""
         return OllamaEmbeddings(
@@ -172,6 +363,7 @@ class VectorStoreManager:
             "doc_count": len(self.docs),
             "content_hash": self.compute_content_hash(),
             "store_path": self.vector_store_path,
+            "parent_count": len(self.parent_store),
             "versions": self.list_versions()
         }
 
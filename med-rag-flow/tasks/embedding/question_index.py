@@ -0,0 +1,139 @@
+"""
+假设问题索引（入库阶段的二级检索路径）
+
+为每个分块生成若干假设问题并向量化, 存为向量存储目录下的 questions 子索引。
+问题向量的元数据记录所属分块的 chunk_id, 查询时 问题-问题 匹配命中后映射回分块,
+无需在线为每个请求调用 LLM 生成 HyDE 文档。
+"""
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from tasks.query_transformations import generate_hypothetical_questions
+
+logger = logging.getLogger(__name__)
+
+# 问题子索引目录名（与服务端加载逻辑保持一致）
+QUESTION_INDEX_DIRNAME = "questions"
+
+
+class QuestionCache:
+    """假设问题的磁盘缓存（按 模型 + 问题数 + 分块内容 哈希）"""
+
+    def __init__(self, cache_dir: Optional[str]):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(model: str, num_questions: int, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{num_questions}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        if not self.cache_dir:
+            return None
+        path = self.cache_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, questions: List[str]) -> None:
+        if not self.cache_dir:
+            return
+        path = self.cache_dir / f"{key}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(questions, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def generate_questions_for_chunks(
+    docs: List[Document],
+    model: str,
+    base_url: str,
+    num_questions: int = 3,
+    max_workers: int = 4,
+    cache_dir: Optional[str] = None,
+) -> Dict[str, List[str]]:
+    """
+    并发为分块生成假设问题
+
+    Args:
+        docs: 带 chunk_id 元数据的分块
+        model: 问题生成模型
+        base_url: Ollama服务地址
+        num_questions: 每个分块生成的问题数
+        max_workers: 最大并发 LLM 请求数
+        cache_dir: 缓存目录（None 表示不缓存）
+
+    Returns:
+        {chunk_id: [问题, ...]}，生成失败的分块不出现在结果中
+    """
+    cache = QuestionCache(cache_dir)
+    results: Dict[str, List[str]] = {}
+    pending = []
+    for doc in docs:
+        key = cache.key(model, num_questions, doc.page_content)
+        cached = cache.get(key)
+        if cached is not None:
+            results[doc.metadata["chunk_id"]] = cached
+        else:
+            pending.append((doc, key))
+    logger.info(f"假设问题生成: 缓存命中 {len(results)} / 待生成 {len(pending)}")
+
+    def _generate(item):
+        doc, key = item
+        questions = generate_hypothetical_questions(
+            doc.page_content,
+            model=model,
+            num_questions=num_questions,
+            base_url=base_url,
+        )
+        if questions:
+            cache.set(key, questions)
+        return doc.metadata["chunk_id"], questions
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_id, questions in executor.map(_generate, pending):
+            if questions:
+                results[chunk_id] = questions
+            else:
+                logger.warning(f"分块 {chunk_id} 未生成问题")
+    return results
+
+
+def build_question_index(
+    questions_by_chunk: Dict[str, List[str]],
+    embeddings: Embeddings,
+    batch_size: int = 64,
+) -> Optional[FAISS]:
+    """分批向量化问题并构建问题索引（元数据记录 chunk_id）"""
+    texts: List[str] = []
+    metadatas: List[Dict] = []
+    for chunk_id, questions in questions_by_chunk.items():
+        for question in questions:
+            texts.append(question)
+            metadatas.append({"chunk_id": chunk_id})
+    if not texts:
+        return None
+
+    vectors: List[List[float]] = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    logger.info(f"问题向量化完成: {len(texts)} 条（批大小 {batch_size}）")
+
+    return FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings,
+        metadatas=metadatas,
+    )
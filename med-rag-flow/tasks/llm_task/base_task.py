@@ -1,15 +1,28 @@
 from pathlib import Path
 from prefect import get_run_logger, task, flow
 import requests
-from typing import Optional
+from typing import Optional, Tuple, Union
 import base64
+import hashlib
 import re
 from PIL import Image
 import io
 import json
+import os
+import uuid
 import yaml
 
 from utils.config_loader import ConfigLoader
+from tasks.llm_task.vlm_cache import VLMCache
+
+IMAGE_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "BMP": "image/bmp",
+    "TIFF": "image/tiff",
+}
 
 
 class TableImageConverterTasks:
@@ -22,8 +35,12 @@ class TableImageConverterTasks:
         description="图片验证与Base64编码任务",
         tags=["image-processing", "validation"],
     )
-    def validate_and_encode_image_task(self, image_path: str) -> str:
-        """执行图片验证和Base64编码"""
+    def validate_and_encode_image_task(self, image_path: str) -> dict:
+        """执行图片验证、缩放重编码和Base64编码
+
+        Returns:
+            {"mime": 实际编码格式的MIME类型, "base64": Base64数据}
+        """
         path = Path(image_path)
         logger = get_run_logger()
         try:
@@ -32,12 +49,33 @@ class TableImageConverterTasks:
                 
             with open(path, "rb") as f:
                 file_data = f.read()
+
+            # 编码结果缓存：原图内容 + 预处理参数
+            cache_path = self._payload_cache_path(file_data)
+            if cache_path and cache_path.exists():
+                try:
+                    return json.loads(cache_path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass
                 
             with Image.open(io.BytesIO(file_data)) as img:
                 img.verify()
                 
             logger.info(f"✅ 图片验证成功: {image_path}")
-            return base64.b64encode(file_data).decode("utf-8")
+            encoded, mime = self._prepare_image_bytes(file_data)
+            saved = len(file_data) - len(encoded)
+            logger.info(
+                f"🗜️ 图片预处理 | {len(file_data) / 1024:.1f}KB → {len(encoded) / 1024:.1f}KB "
+                f"| 节省 {saved / 1024:.1f}KB ({saved / max(len(file_data), 1):.0%}) | {mime}"
+            )
+            payload = {"mime": mime, "base64": base64.b64encode(encoded).decode("utf-8")}
+
+            if cache_path:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = cache_path.with_name(f".{cache_path.stem}.{uuid.uuid4().hex}.tmp")
+                tmp_path.write_text(json.dumps(payload), encoding="utf-8")
+                os.replace(tmp_path, cache_path)
+            return payload
             
         except Exception as e:
             logger.error(f"图片处理失败: {str(e)}")
@@ -50,12 +88,20 @@ class TableImageConverterTasks:
     )
     def construct_payload_task(
         self, 
-        base64_image: str, 
+        base64_image: Union[str, dict], 
         task_name: str = "table_conversion",
         custom_user_prompt: Optional[str] = None  # 新增参数
     ) -> dict:
-        """动态构建API请求体"""
+        """动态构建API请求体
+
+        base64_image 为 validate_and_encode_image_task 的返回结果；
+        兼容旧的纯 Base64 字符串（按 JPEG 处理）。
+        """
         logger = get_run_logger()
+        if isinstance(base64_image, dict):
+            mime, image_data = base64_image["mime"], base64_image["base64"]
+        else:
+            mime, image_data = "image/jpeg", base64_image
         task_config = self.config['tasks'].get(task_name)
         
         if not task_config:
@@ -82,7 +128,7 @@ class TableImageConverterTasks:
                     "content": [
                         {"type": "text", "text": user_text},
                         {"type": "image_url", "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
+                            "url": f"data:{mime};base64,{image_data}"
                         }}
                     ]
                 }
@@ -180,7 +226,68 @@ class TableImageConverterTasks:
             logger.error(f"响应处理异常: {str(e)}")
             raise
 
+    def task_model(self, task_name: str) -> str:
+        """任务实际使用的模型名"""
+        return self.config['tasks'][task_name].get('model_name', 'gemma3:12b')
+
+    def vlm_cache_key(self, image_path: str, task_name: str) -> str:
+        """VLM 缓存键：图片内容 + 任务名 + 提示词（系统/用户）哈希 + 模型名"""
+        task_config = self.config['tasks'].get(task_name)
+        if not task_config:
+            raise ValueError(f"无效的任务名称: {task_name}")
+        with open(image_path, "rb") as f:
+            image_sha256 = hashlib.sha256(f.read()).hexdigest()
+        prompt = self._load_prompt_content(task_config['prompt_file'])
+        # 图片预处理参数影响模型实际看到的图片，一并计入
+        prompt_sha256 = hashlib.sha256(
+            f"{prompt}\x00{task_config.get('user_prompt', '')}\x00{self._preprocess_signature()}".encode("utf-8")
+        ).hexdigest()
+        return VLMCache.key(image_sha256, task_name, prompt_sha256, self.task_model(task_name))
+
     # ------------------ 私有工具方法 ------------------
+    def _preprocess_signature(self) -> str:
+        """图片预处理参数签名"""
+        cfg = self.config['global']
+        return f"{cfg.get('image_max_edge', 1600)}:{cfg.get('image_format', 'JPEG')}:{cfg.get('image_quality', 85)}"
+
+    def _payload_cache_path(self, file_data: bytes) -> Optional[Path]:
+        cache_dir = self.config['global'].get('payload_cache_dir')
+        if not cache_dir:
+            return None
+        key = hashlib.sha256(file_data + self._preprocess_signature().encode("utf-8")).hexdigest()
+        return Path(cache_dir) / key[:2] / f"{key}.json"
+
+    def _prepare_image_bytes(self, file_data: bytes) -> Tuple[bytes, str]:
+        """按最长边缩放并重新编码；结果不比原图小且未缩放时保留原图
+
+        Returns:
+            (图片字节, MIME类型)
+        """
+        cfg = self.config['global']
+        max_edge = int(cfg.get('image_max_edge', 1600))
+        target_format = str(cfg.get('image_format', 'JPEG')).upper()
+        quality = int(cfg.get('image_quality', 85))
+
+        with Image.open(io.BytesIO(file_data)) as img:
+            source_format = img.format
+            img.load()
+            resized = max(img.size) > max_edge
+            if resized:
+                img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            if target_format == "JPEG" and img.mode not in ("RGB", "L"):
+                # JPEG 不支持透明通道：铺白底
+                rgba = img.convert("RGBA")
+                background = Image.new("RGB", rgba.size, (255, 255, 255))
+                background.paste(rgba, mask=rgba.split()[-1])
+                img = background
+            buffer = io.BytesIO()
+            img.save(buffer, format=target_format, quality=quality, optimize=True)
+            encoded = buffer.getvalue()
+
+        if not resized and len(encoded) >= len(file_data) and source_format in IMAGE_MIME_TYPES:
+            return file_data, IMAGE_MIME_TYPES[source_format]
+        return encoded, IMAGE_MIME_TYPES.get(target_format, "image/jpeg")
+
     def _load_prompt_content(self, prompt_file: str) -> str:
         """从独立文件加载提示词"""
         try:
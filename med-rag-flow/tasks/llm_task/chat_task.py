@@ -1,12 +1,30 @@
 import json
 from pathlib import Path
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import sys
+import threading
 
 from prefect import get_run_logger, task
 from utils.table_image_converter import TableImageConverter
+from utils.html_table import html_table_to_markdown
 from tasks.llm_task.base_task import TableImageConverterTasks
+from tasks.llm_task.vlm_cache import VLMCache
+
+# 表格/图片转换配置（相对 flows 工作目录）
+CONVERTER_CONFIG_PATH = "../config/task/image_table_process.yaml"
+
+_vlm_cache: VLMCache = None
+_vlm_cache_lock = threading.Lock()
+
+
+def get_vlm_cache(converter: TableImageConverterTasks) -> VLMCache:
+    """进程内共享的 VLM 结果缓存（按配置 global.cache_dir 懒加载）"""
+    global _vlm_cache
+    with _vlm_cache_lock:
+        if _vlm_cache is None:
+            _vlm_cache = VLMCache(converter.config['global'].get('cache_dir'))
+        return _vlm_cache
 # ------------------------ 新增批量处理任务 ------------------------
 def handle_text(item: Dict) -> str:
     """处理文本类型元素"""
@@ -20,27 +38,51 @@ def handle_text(item: Dict) -> str:
      tags=["image", "table", "llm"]
 )
 def handle_table(item: Dict, data: List[Dict], index: int) -> str:
-    """带完整日志的表格处理方法"""
+    """带完整日志的表格处理方法
+
+    优先将 MinerU 提供的 table_body(HTML) 本地转换为 Markdown；
+    HTML 缺失或结构异常时才回退到 VLM 识别表格图片。
+    """
+    logger = get_run_logger()
     item.setdefault('conversion_success', False)
     item['markdown_table'] = ""
     item['error_message'] = ""
+    item.pop('vlm_cache_hit', None)
     try:
+        if (table_result := html_table_to_markdown(item.get('table_body', ''))) is not None:
+            logger.info(f"⚡ 表格本地转换完成 @条目{index} | 行数: {table_result.count(chr(10)) + 1}")
+            item.update({
+                'markdown_table': table_result,
+                'conversion_success': True,
+                'conversion_method': "html"
+            })
+            return f"\n{table_result}\n"
+
         if not (img_path := item.get('img_path')):
             raise ValueError("Missing img_path in table item")
 
-        converter = TableImageConverterTasks(config_path="../config/task/image_table_process.yaml")
-        
-        # 公共处理流程
-        encoded_image = converter.validate_and_encode_image_task.submit(img_path).result()
+        logger.info(f"🔁 表格HTML缺失或结构异常，回退VLM识别 @条目{index}")
+        converter = TableImageConverterTasks(config_path=CONVERTER_CONFIG_PATH)
+        cache = get_vlm_cache(converter)
+        cache_key = converter.vlm_cache_key(img_path, "table_conversion")
         
-        # 表格转换子流程
-        table_payload = converter.construct_payload_task.submit(encoded_image, task_name="table_conversion").result()
-        table_response = converter.send_api_request_task.submit(table_payload).result()
-        processed_text = converter.process_api_response_task.submit(table_response).result()
-        table_result = converter.generate_markdown_table_task.submit(processed_text).result()
+        table_result = cache.get(cache_key)
+        # 按条目记录是否命中缓存，由调用方汇总本文件的 VLM 调用数
+        item['vlm_cache_hit'] = table_result is not None
+        if table_result is None:
+            # 公共处理流程
+            encoded_image = converter.validate_and_encode_image_task.submit(img_path).result()
+            
+            # 表格转换子流程
+            table_payload = converter.construct_payload_task.submit(encoded_image, task_name="table_conversion").result()
+            table_response = converter.send_api_request_task.submit(table_payload).result()
+            processed_text = converter.process_api_response_task.submit(table_response).result()
+            table_result = converter.generate_markdown_table_task.submit(processed_text).result()
+            cache.set(cache_key, table_result, "table_conversion", converter.task_model("table_conversion"))
         item.update({
             'markdown_table': table_result,
-            'conversion_success': True
+            'conversion_success': True,
+            'conversion_method': "vlm"
         })
         return f"\n{table_result}\n"
     except Exception as e:
@@ -50,6 +92,28 @@ def handle_table(item: Dict, data: List[Dict], index: int) -> str:
         })
         return f"\n{item.get('table_caption','')}\n"
 
+def describe_image_content(img_path: str) -> Tuple[str, bool]:
+    """调用 VLM 生成图片描述（优先读取缓存），返回 (描述, 是否命中缓存)"""
+    converter = TableImageConverterTasks(config_path=CONVERTER_CONFIG_PATH)
+    cache = get_vlm_cache(converter)
+    cache_key = converter.vlm_cache_key(img_path, "image_caption")
+    if (desc_processed := cache.get(cache_key)) is not None:
+        return desc_processed, True
+    encoded_image = converter.validate_and_encode_image_task.submit(img_path).result()
+    desc_payload = converter.construct_payload_task.submit(encoded_image, task_name="image_caption").result()
+    desc_response = converter.send_api_request_task.submit(desc_payload).result()
+    desc_processed = converter.process_caption_response.submit(desc_response).result()
+    cache.set(cache_key, desc_processed, "image_caption", converter.task_model("image_caption"))
+    return desc_processed, False
+
+@task(
+     name="describe_image",
+     description="生成单张图片的描述（近似重复图片组的代表图）",
+     tags=["image", "llm"]
+)
+def describe_image(img_path: str) -> Tuple[str, bool]:
+    return describe_image_content(img_path)
+
 @task(
      name="handle_image",
      description="生成图片的解释文字",
@@ -60,9 +124,15 @@ def handle_image(
     data: List[Dict],
     index: int,
     image_base_url: str = None,
-    output_root: str = None
+    output_root: str = None,
+    description: Optional[str] = None
 ) -> str:
-    """带完整日志的图片处理方法（新增路径替换功能）"""
+    """带完整日志的图片处理方法（新增路径替换功能）
+
+    description 不为 None 时直接使用（如近似重复图片组代表图的描述），不再调用 VLM；
+    空字符串表示代表图描述失败，按失败降级处理。
+    条目带有 image_url（生成阶段已发布）时链接使用该地址，VLM 仍读取本地 img_path。
+    """
     logger = get_run_logger()
     item.setdefault('conversion_success', False)
     item['image_description'] = ""
@@ -74,11 +144,12 @@ def handle_image(
         if not (img_path := item.get('img_path')):
             raise ValueError("Missing img_path in image item")
         # 原有图片处理流程
-        converter = TableImageConverterTasks(config_path="../config/task/image_table_process.yaml")
-        encoded_image = converter.validate_and_encode_image_task.submit(img_path).result()
-        desc_payload = converter.construct_payload_task.submit(encoded_image, task_name="image_caption").result()
-        desc_response = converter.send_api_request_task.submit(desc_payload).result()
-        desc_processed = converter.process_caption_response.submit(desc_response).result()
+        if description is None:
+            desc_processed, _ = describe_image_content(img_path)
+        elif description:
+            desc_processed = description
+        else:
+            raise ValueError("代表图片描述失败")
         # 新增路径替换逻辑
         if image_base_url and output_root:
             try:
@@ -97,7 +168,7 @@ def handle_image(
             'image_description': desc_processed
         })
         
-        return f"\n![{desc_processed}]({item['img_path']})\n\n"
+        return f"\n![{desc_processed}]({item.get('image_url') or item['img_path']})\n\n"
     
     except Exception as e:
         # 异常处理（保持路径替换结果）
@@ -109,7 +180,7 @@ def handle_image(
         item.update({
             'error_message': error_msg
         })
-        return f"\n![{caption}]({item['img_path']})\n\n"
+        return f"\n![{caption}]({item.get('image_url') or item['img_path']})\n\n"
 
 
 def handle_equation(item: Dict) -> str:
@@ -0,0 +1,68 @@
+"""
+VLM 结果磁盘缓存
+
+键为 图片内容 sha256 + 任务名 + 提示词哈希 + 模型名，值为处理后的最终文本
+（表格 Markdown / 图片描述）。重新处理同一文档时命中缓存即跳过 API 调用。
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class VLMCache:
+    """线程安全的 VLM 结果缓存，附带命中统计"""
+
+    def __init__(self, cache_dir: Optional[str]):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(image_sha256: str, task_name: str, prompt_sha256: str, model: str) -> str:
+        raw = f"{image_sha256}\x00{task_name}\x00{prompt_sha256}\x00{model}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        result = None
+        if self.cache_dir:
+            path = self._path(key)
+            if path.exists():
+                try:
+                    result = json.loads(path.read_text(encoding="utf-8"))["result"]
+                except (OSError, ValueError, KeyError):
+                    result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, key: str, result: str, task_name: str, model: str) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{key}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps({
+            "result": result,
+            "task": task_name,
+            "model": model,
+            "created_at": datetime.now().isoformat(),
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -220,6 +220,7 @@ def generate_hypothetical_questions(
     num_questions: int = 5,
     temperature: float = 0,
     num_ctx: int = 4096,
+    base_url: str = "http://localhost:11434",
     prompt_template: str = """
 ### 要求
 请为用户输入的文本生成{num_questions}个用于信息检索的核心问题，每个问题单独占一行的位置，生成的这些问题能够涵盖文本的主要要点，不要带有编号直接输出。
@@ -239,12 +240,13 @@ def generate_hypothetical_questions(
     chunk_text: 输入文本片段
     model: 使用的Ollama模型
     num_questions: 需要生成的问题数量
+    base_url: Ollama服务地址
     prompt_template: 包含{num_questions}和{chunk_text}占位符的提示模板
     """
 
     llm = ChatOllama(
         model=model,
-        base_url="http://localhost:11434",
+        base_url=base_url,
         temperature=temperature,
         num_ctx=num_ctx
     )
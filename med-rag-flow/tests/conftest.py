@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 与 flows 相同：以 med-rag-flow 根目录为导入根
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def prefect_backend():
+    """临时 Prefect 后端（运行 flow / task 的测试使用）"""
+    from prefect.testing.utilities import prefect_test_harness
+
+    with prefect_test_harness():
+        yield
+
+
+@pytest.fixture
+def make_pdf(tmp_path: Path):
+    """生成指定页数的空白 PDF"""
+    import fitz
+
+    def _make(name: str, pages: int = 1) -> Path:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc = fitz.open()
+        for _ in range(pages):
+            doc.new_page()
+        doc.save(path)
+        doc.close()
+        return path
+
+    return _make
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+
+from tasks.doc_task.checkpoint import (
+    ProcessingCheckpoint,
+    resumable_stages,
+    resume_full_rebuild,
+    save_checkpoint_stage,
+    validate_force_stages,
+)
+
+
+def _outputs(tmp_path: Path) -> tuple:
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    for name in ("a_content_list.json", "a_middle.json", "a.md"):
+        (tmp_path / name).write_text("{}")
+    extraction = {
+        "content_list_path": str(tmp_path / "a_content_list.json"),
+        "middle_json_path": str(tmp_path / "a_middle.json"),
+        "image_dir": str(image_dir),
+    }
+    markdown = {"markdown_path": str(tmp_path / "a.md"), "published_images": []}
+    return extraction, markdown
+
+
+def _job(tmp_path: Path, sha256: str = "sha-a", force=()) -> dict:
+    return {"dir": str(tmp_path / ".checkpoints"), "key": "a.pdf", "sha256": sha256, "force": list(force)}
+
+
+def test_resume_from_last_completed_stage(tmp_path: Path) -> None:
+    """Completed stages are returned in order and survive a new checkpoint instance."""
+    extraction, markdown = _outputs(tmp_path)
+    job = _job(tmp_path)
+    assert resumable_stages(job) == {}
+
+    save_checkpoint_stage(job, "extraction", extraction)
+    assert resumable_stages(job) == {"extraction": extraction}
+
+    save_checkpoint_stage(job, "markdown", markdown)
+    assert resumable_stages(job) == {"extraction": extraction, "markdown": markdown}
+    assert ProcessingCheckpoint(job["dir"]).has_file("a.pdf", "sha-a")
+
+
+def test_invalidated_stages(tmp_path: Path) -> None:
+    """Changed content, missing outputs, forced stages and re-saved earlier stages drop later ones."""
+    extraction, markdown = _outputs(tmp_path)
+    job = _job(tmp_path)
+    save_checkpoint_stage(job, "extraction", extraction)
+    save_checkpoint_stage(job, "markdown", markdown)
+
+    assert resumable_stages(_job(tmp_path, sha256="sha-other")) == {}
+    assert resumable_stages(_job(tmp_path, force=["markdown"])) == {"extraction": extraction}
+    assert resumable_stages(_job(tmp_path, force=["extraction"])) == {}
+
+    Path(markdown["markdown_path"]).unlink()
+    assert resumable_stages(job) == {"extraction": extraction}
+
+    Path(markdown["markdown_path"]).write_text("{}")
+    save_checkpoint_stage(job, "extraction", extraction)
+    assert resumable_stages(job) == {"extraction": extraction}
+
+
+def test_run_marker(tmp_path: Path) -> None:
+    """run.json marks an unfinished run; finishing removes the whole directory."""
+    checkpoint = ProcessingCheckpoint(tmp_path / ".checkpoints")
+    assert checkpoint.load_run() is None
+
+    checkpoint.start_run({"kb_id": 1, "full_rebuild": True})
+    assert checkpoint.load_run()["kb_id"] == 1
+
+    checkpoint.finish_run()
+    assert checkpoint.load_run() is None
+    assert not checkpoint.dir.exists()
+
+
+def test_resume_keeps_recorded_run_mode() -> None:
+    """A resumed run keeps the mode recorded in run.json instead of the recomputed one."""
+    assert resume_full_rebuild({"kb_id": 1, "full_rebuild": True}, False) is True
+    assert resume_full_rebuild({"kb_id": 1, "full_rebuild": False}, True) is False
+    assert resume_full_rebuild(None, True) is True
+    assert resume_full_rebuild({"kb_id": 1}, False) is False
+
+
+
+def test_validate_force_stages() -> None:
+    assert validate_force_stages(["embedding", "markdown"]) == {"embedding", "markdown"}
+    with pytest.raises(ValueError):
+        validate_force_stages(["ocr"])
@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+import pytest
+from prefect import task
+
+from flows import document_process_flow
+from flows.document_process_flow import mineru_process_pdf_flow
+from tasks.doc_task.mineru_workers import shutdown_worker_pool
+
+
+@task
+def _stub_step(pdf_file: Path) -> str:
+    return pdf_file.stem
+
+
+@task
+def _stub_process_pdf_file(pdf_file: Path, **kwargs) -> dict:
+    # 嵌套 submit：文件作业占满并发时仍需有线程执行
+    stem = _stub_step.submit(pdf_file).result()
+    return {"status": "success", "file": str(pdf_file), "working_files": {"pdf_stem": stem}}
+
+
+def _groups(input_dir: Path, files) -> list:
+    return [{"path": input_dir, "files": list(files), "count": len(files)}]
+
+
+def test_thread_mode_nested_tasks_do_not_starve(
+    prefect_backend, make_pdf, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """With max_concurrency=1 the file job's nested tasks still get a thread."""
+    monkeypatch.setattr(document_process_flow, "process_pdf_file", _stub_process_pdf_file)
+    files = [make_pdf("input/big.pdf", 3), make_pdf("input/small.pdf", 1)]
+    input_dir = files[0].parent
+
+    results = mineru_process_pdf_flow(
+        _groups(input_dir, files), input_dir, tmp_path / "processed", tmp_path / "markdown",
+        max_concurrency=1, execution_mode="thread"
+    )
+
+    processed = results[0]["processed_files"]
+    assert sorted(item["working_files"]["pdf_stem"] for item in processed) == ["big", "small"]
+    assert results[0]["failed_files"] == []
+
+
+mineru_smoke = pytest.mark.skipif(
+    not os.environ.get("MED_RAG_MINERU_SMOKE"),
+    reason="需要 MinerU 模型，设置 MED_RAG_MINERU_SMOKE=1 运行",
+)
+
+
+@mineru_smoke
+@pytest.mark.parametrize("execution_mode", ["thread", "process", "pool"])
+def test_execution_modes_smoke(prefect_backend, make_pdf, tmp_path: Path, execution_mode: str) -> None:
+    """Each execution mode processes a one-page PDF end to end."""
+    pdf = make_pdf("input/a.pdf")
+    try:
+        results = mineru_process_pdf_flow(
+            _groups(pdf.parent, [pdf]), pdf.parent, tmp_path / "processed", tmp_path / "markdown",
+            max_concurrency=1, execution_mode=execution_mode,
+            publish_dir=str(tmp_path / "static"), image_store_root=str(tmp_path / "image_store")
+        )
+    finally:
+        shutdown_worker_pool()
+
+    assert results[0]["failed_files"] == []
+    assert Path(results[0]["processed_files"][0]["markdown_result"]["markdown_path"]).exists()
+
+
+@mineru_smoke
+def test_pool_mode_sharded_pdf_smoke(prefect_backend, make_pdf, tmp_path: Path) -> None:
+    """A pool worker can open its own shard process pool."""
+    pdf = make_pdf("input/a.pdf", 2)
+    try:
+        results = mineru_process_pdf_flow(
+            _groups(pdf.parent, [pdf]), pdf.parent, tmp_path / "processed", tmp_path / "markdown",
+            max_concurrency=1, execution_mode="pool", shard_pages=1, shard_workers=2,
+            publish_dir=str(tmp_path / "static"), image_store_root=str(tmp_path / "image_store")
+        )
+    finally:
+        shutdown_worker_pool()
+
+    assert results[0]["failed_files"] == []
+    assert Path(results[0]["processed_files"][0]["markdown_result"]["markdown_path"]).exists()
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from tasks.doc_task import extraction_cache
+from tasks.doc_task.extraction_cache import ExtractionCache, file_sha256
+
+
+def _extraction(work: Path, stem: str) -> dict:
+    """模拟 MinerU 输出目录"""
+    image_dir = work / "images"
+    image_dir.mkdir(parents=True)
+    (image_dir / "fig.jpg").write_bytes(b"img")
+    content_list = work / f"{stem}_content_list.json"
+    content_list.write_text(json.dumps([{"type": "image", "img_path": str(image_dir / "fig.jpg")}]))
+    middle = work / f"{stem}_middle.json"
+    middle.write_text("{}")
+    markdown = work / f"{stem}.md"
+    markdown.write_text(f"# {stem}\n![](images/fig.jpg)\n", encoding="utf-8")
+    return {"content_list_path": content_list, "middle_json_path": middle,
+            "markdown_path": markdown, "image_dir": image_dir}
+
+
+def test_key_depends_on_content_and_versions(tmp_path: Path, monkeypatch) -> None:
+    """The key changes with content, MinerU version and pipeline version, not the file name."""
+    a = tmp_path / "a.pdf"
+    b = tmp_path / "renamed.pdf"
+    a.write_bytes(b"%PDF-1 same")
+    b.write_bytes(b"%PDF-1 same")
+    key = ExtractionCache.key(file_sha256(a))
+
+    assert ExtractionCache.key(file_sha256(b)) == key
+    assert ExtractionCache.key("0" * 64) != key
+
+    monkeypatch.setattr(extraction_cache, "mineru_version", lambda: "0.0.0-other")
+    assert ExtractionCache.key(file_sha256(a)) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(extraction_cache, "PIPELINE_VERSION", "next")
+    assert ExtractionCache.key(file_sha256(a)) != key
+
+
+def test_store_restore_and_invalidate(tmp_path: Path) -> None:
+    """A stored entry restores under a new file name and disappears after invalidate."""
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    key = ExtractionCache.key("ab" * 32)
+    assert cache.restore(key, tmp_path, tmp_path / "x", "x") is None
+
+    cache.store(key, "old", **_extraction(tmp_path / "work", "old"))
+    out = tmp_path / "out"
+    out.mkdir()
+    result = cache.restore(key, out, out / "new_images", "new")
+
+    assert result["cache_hit"] is True
+    content_list = json.loads(Path(result["content_list_path"]).read_text())
+    assert Path(content_list[0]["img_path"]) == (out / "new_images" / "fig.jpg").resolve()
+    assert (out / "new.md").read_text(encoding="utf-8") == "# new\n![](new_images/fig.jpg)\n"
+
+    cache.invalidate(key)
+    assert not cache.has(key)
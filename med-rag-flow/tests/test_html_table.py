@@ -0,0 +1,25 @@
+from utils.html_table import html_table_to_markdown
+
+
+def test_converts_with_spans_and_escaping() -> None:
+    """The first row becomes the header; spans are expanded and pipes escaped."""
+    html = (
+        "<table><tr><td>参数</td><td colspan='2'>范围</td></tr>"
+        "<tr><td rowspan='2'>频率</td><td>2</td><td>5 | MHz</td></tr>"
+        "<tr><td>3</td><td>7</td></tr></table>"
+    )
+    assert html_table_to_markdown(html) == "\n".join([
+        "| 参数 | 范围 | 范围 |",
+        "| --- | --- | --- |",
+        "| 频率 | 2 | 5 \\| MHz |",
+        "| 频率 | 3 | 7 |",
+    ])
+
+
+def test_rejects_unusable_tables() -> None:
+    """Missing, single-row, ragged and empty tables fall back to the VLM."""
+    assert html_table_to_markdown("") is None
+    assert html_table_to_markdown("<p>no table</p>") is None
+    assert html_table_to_markdown("<table><tr><td>a</td></tr></table>") is None
+    assert html_table_to_markdown("<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>") is None
+    assert html_table_to_markdown("<table><tr><td></td></tr><tr><td></td></tr></table>") is None
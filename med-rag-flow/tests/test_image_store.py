@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from tasks.doc_task.image_store import ImageStore
+
+
+def _image(path: Path, data: bytes) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_put_deduplicates_by_content(tmp_path: Path) -> None:
+    """Identical images are stored once under their content hash."""
+    store = ImageStore(tmp_path / "store")
+    first = store.put(_image(tmp_path / "a/1.JPG", b"same"))
+    second = store.put(_image(tmp_path / "b/2.jpg", b"same"))
+
+    assert first == second
+    assert first.endswith(".jpg")
+    assert store.object_path(first).read_bytes() == b"same"
+    assert store.stats["stored"] == 1
+
+
+def test_publish_and_prune(tmp_path: Path) -> None:
+    """Published copies survive pruning; unreferenced store objects are removed."""
+    store = ImageStore(tmp_path / "store")
+    keep = store.put(_image(tmp_path / "keep.png", b"keep"))
+    drop = store.put(_image(tmp_path / "drop.png", b"drop"))
+    published = store.publish(keep, tmp_path / "static")
+
+    assert published.read_bytes() == b"keep"
+    assert store.prune({keep}) == 1
+    assert store.object_path(keep).exists()
+    assert not store.object_path(drop).exists()
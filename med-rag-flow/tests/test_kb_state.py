@@ -0,0 +1,69 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+from tasks.doc_task import kb_state
+from tasks.doc_task.kb_state import KBState, embedding_signature, group_chunks_by_source
+
+
+def _state(tmp_path: Path) -> KBState:
+    state = KBState(tmp_path / "kb_state.json")
+    state.set_document("a.pdf", "sha-a", {"markdown_path": "/md/a.md"})
+    state.set_document("b.pdf", "sha-b", {"markdown_path": "/md/b.md"})
+    state.set_document("c.pdf", "sha-c", {"markdown_path": "/md/c.md"})
+    state.attach_chunks({
+        "/md/b.md": {"chunk_ids": ["b1", "b2"], "parent_ids": ["pb"]},
+        "/md/c.md": {"chunk_ids": ["c1"], "parent_ids": ["pc"]},
+    })
+    return state
+
+
+def test_reconcile_classifies_documents(tmp_path: Path) -> None:
+    """New, changed, deleted and unchanged PDFs are told apart by content hash."""
+    changes = _state(tmp_path).reconcile({"a.pdf": "sha-a", "b.pdf": "sha-b2", "d.pdf": "sha-d"})
+
+    assert changes.added == ["d.pdf"]
+    assert changes.changed == ["b.pdf"]
+    assert changes.deleted == ["c.pdf"]
+    assert changes.unchanged == ["a.pdf"]
+    assert changes.to_process == ["d.pdf", "b.pdf"]
+    assert changes.to_remove == ["b.pdf", "c.pdf"]
+
+
+def test_reconcile_pipeline_version_change(tmp_path: Path, monkeypatch) -> None:
+    """A new pipeline version marks every document as changed; force_reprocess does the same."""
+    state = _state(tmp_path)
+    hashes = {"a.pdf": "sha-a", "b.pdf": "sha-b", "c.pdf": "sha-c"}
+
+    forced = state.reconcile(hashes)
+    forced.force_reprocess()
+    assert forced.changed == ["a.pdf", "b.pdf", "c.pdf"] and forced.unchanged == []
+
+    monkeypatch.setattr(kb_state, "PIPELINE_VERSION", "next")
+    assert state.reconcile(hashes).changed == ["a.pdf", "b.pdf", "c.pdf"]
+
+
+def test_removed_ids_and_roundtrip(tmp_path: Path) -> None:
+    """Chunk and parent ids of removed documents are collected; state survives save/load."""
+    state = _state(tmp_path)
+    state.set_vector_store("kb_1_x", embedding_signature("bge-m3", "header_parent_child", {"n": 1}))
+
+    assert state.removed_ids(["b.pdf", "c.pdf"]) == {
+        "chunk_ids": ["b1", "b2", "c1"], "parent_ids": ["pb", "pc"]
+    }
+    state.save()
+    reloaded = KBState(tmp_path / "kb_state.json")
+    assert reloaded.documents == state.documents
+    assert reloaded.vector_store["name"] == "kb_1_x"
+
+
+def test_group_chunks_by_source() -> None:
+    """Chunks are grouped per source with de-duplicated parent ids."""
+    docs = [
+        SimpleNamespace(metadata={"source": "/md/a.md", "chunk_id": "1", "parent_id": "p"}),
+        SimpleNamespace(metadata={"source": "/md/a.md", "chunk_id": "2", "parent_id": "p"}),
+        SimpleNamespace(metadata={"source": "/md/b.md", "chunk_id": "3"}),
+    ]
+    assert group_chunks_by_source(docs) == {
+        "/md/a.md": {"chunk_ids": ["1", "2"], "parent_ids": ["p"]},
+        "/md/b.md": {"chunk_ids": ["3"], "parent_ids": []},
+    }
@@ -0,0 +1,23 @@
+from utils.outline_index import OutlineIndex
+
+OUTLINE = [
+    {"title": "第一章 概述", "level": 1, "page": 0},
+    {"title": "1.1 探头校准", "level": 2, "page": 3},
+    {"title": "1.2 探头清洁与消毒", "level": 2, "page": 5},
+]
+
+
+def test_exact_match_ignores_punctuation_and_width() -> None:
+    """Titles match after normalisation, on the same or an adjacent page."""
+    index = OutlineIndex(OUTLINE)
+    assert index.match("第一章　概述", 0) == 0
+    assert index.match("1.1 探头校准", 4) == 1
+    assert index.match("1.1 探头校准", 6) is None
+
+
+def test_fuzzy_match_and_used_entries() -> None:
+    """Near-identical text matches by bigram similarity; used entries are skipped."""
+    index = OutlineIndex(OUTLINE)
+    assert index.match("1.2 探头清洁与消毒处理", 5) == 2
+    assert index.match("1.2 探头清洁与消毒", 5, used={2}) is None
+    assert index.match("完全无关的一段正文内容" * 3, 5) is None
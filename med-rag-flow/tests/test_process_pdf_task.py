@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import pytest
+from prefect import flow, task
+
+from tasks.doc_task import process_pdf_task
+from tasks.doc_task.process_pdf_task import enrich_tables_and_images, run_process_pdf_file
+
+
+@task
+def _stub_step(pdf_file: Path) -> str:
+    return pdf_file.stem
+
+
+@task
+def _stub_workflow(pdf_file: Path, working_dir: Path, final_output_dir: Path, **kwargs) -> dict:
+    # 与真实工作流一样在任务内部 submit 嵌套任务
+    stem = _stub_step.submit(pdf_file).result()
+    return {"status": "success", "working_files": {"pdf_stem": stem}, "markdown_result": {}}
+
+
+@task
+def _stub_handle_table(item: dict, data: list, index: int) -> str:
+    item['vlm_cache_hit'] = item['cached']
+    return item['img_path']
+
+
+@task
+def _stub_describe_image(img_path: str) -> tuple:
+    return f"描述 {img_path}", img_path.startswith("cached")
+
+
+@flow
+def _enrich_flow(cleaned_data: list) -> dict:
+    return enrich_tables_and_images(cleaned_data, max_concurrency=2)[1]
+
+
+def test_run_process_pdf_file_outside_flow(
+    prefect_backend, make_pdf, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """The worker entry point runs without an enclosing flow (process / pool mode)."""
+    monkeypatch.setattr(process_pdf_task, "process_pdf_workflow", _stub_workflow)
+    pdf = make_pdf("input/a.pdf")
+
+    result = run_process_pdf_file({
+        "pdf_file": pdf,
+        "input_dir": pdf.parent,
+        "output_root": tmp_path / "processed",
+        "final_output_dir": tmp_path / "markdown",
+    })
+
+    assert result["status"] == "success", result.get("error")
+    assert result["working_files"]["pdf_stem"] == "a"
+    assert result["file"] == str(pdf)
+
+
+def test_enrich_counts_vlm_cache_hits_per_call(
+    prefect_backend, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Cache hits and VLM calls come from this file's lookups, not the shared cache counters."""
+    monkeypatch.setattr(process_pdf_task, "handle_table", _stub_handle_table)
+    monkeypatch.setattr(process_pdf_task, "describe_image", _stub_describe_image)
+    cleaned_data = [
+        {"type": "table", "img_path": "t1.jpg", "cached": True},
+        {"type": "table", "img_path": "t2.jpg", "cached": False},
+        {"type": "image", "img_path": "cached.jpg"},
+        {"type": "image", "img_path": "new.jpg"},
+        {"type": "image", "img_path": "other.jpg"},
+    ]
+
+    stats = _enrich_flow(cleaned_data)
+
+    assert stats["vlm_cache_hits"] == 2
+    assert stats["vlm_calls"] == 3
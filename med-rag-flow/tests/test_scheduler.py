@@ -0,0 +1,74 @@
+import pytest
+
+from tasks.doc_task import scheduler
+from tasks.doc_task.scheduler import ProgressTracker, read_page_count, schedule_order
+
+PAGE_COUNTS = {"manual.pdf": 1500, "leaflet.pdf": 2, "urgent/guide.pdf": 40, "b.pdf": 2}
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_schedule_order_policies() -> None:
+    """SJF, largest-first, priority (glob patterns, SJF within a level) and name order."""
+    assert schedule_order(PAGE_COUNTS, "sjf") == ["b.pdf", "leaflet.pdf", "urgent/guide.pdf", "manual.pdf"]
+    assert schedule_order(PAGE_COUNTS, "largest_first")[0] == "manual.pdf"
+    assert schedule_order(PAGE_COUNTS, "priority", {"urgent/*": 5, "manual.pdf": 1}) == [
+        "urgent/guide.pdf", "manual.pdf", "b.pdf", "leaflet.pdf"
+    ]
+    assert schedule_order(PAGE_COUNTS, "name") == sorted(PAGE_COUNTS)
+    with pytest.raises(ValueError):
+        schedule_order(PAGE_COUNTS, "random")
+
+
+def test_read_page_count(make_pdf, tmp_path) -> None:
+    assert read_page_count(make_pdf("three.pdf", 3)) == 3
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+    assert read_page_count(tmp_path / "broken.pdf") == 0
+
+
+def test_progress_eta(monkeypatch: pytest.MonkeyPatch) -> None:
+    """ETAs simulate FIFO workers and switch to the measured rate after the first file."""
+    clock = _Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    snapshots = []
+    tracker = ProgressTracker(
+        [("a.pdf", 10), ("b.pdf", 20), ("c.pdf", 5)], concurrency=2,
+        publish=snapshots.append, publish_interval=0, default_pages_per_sec=1.0
+    )
+    tracker.start()
+
+    first = {item["file"]: item for item in snapshots[-1]["files"]}
+    assert [first[name]["status"] for name in ("a.pdf", "b.pdf", "c.pdf")] == ["running", "running", "queued"]
+    # c 等待先完成的 a（10s）后再处理 5 页
+    assert [first[name]["eta_seconds"] for name in ("a.pdf", "b.pdf", "c.pdf")] == [10.0, 20.0, 15.0]
+
+    clock.now += 5
+    tracker.complete("a.pdf", True)
+    latest = snapshots[-1]
+    files = {item["file"]: item for item in latest["files"]}
+    assert tracker.pages_per_sec() == 2.0
+    assert files["a.pdf"]["status"] == "completed" and files["c.pdf"]["status"] == "running"
+    assert files["b.pdf"]["eta_seconds"] == 5.0
+    assert files["c.pdf"]["eta_seconds"] == 2.5
+    assert latest["completed_files"] == 1 and latest["completed_pages"] == 10
+    assert latest["eta_seconds"] == 5.0
+
+
+def test_unmeasured_files_do_not_skew_rate(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Cache hits and failures are excluded from the throughput estimate."""
+    clock = _Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    tracker = ProgressTracker([("a.pdf", 100), ("b.pdf", 10)], concurrency=2, default_pages_per_sec=0.5)
+    tracker.start()
+    tracker.complete("a.pdf", True, measured=False)
+    tracker.complete("b.pdf", False)
+
+    assert tracker.pages_per_sec() == 0.5
+    snapshot = tracker.snapshot()
+    assert (snapshot["completed_files"], snapshot["failed_files"], snapshot["eta_seconds"]) == (1, 1, 0.0)
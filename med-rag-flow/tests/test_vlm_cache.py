@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from tasks.llm_task.vlm_cache import VLMCache
+
+
+def test_key_covers_every_input() -> None:
+    """Changing the image, task, prompt or model yields a different key."""
+    base = ("a" * 64, "table_conversion", "b" * 64, "qwen2.5vl:7b")
+    key = VLMCache.key(*base)
+
+    assert VLMCache.key(*base) == key
+    for index, value in enumerate(["c" * 64, "image_caption", "d" * 64, "llava:13b"]):
+        changed = list(base)
+        changed[index] = value
+        assert VLMCache.key(*changed) != key
+
+
+def test_get_set_and_stats(tmp_path: Path) -> None:
+    """Results persist across instances; hits and misses are counted."""
+    key = VLMCache.key("a" * 64, "image_caption", "b" * 64, "m")
+    cache = VLMCache(str(tmp_path))
+    assert cache.get(key) is None
+    cache.set(key, "一张超声探头示意图", "image_caption", "m")
+
+    reopened = VLMCache(str(tmp_path))
+    assert reopened.get(key) == "一张超声探头示意图"
+    assert cache.stats() == {"hits": 0, "misses": 1}
+    assert reopened.stats() == {"hits": 1, "misses": 0}
+
+
+def test_disabled_cache_never_hits() -> None:
+    """Without a cache directory nothing is stored."""
+    cache = VLMCache(None)
+    cache.set("k", "v", "image_caption", "m")
+    assert cache.get("k") is None
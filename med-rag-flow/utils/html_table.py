@@ -0,0 +1,117 @@
+"""HTML 表格转 Markdown（MinerU table_body 本地转换，无需调用 VLM）"""
+from html.parser import HTMLParser
+from typing import List, Optional
+
+
+class _TableParser(HTMLParser):
+    """解析首个 <table> 的单元格，展开 rowspan / colspan"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[Optional[str]]] = []
+        self.depth = 0
+        self.malformed = False
+        self._row: Optional[List[Optional[str]]] = None
+        self._cell: Optional[List[str]] = None
+        self._span = (1, 1)
+        self._pending: dict = {}   # {(行, 列): 文本} 由 rowspan 占用的位置
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.depth += 1
+            if self.depth > 1:
+                self.malformed = True   # 嵌套表格无法用 Markdown 表达
+        elif self.depth != 1:
+            return
+        elif tag == "tr":
+            self._close_row()
+            self._row = []
+        elif tag in ("td", "th"):
+            if self._row is None:
+                self._row = []
+            self._close_cell()
+            attrs = dict(attrs)
+            try:
+                self._span = (max(1, int(attrs.get("rowspan") or 1)), max(1, int(attrs.get("colspan") or 1)))
+            except ValueError:
+                self._span = (1, 1)
+            self._cell = []
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag == "table":
+            if self.depth == 1:
+                self._close_row()
+            self.depth -= 1
+        elif self.depth != 1:
+            return
+        elif tag in ("td", "th"):
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+
+    def handle_data(self, data):
+        if self.depth == 1 and self._cell is not None:
+            self._cell.append(data)
+
+    def _fill_pending(self):
+        row_idx = len(self.rows)
+        while (row_idx, len(self._row)) in self._pending:
+            self._row.append(self._pending.pop((row_idx, len(self._row))))
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        text = " ".join("".join(self._cell).split())
+        rowspan, colspan = self._span
+        self._fill_pending()
+        row_idx = len(self.rows)
+        for _ in range(colspan):
+            col_idx = len(self._row)
+            self._row.append(text)
+            for offset in range(1, rowspan):
+                self._pending[(row_idx + offset, col_idx)] = text
+        self._cell = None
+        self._span = (1, 1)
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            self._fill_pending()
+            self.rows.append(self._row)
+            self._row = None
+
+
+def _escape(text: str) -> str:
+    return text.replace("|", "\\|")
+
+
+def html_table_to_markdown(html: str) -> Optional[str]:
+    """将 HTML 表格转换为 Markdown 表格
+
+    首行作为表头；rowspan/colspan 展开为重复单元格。
+    结构异常（无表格、嵌套表格、少于两行、各行列数不一致、内容全空）时返回 None，
+    由调用方回退到 VLM 识别。
+    """
+    if not html or "<table" not in html.lower():
+        return None
+    parser = _TableParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        return None
+
+    rows = [row for row in parser.rows if row]
+    if parser.malformed or len(rows) < 2:
+        return None
+    width = len(rows[0])
+    if width == 0 or any(len(row) != width for row in rows):
+        return None
+    if not any(cell for row in rows for cell in row):
+        return None
+
+    lines = ["| " + " | ".join(_escape(cell or "") for cell in row) + " |" for row in rows]
+    lines.insert(1, "| " + " | ".join(["---"] * width) + " |")
+    return "\n".join(lines)
@@ -0,0 +1,69 @@
+"""感知哈希（dHash）与近似重复图片分组"""
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+def dhash(image_path: str, hash_size: int = 8) -> Optional[Tuple[int, float]]:
+    """计算差值哈希
+
+    缩放为 (hash_size+1) x hash_size 灰度图，比较相邻像素亮度得到 hash_size² 位指纹。
+    对缩放、轻微压缩失真不敏感。
+
+    Returns:
+        (哈希值, 宽高比)；图片无法读取时返回 None
+    """
+    try:
+        with Image.open(image_path) as img:
+            aspect = img.width / max(img.height, 1)
+            pixels = list(
+                img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata()
+            )
+    except Exception:
+        return None
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value, aspect
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def group_similar_images(
+    image_paths: List[str],
+    max_distance: int = 4,
+    aspect_tolerance: float = 0.1
+) -> Dict[str, str]:
+    """按感知哈希将近似相同的图片分组
+
+    Args:
+        image_paths: 图片路径（按文档顺序，组内第一张作为代表）
+        max_distance: 判定为相同图片的最大汉明距离
+        aspect_tolerance: 宽高比允许的相对误差，避免不同版式的图片误合并
+
+    Returns:
+        {图片路径: 代表图片路径}，无法读取的图片代表自身
+    """
+    representatives: List[Tuple[str, int, float]] = []
+    mapping: Dict[str, str] = {}
+    for path in image_paths:
+        if path in mapping:
+            continue
+        fingerprint = dhash(path)
+        if fingerprint is None:
+            mapping[path] = path
+            continue
+        value, aspect = fingerprint
+        for rep_path, rep_value, rep_aspect in representatives:
+            if (hamming(value, rep_value) <= max_distance
+                    and abs(aspect - rep_aspect) <= aspect_tolerance * max(aspect, rep_aspect)):
+                mapping[path] = rep_path
+                break
+        else:
+            representatives.append((path, value, aspect))
+            mapping[path] = path
+    return mapping
@@ -0,0 +1,44 @@
+"""进程内存占用查询（psutil 可选，缺失时回退到 /proc 与 resource）"""
+import os
+import sys
+from typing import Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_MB = 1024 * 1024
+
+
+def current_rss_mb(pid: Optional[int] = None) -> float:
+    """进程当前常驻内存（MB），无法获取时返回 0"""
+    pid = pid or os.getpid()
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / _MB
+        except psutil.Error:
+            return 0.0
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak / _MB if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / _MB
+    return current_rss_mb()
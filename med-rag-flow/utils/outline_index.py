@@ -0,0 +1,102 @@
+"""PDF 大纲（目录）索引：按页组织的标题精确 + 字符二元组模糊匹配"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set
+
+from utils.str_utils import normalize_title
+
+
+def char_bigrams(text: str) -> List[str]:
+    if len(text) < 2:
+        return [text] if text else []
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+class OutlineIndex:
+    """大纲标题索引
+
+    每页维护 归一化标题 → 条目 的精确索引，以及 二元组 → 条目 的倒排索引。
+    查询只检查页码附近（page_window）的标题，单次查询代价与文本长度成正比，
+    对整份文档的匹配为一次线性扫描。
+    """
+
+    def __init__(self, outline: List[Dict], page_window: int = 1, min_similarity: float = 0.85):
+        self.page_window = page_window
+        self.min_similarity = min_similarity
+        self.entries: List[Dict] = []
+        self.exact: Dict[int, Dict[str, int]] = defaultdict(dict)
+        self.postings: Dict[int, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.max_length = 0
+
+        for outline_item in outline:
+            norm = normalize_title(outline_item["title"])
+            if not norm:
+                continue
+            entry_id = len(self.entries)
+            bigrams = set(char_bigrams(norm))
+            self.entries.append({
+                "title": outline_item["title"],
+                "norm": norm,
+                "level": outline_item["level"],
+                "page": outline_item["page"],
+                "bigram_count": len(bigrams),
+            })
+            page = outline_item["page"]
+            self.exact[page].setdefault(norm, entry_id)
+            for bigram in bigrams:
+                self.postings[page][bigram].add(entry_id)
+            self.max_length = max(self.max_length, len(norm))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def pages(self) -> int:
+        return len(self.exact)
+
+    def _candidate_pages(self, page: int) -> List[int]:
+        # 当前页优先，其次相邻页（目录页码常有 ±1 偏差）
+        pages = [page]
+        for offset in range(1, self.page_window + 1):
+            pages.extend([page - offset, page + offset])
+        return pages
+
+    def match(self, text: str, page: int, used: Optional[Set[int]] = None) -> Optional[int]:
+        """返回与文本匹配的大纲条目编号；未匹配返回 None
+
+        Args:
+            text: 待匹配的文本
+            page: 文本所在页（从0开始）
+            used: 已匹配过的条目编号（每个标题只匹配一次）
+        """
+        norm = normalize_title(text)
+        # 明显长于任何标题的段落不可能是标题
+        if not norm or len(norm) > self.max_length * 1.5:
+            return None
+        used = used or set()
+        pages = self._candidate_pages(page)
+
+        for candidate_page in pages:
+            entry_id = self.exact.get(candidate_page, {}).get(norm)
+            if entry_id is not None and entry_id not in used:
+                return entry_id
+
+        bigrams = set(char_bigrams(norm))
+        best_id, best_score = None, self.min_similarity
+        for candidate_page in pages:
+            page_postings = self.postings.get(candidate_page)
+            if not page_postings:
+                continue
+            overlap = Counter()
+            for bigram in bigrams:
+                for entry_id in page_postings.get(bigram, ()):
+                    overlap[entry_id] += 1
+            for entry_id, common in overlap.items():
+                if entry_id in used:
+                    continue
+                # Dice 系数
+                score = 2 * common / (len(bigrams) + self.entries[entry_id]["bigram_count"])
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is not None:
+                break
+        return best_id
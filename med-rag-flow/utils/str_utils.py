@@ -1,3 +1,5 @@
+import unicodedata
+
 
 def optimize_str(title: str) -> str:
     """字符串优化处理"""
@@ -12,4 +14,13 @@ def optimize_str(title: str) -> str:
     ]
     for old, new in replacements:
         title = title.replace(old, new)
-    return title.strip()
\ No newline at end of file
+    return title.strip()
+
+def normalize_title(title: str) -> str:
+    """标题匹配用的归一化：全角转半角、去除空白与标点、英文小写"""
+    chars = []
+    for ch in unicodedata.normalize("NFKC", optimize_str(title)).lower():
+        if ch.isspace() or unicodedata.category(ch)[0] in ("P", "S"):
+            continue
+        chars.append(ch)
+    return "".join(chars)
@@ -0,0 +1,49 @@
+"""阶段耗时统计工具"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    """按阶段累计耗时（同名阶段多次进入时累加）
+
+    用法:
+        timer = StageTimer()
+        with timer.stage("doc_analyze"):
+            ...
+        logger.info(timer.summary())
+    """
+
+    def __init__(self, durations: Optional[Dict[str, float]] = None):
+        self.durations: Dict[str, float] = dict(durations or {})
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def merge(self, durations: Dict[str, float]) -> None:
+        """合并其他计时结果（如分片子进程返回的耗时）"""
+        for name, seconds in durations.items():
+            self.add(name, seconds)
+
+    @property
+    def total(self) -> float:
+        return sum(self.durations.values())
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(seconds, 3) for name, seconds in self.durations.items()}
+
+    def summary(self) -> str:
+        """如 "doc_analyze 12.40s (81.2%) | visualize 2.10s (13.7%)" """
+        total = self.total or 1.0
+        return " | ".join(
+            f"{name} {seconds:.2f}s ({seconds / total:.1%})"
+            for name, seconds in sorted(self.durations.items(), key=lambda kv: kv[1], reverse=True)
+        )
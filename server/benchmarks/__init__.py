@@ -0,0 +1 @@
+"""Benchmarks for med_rag_server."""
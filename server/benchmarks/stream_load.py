@@ -0,0 +1,347 @@
+"""
+流式检索接口压测.
+
+在独立进程中以单个 uvicorn worker 启动应用（InMemoryBroker, 不执行 lifespan,
+因此不依赖数据库与 Ollama）, 注入桩嵌入模型与桩 LLM, 然后用 N 个并发 SSE
+客户端压测 ``/api/document/medical-search-stream``。
+
+用法::
+
+    python -m benchmarks.stream_load --clients 50 --requests 500
+    python -m benchmarks.stream_load --clients 50 --update-baseline
+
+默认会与 ``benchmarks/baselines/stream_load.json`` 中同场景的基线比较,
+吞吐下降或 p95 延迟上升超过 ``--tolerance`` 时以非零状态码退出。
+仓库中不附带基线（结果与机器相关）, 需在基准机器上用 ``--update-baseline`` 记录后提交;
+没有基线的场景只输出报告。
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "stream_load.json"
+STREAM_PATH = "/api/document/medical-search-stream"
+KB_ID = 1
+
+
+@dataclass
+class StubConfig:
+    """桩模型延迟配置"""
+
+    embed_latency: float = 0.02
+    first_token_latency: float = 0.2
+    token_latency: float = 0.02
+    num_tokens: int = 64
+    corpus_size: int = 2000
+
+
+@dataclass
+class RequestSample:
+    """单次请求的测量结果"""
+
+    ok: bool
+    ttfb: Optional[float] = None
+    latency: Optional[float] = None
+    events: int = 0
+    error: str = ""
+
+
+@dataclass
+class LoadReport:
+    """压测汇总"""
+
+    scenario: str
+    clients: int
+    requests: int
+    errors: int
+    duration: float
+    throughput: float
+    ttfb: Dict[str, float] = field(default_factory=dict)
+    latency: Dict[str, float] = field(default_factory=dict)
+
+
+def corpus_text(index: int) -> str:
+    return f"设备维护条目 {index}: 第 {index % 97} 章 操作步骤与安全注意事项"
+
+
+def _serve(port: int, stub: Dict[str, Any]) -> None:
+    """子进程入口：构建注入桩模型的应用并启动 uvicorn"""
+    os.environ["MED_RAG_SERVER_ENVIRONMENT"] = "pytest"
+    os.environ.setdefault("MED_RAG_SERVER_LOG_LEVEL", "WARNING")
+
+    import uvicorn
+    from langchain_community.vectorstores import FAISS
+
+    from benchmarks.stubs import StubEmbeddings, StubStreamingLLM
+    from med_rag_server.web.api.knowledge_base.views import create_qa_chain
+    from med_rag_server.web.application import get_app
+
+    config = StubConfig(**stub)
+    embeddings = StubEmbeddings()
+    vectorstore = FAISS.from_texts(
+        [corpus_text(i) for i in range(config.corpus_size)],
+        embeddings,
+        metadatas=[{"source": f"manual_{i % 20}.md"} for i in range(config.corpus_size)],
+    )
+    # 建库完成后再打开延迟, 只影响请求期间的向量化
+    embeddings.latency = config.embed_latency
+    llm = StubStreamingLLM(
+        first_token_latency=config.first_token_latency,
+        token_latency=config.token_latency,
+        num_tokens=config.num_tokens,
+    )
+
+    app = get_app()
+    app.state.llm = llm
+    app.state.qa_chains = {KB_ID: create_qa_chain(vectorstore=vectorstore, llm=llm)}
+
+    uvicorn.run(
+        app,
+        host="127.0.0.1",
+        port=port,
+        lifespan="off",
+        log_level="warning",
+        access_log=False,
+    )
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/api/health")
+                if response.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务在 {timeout}s 内未就绪: {base_url}")
+
+
+async def _one_request(client: httpx.AsyncClient, question: str) -> RequestSample:
+    payload = {"question": question, "kb_id": KB_ID}
+    start = time.perf_counter()
+    sample = RequestSample(ok=False)
+    try:
+        async with client.stream("POST", STREAM_PATH, json=payload) as response:
+            if response.status_code != 200:
+                sample.error = f"HTTP {response.status_code}"
+                return sample
+            async for line in response.aiter_lines():
+                if line.startswith("event: error"):
+                    sample.error = "event: error"
+                elif line.startswith("event: data"):
+                    if sample.ttfb is None:
+                        sample.ttfb = time.perf_counter() - start
+                    sample.events += 1
+        sample.latency = time.perf_counter() - start
+        sample.ok = not sample.error and sample.ttfb is not None
+        if not sample.ok and not sample.error:
+            sample.error = "empty stream"
+    except httpx.HTTPError as e:
+        sample.error = type(e).__name__
+    return sample
+
+
+async def drive_load(
+    base_url: str,
+    clients: int,
+    total_requests: int,
+    corpus_size: int,
+) -> List[RequestSample]:
+    """以 clients 个并发连接发送 total_requests 个流式请求"""
+    queue: "asyncio.Queue[int]" = asyncio.Queue()
+    for index in range(total_requests):
+        queue.put_nowait(index)
+    samples: List[RequestSample] = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        limits=limits,
+        timeout=httpx.Timeout(120.0),
+    ) as client:
+
+        async def worker() -> None:
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                samples.append(
+                    await _one_request(client, corpus_text(index % corpus_size)),
+                )
+
+        await asyncio.gather(*(worker() for _ in range(clients)))
+    return samples
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩百分位"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(
+    scenario: str,
+    clients: int,
+    samples: List[RequestSample],
+    duration: float,
+) -> LoadReport:
+    ok = [s for s in samples if s.ok]
+    ttfbs = [s.ttfb for s in ok if s.ttfb is not None]
+    latencies = [s.latency for s in ok if s.latency is not None]
+    return LoadReport(
+        scenario=scenario,
+        clients=clients,
+        requests=len(samples),
+        errors=len(samples) - len(ok),
+        duration=round(duration, 3),
+        throughput=round(len(ok) / duration, 3) if duration else 0.0,
+        ttfb={f"p{p}": round(percentile(ttfbs, p), 4) for p in (50, 95, 99)},
+        latency={f"p{p}": round(percentile(latencies, p), 4) for p in (50, 95, 99)},
+    )
+
+
+def compare_with_baseline(
+    report: LoadReport,
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """返回超出容忍度的回归项"""
+    regressions = []
+    if baseline["throughput"] and (
+        report.throughput < baseline["throughput"] * (1 - tolerance)
+    ):
+        regressions.append(
+            f"throughput {report.throughput} < baseline {baseline['throughput']}",
+        )
+    for metric in ("ttfb", "latency"):
+        current = getattr(report, metric)["p95"]
+        previous = baseline[metric]["p95"]
+        if previous and current > previous * (1 + tolerance):
+            regressions.append(f"{metric} p95 {current}s > baseline {previous}s")
+    return regressions
+
+
+def _load_baselines() -> Dict[str, Any]:
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+    return {}
+
+
+def _print_report(report: LoadReport, baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"场景: {report.scenario}")
+    print(f"请求: {report.requests}  失败: {report.errors}  耗时: {report.duration}s")
+    print(f"吞吐: {report.throughput} req/s")
+    for metric in ("ttfb", "latency"):
+        values = getattr(report, metric)
+        line = "  ".join(f"{k}={v:.4f}s" for k, v in values.items())
+        if baseline:
+            previous = baseline[metric]
+            line += "  | 基线 " + "  ".join(
+                f"{k}={previous[k]:.4f}s" for k in values
+            )
+        print(f"{metric:8s} {line}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="medical-search-stream 压测")
+    parser.add_argument("--clients", type=int, default=20, help="并发 SSE 客户端数")
+    parser.add_argument("--requests", type=int, default=200, help="请求总数")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--num-tokens", type=int, default=64)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="相对基线允许的劣化比例",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="将本次结果写为该场景的基线",
+    )
+    args = parser.parse_args(argv)
+
+    stub = StubConfig(
+        embed_latency=args.embed_latency,
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        num_tokens=args.num_tokens,
+        corpus_size=args.corpus_size,
+    )
+    scenario = (
+        f"c{args.clients}-n{args.requests}-e{stub.embed_latency}"
+        f"-f{stub.first_token_latency}-t{stub.token_latency}x{stub.num_tokens}"
+    )
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve,
+        args=(port, asdict(stub)),
+        daemon=True,
+    )
+    process.start()
+    try:
+        asyncio.run(_wait_ready(base_url))
+        start = time.perf_counter()
+        samples = asyncio.run(
+            drive_load(base_url, args.clients, args.requests, stub.corpus_size),
+        )
+        duration = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.join(timeout=10)
+
+    report = summarize(scenario, args.clients, samples, duration)
+    baselines = _load_baselines()
+    baseline = baselines.get(scenario)
+    _print_report(report, baseline)
+
+    if args.update_baseline:
+        baselines[scenario] = asdict(report)
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(
+            json.dumps(baselines, indent=2, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        print(f"基线已更新: {BASELINE_PATH}")
+        return 0
+
+    if baseline is None:
+        print("未找到该场景基线, 使用 --update-baseline 记录")
+        return 0
+    regressions = compare_with_baseline(report, baseline, args.tolerance)
+    for item in regressions:
+        print(f"回归: {item}")
+    return 1 if regressions or report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+压测用的桩模型.
+
+嵌入与生成均不访问 Ollama, 只按配置的延迟 sleep,
+从而把测量对象限定在服务端自身的调度与流式开销上。
+"""
+import asyncio
+import hashlib
+import math
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class StubEmbeddings(Embeddings):
+    """确定性哈希向量（相同文本得到相同向量）"""
+
+    def __init__(self, dim: int = 64, latency: float = 0.0) -> None:
+        self.dim = dim
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        digest = b""
+        counter = 0
+        while len(digest) < self.dim:
+            digest += hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+            counter += 1
+        values = [byte / 255.0 - 0.5 for byte in digest[: self.dim]]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+class StubStreamingLLM(LLM):
+    """按固定节奏吐出 token 的桩 LLM"""
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.02
+    num_tokens: int = 64
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-streaming"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager))
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for index in range(self.num_tokens):
+            if index:
+                time.sleep(self.token_latency)
+            chunk = GenerationChunk(text=f"t{index} ")
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for index in range(self.num_tokens):
+            if index:
+                await asyncio.sleep(self.token_latency)
+            chunk = GenerationChunk(text=f"t{index} ")
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
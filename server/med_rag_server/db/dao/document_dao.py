@@ -12,7 +12,9 @@ from med_rag_server.db.dao.knowledge_base_dao import KnowledgeBaseDAO
 from med_rag_server.db.dependencies import get_db_session
 from med_rag_server.db.models.document_model import DocumentModel
 from med_rag_server.db.dao.knowledge_base_dao import KnowledgeBaseDAO
+from med_rag_server.services.metrics import instrument_dao
 
+@instrument_dao("document")
 class DocumentDAO:
     """文档数据访问对象"""
     def __init__(self, session: AsyncSession = Depends(get_db_session)) -> None:
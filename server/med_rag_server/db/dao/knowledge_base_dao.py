@@ -7,7 +7,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from med_rag_server.db.dependencies import get_db_session
 from med_rag_server.db.models.knowledge_base_model import KnowledgeBaseModel
+from med_rag_server.services.metrics import instrument_dao
 
+@instrument_dao("knowledge_base")
 class KnowledgeBaseDAO:
     """知识库数据访问对象"""
     def __init__(self, session: AsyncSession = Depends(get_db_session)) -> None:
@@ -0,0 +1,256 @@
+"""
+上下文压缩.
+
+检索结果在拼装提示词前去掉 YAML front matter 与页码注释, 按句子与查询向量的
+余弦相似度只保留相关句子; 表格、图片与标题行原样保留, 页码折叠为引用标记。
+句子向量按文本缓存, 查询向量复用检索阶段已经计算的结果。
+"""
+import hashlib
+import math
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from med_rag_server.services.metrics import CONTEXT_TOKENS_SAVED, SEARCH_STAGE_SECONDS
+from med_rag_server.settings import settings
+
+FRONT_MATTER_RE = re.compile(r"\A\s*---\n.*?\n---\s*\n", re.DOTALL)
+PAGE_MARKER_RE = re.compile(r"<!--\s*page-\{?(\d+)\}?\s*-->")
+COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+# 中文标点与 !?; 处断句; 英文句点只在其后为空白或行尾时断句（不拆开 2.5 之类的小数）
+SENTENCE_RE = re.compile(r"(?:[^。！？!?；;.]|\.(?!\s|$))+(?:[。！？!?；;]|\.(?=\s|$))?")
+CJK_RE = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略 token 估算：中日韩字符各计 1, 其余按 4 字符 1 token"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+@dataclass
+class Segment:
+    """压缩单元：keep=True 的段落原样保留, 否则作为候选句参与打分"""
+
+    text: str
+    keep: bool
+    score: float = 0.0
+
+
+@dataclass
+class CompressionStats:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    sentences_total: int = 0
+    sentences_kept: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "sentences_total": self.sentences_total,
+            "sentences_kept": self.sentences_kept,
+        }
+
+
+class SentenceVectorCache:
+    """句子向量 LRU 缓存（键为句子 sha1）"""
+
+    def __init__(self, max_size: int = 20000) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+        return vector
+
+    def set(self, key: str, vector: List[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+def _is_table_line(line: str) -> bool:
+    stripped = line.strip()
+    return stripped.startswith("|") or stripped.lower().startswith(("<table", "</table", "<tr", "<td", "<th"))
+
+
+def split_segments(text: str) -> Tuple[List[Segment], List[str]]:
+    """
+    切分为保留段（表格 / 图片 / 标题）与候选句.
+
+    Returns:
+        (segments, 出现过的页码列表)
+    """
+    text = FRONT_MATTER_RE.sub("", text)
+    pages = list(dict.fromkeys(PAGE_MARKER_RE.findall(text)))
+    text = COMMENT_RE.sub("", text)
+
+    segments: List[Segment] = []
+    table_lines: List[str] = []
+    in_html_table = False
+
+    def flush_table() -> None:
+        if table_lines:
+            segments.append(Segment("\n".join(table_lines), keep=True))
+            table_lines.clear()
+
+    for line in text.split("\n"):
+        stripped = line.strip()
+        lowered = stripped.lower()
+        if in_html_table or _is_table_line(line):
+            table_lines.append(line)
+            if "<table" in lowered:
+                in_html_table = True
+            if "</table" in lowered:
+                in_html_table = False
+            continue
+        flush_table()
+        if not stripped:
+            continue
+        if stripped.startswith("#") or IMAGE_RE.search(stripped):
+            segments.append(Segment(stripped, keep=True))
+            continue
+        segments.extend(
+            Segment(sentence.strip(), keep=False)
+            for sentence in SENTENCE_RE.findall(stripped)
+            if sentence.strip()
+        )
+    flush_table()
+    return segments, pages
+
+
+def _cosine_scores(query_vector: List[float], vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    norms[norms == 0] = 1.0
+    return matrix @ query / norms
+
+
+async def compress_documents(
+    documents: List[Document],
+    query_vector: List[float],
+    embeddings: Any,
+    cache: SentenceVectorCache,
+    keep_ratio: float = 0.5,
+    min_sentences: int = 2,
+) -> Tuple[List[Document], CompressionStats]:
+    """
+    句子级压缩.
+
+    每个文档保留得分最高的 keep_ratio 比例（至少 min_sentences 句）候选句,
+    按原文顺序与保留段拼接; 页码与来源折叠为首行引用标记。
+    """
+    stats = CompressionStats()
+    parsed = []
+    vectors: Dict[str, List[float]] = {}
+    missing: Dict[str, str] = {}
+    for doc in documents:
+        stats.tokens_before += estimate_tokens(doc.page_content)
+        segments, pages = split_segments(doc.page_content)
+        for segment in segments:
+            if segment.keep:
+                continue
+            key = cache.key(segment.text)
+            if key in vectors or key in missing:
+                continue
+            cached = cache.get(key)
+            if cached is None:
+                missing[key] = segment.text
+            else:
+                vectors[key] = cached
+        parsed.append((doc, segments, pages))
+
+    # 未缓存的句子一次批量向量化
+    if missing:
+        keys = list(missing)
+        computed = await embeddings.aembed_documents([missing[key] for key in keys])
+        for key, vector in zip(keys, computed):
+            cache.set(key, vector)
+            vectors[key] = vector
+
+    compressed: List[Document] = []
+    for doc, segments, pages in parsed:
+        candidates = [segment for segment in segments if not segment.keep]
+        if candidates:
+            scores = _cosine_scores(
+                query_vector,
+                [vectors[cache.key(segment.text)] for segment in candidates],
+            )
+            for segment, score in zip(candidates, scores):
+                segment.score = float(score)
+        keep_count = max(min_sentences, math.ceil(len(candidates) * keep_ratio))
+        # 同分时靠前的句子优先, 保证恰好保留 keep_count 句
+        ranked = sorted(range(len(candidates)), key=lambda i: (-candidates[i].score, i))
+        selected = {id(candidates[i]) for i in ranked[:keep_count]}
+
+        kept_lines: List[str] = []
+        kept_sentences = 0
+        for segment in segments:
+            if segment.keep:
+                kept_lines.append(segment.text)
+            elif id(segment) in selected:
+                kept_lines.append(segment.text)
+                kept_sentences += 1
+
+        citation = _citation(doc, pages)
+        content = "\n".join(([citation] if citation else []) + kept_lines)
+        stats.sentences_total += len(candidates)
+        stats.sentences_kept += kept_sentences
+        stats.tokens_after += estimate_tokens(content)
+        compressed.append(Document(page_content=content, metadata=doc.metadata))
+
+    return compressed, stats
+
+
+def _citation(doc: Document, pages: List[str]) -> str:
+    """来源 + 页码引用标记, 如 "[来源: manual.md 第12-13页]" """
+    source = str(doc.metadata.get("source") or "")
+    name = source.replace("\\", "/").rsplit("/", 1)[-1]
+    if not name and not pages:
+        return ""
+    page_text = ""
+    if pages:
+        page_text = f" 第{pages[0]}页" if len(pages) == 1 else f" 第{pages[0]}-{pages[-1]}页"
+    return f"[来源: {name}{page_text}]"
+
+
+SENTENCE_VECTOR_CACHE = SentenceVectorCache(max_size=settings.COMPRESSION_CACHE_SIZE)
+
+
+async def compress_context(
+    documents: List[Document],
+    query_vector: List[float],
+    embeddings: Any,
+    kb_label: str,
+) -> Tuple[List[Document], CompressionStats]:
+    """按配置压缩上下文, 并记录耗时与节省的 token 数"""
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="context_compression"):
+        compressed, stats = await compress_documents(
+            documents,
+            query_vector,
+            embeddings,
+            SENTENCE_VECTOR_CACHE,
+            keep_ratio=settings.COMPRESSION_KEEP_RATIO,
+            min_sentences=settings.COMPRESSION_MIN_SENTENCES,
+        )
+    CONTEXT_TOKENS_SAVED.observe(max(stats.tokens_saved, 0), kb_id=kb_label)
+    return compressed, stats
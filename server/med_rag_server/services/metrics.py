@@ -0,0 +1,191 @@
+"""
+进程内指标采集（Prometheus 文本格式导出）.
+
+只实现 histogram 一种指标类型, 足以覆盖各阶段的耗时分布。
+指标保存在当前 worker 进程内, 多 worker 部署时需按实例分别抓取。
+"""
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, TypeVar
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+T = TypeVar("T")
+
+
+def _escape_label_value(value: str) -> str:
+    """按 Prometheus 文本格式转义标签值"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """带标签的 histogram（线程安全）"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # 标签值元组 -> (各桶计数, 总和, 总数)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def _label_values(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} 需要标签 {self.labelnames}, 实际为 {tuple(labels)}",
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        """记录一次观测值"""
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[key] = series
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """上下文管理器：记录代码块耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self) -> List[str]:
+        """生成该指标的文本格式行"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = [
+                (key, list(series[0]), series[1], series[2])
+                for key, series in sorted(self._series.items())
+            ]
+        for key, bucket_counts, total, count in snapshot:
+            base_labels = [
+                f'{name}="{_escape_label_value(value)}"'
+                for name, value in zip(self.labelnames, key)
+            ]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = ",".join([*base_labels, f'le="{_format_value(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {cumulative}")
+            labels = ",".join([*base_labels, 'le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{labels}}} {count}")
+            suffix = "{" + ",".join(base_labels) + "}" if base_labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+    def clear(self) -> None:
+        """清空已采集的数据"""
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Histogram] = {}
+
+    def register(self, metric: Histogram) -> Histogram:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标重复注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式导出全部指标"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+SEARCH_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "med_rag_search_stage_seconds",
+        "检索问答各阶段耗时（秒）",
+        ["kb_id", "stage"],
+    ),
+)
+
+DB_QUERY_SECONDS = REGISTRY.register(
+    Histogram(
+        "med_rag_db_query_seconds",
+        "DAO 查询耗时（秒）",
+        ["dao", "operation"],
+    ),
+)
+
+PREFECT_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "med_rag_prefect_request_seconds",
+        "Prefect API 调用耗时（秒）",
+        ["operation"],
+    ),
+)
+
+CONTEXT_TOKENS_SAVED = REGISTRY.register(
+    Histogram(
+        "med_rag_context_tokens_saved",
+        "上下文压缩节省的 token 数（估算）",
+        ["kb_id"],
+        buckets=(0, 50, 100, 250, 500, 1000, 2000, 4000, 8000),
+    ),
+)
+
+
+def instrument_dao(dao_name: str) -> Callable[[T], T]:
+    """类装饰器：为 DAO 的全部公开协程方法记录查询耗时"""
+
+    def _wrap(method: Callable[..., Any], operation: str) -> Callable[..., Any]:
+        @functools.wraps(method)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with DB_QUERY_SECONDS.time(dao=dao_name, operation=operation):
+                return await method(*args, **kwargs)
+
+        return wrapper
+
+    def decorator(cls: T) -> T:
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.iscoroutinefunction(value):
+                continue
+            setattr(cls, attr, _wrap(value, attr))
+        return cls
+
+    return decorator
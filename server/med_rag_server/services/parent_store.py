@@ -0,0 +1,68 @@
+"""
+父子分块检索（small-to-big）.
+
+入库时子段落用于向量匹配, 父段落（按标题路径切分的章节）写入向量存储目录下的
+parents.json。回答时把命中的子段落换成去重后的父段落, 并按字符预算截断。
+"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+PARENT_STORE_FILENAME = "parents.json"
+
+
+def load_parent_store(vector_path: str) -> Optional[Dict[str, Dict]]:
+    """加载父段落存储, 旧版向量存储（无 parents.json）返回 None"""
+    parent_path = os.path.join(vector_path, PARENT_STORE_FILENAME)
+    if not os.path.exists(parent_path):
+        return None
+    with open(parent_path, "r", encoding="utf-8") as f:
+        parent_store = json.load(f)
+    logger.info(f"加载父段落存储: {parent_path}（{len(parent_store)} 个）")
+    return parent_store
+
+
+def expand_to_parents(
+    documents: List[Document],
+    parent_store: Optional[Dict[str, Dict]],
+    max_parent_chars: int,
+    max_total_chars: int,
+) -> List[Document]:
+    """
+    子段落 -> 父段落.
+
+    按子段落排名顺序替换为父段落并去重; 父段落超过 max_parent_chars 时保留子段落本身,
+    累计超过 max_total_chars 后停止追加（至少保留一个）。
+    """
+    if not parent_store:
+        return documents
+
+    expanded: List[Document] = []
+    seen = set()
+    total_chars = 0
+    for doc in documents:
+        parent_id = doc.metadata.get("parent_id")
+        parent = parent_store.get(parent_id) if parent_id else None
+        if parent is not None and len(parent["content"]) <= max_parent_chars:
+            if parent_id in seen:
+                continue
+            candidate = Document(
+                page_content=parent["content"],
+                metadata={**doc.metadata, "header_path": parent.get("header_path")},
+            )
+        else:
+            parent_id = None
+            candidate = doc
+
+        if expanded and total_chars + len(candidate.page_content) > max_total_chars:
+            break
+        if parent_id:
+            seen.add(parent_id)
+        expanded.append(candidate)
+        total_chars += len(candidate.page_content)
+    return expanded
@@ -0,0 +1,45 @@
+"""
+入库处理进度.
+
+处理流程按调度顺序（短作业优先等）处理PDF, 每完成一个文件上报一次进度快照, 其中包含
+每个文件的状态与预计完成秒数。服务端按知识库保存最近一次快照, 查询时按上报后经过的
+时间递减 ETA, 两次上报之间轮询也能看到倒计时。
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+PENDING_STATUSES = ("queued", "running")
+
+
+def record_progress(
+    progress_store: Dict[int, Dict[str, Any]],
+    kb_id: int,
+    progress: Dict[str, Any],
+    received_at: Optional[datetime] = None,
+) -> None:
+    """保存知识库的最新进度快照（覆盖上一次）"""
+    progress_store[kb_id] = {"progress": progress, "received_at": received_at or datetime.now()}
+
+
+def current_progress(
+    progress_store: Dict[int, Dict[str, Any]],
+    kb_id: int,
+    now: Optional[datetime] = None,
+) -> Optional[Dict[str, Any]]:
+    """最新进度, 未完成文件与整体的 ETA 扣除上报后经过的时间（不低于 0）, 无记录返回 None"""
+    entry = progress_store.get(kb_id)
+    if entry is None:
+        return None
+    elapsed = ((now or datetime.now()) - entry["received_at"]).total_seconds()
+
+    def _age(eta: Optional[float]) -> Optional[float]:
+        return None if eta is None else round(max(0.0, eta - elapsed), 1)
+
+    progress = dict(entry["progress"])
+    progress["files"] = [
+        {**item, "eta_seconds": _age(item.get("eta_seconds"))}
+        if item.get("status") in PENDING_STATUSES else item
+        for item in progress.get("files", [])
+    ]
+    progress["eta_seconds"] = _age(progress.get("eta_seconds"))
+    return progress
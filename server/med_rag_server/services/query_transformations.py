@@ -0,0 +1,224 @@
+"""
+查询变换（多查询检索）.
+
+由 med-rag-flow/tasks/query_transformations.py 中的同步实现移植为异步版本:
+改写 / 回溯(step-back) / 分解 / HyDE 假设文档。多个变换并发执行,
+每个变换的输出按 (变换, 模型, 规范化查询) 缓存, 重复问题不再调用 LLM。
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from med_rag_server.settings import settings
+
+logger = logging.getLogger(__name__)
+
+REWRITE_TEMPLATE = """你是一名人工智能助手，负责改写用户查询以改进检索增强生成（RAG）系统中的信息检索。给定原始查询，将其改写得更具体、详细，且更有可能检索到相关信息：
+
+原始查询：{original_query}
+
+直接输出改写后的查询，不要有解释性文字。
+"""
+
+STEP_BACK_TEMPLATE = """你是一个人工智能助手，负责生成更宽泛、更通用的广义查询语句，以提高检索增强生成（RAG）系统中的上下文检索能力。
+给定原始查询语句，生成一个广义查询语句，该语句应更宽泛，且有助于检索相关背景信息。
+
+原始查询语句：{original_query}
+
+直接输出广义查询语句。
+"""
+
+DECOMPOSE_TEMPLATE = """作为信息检索专家，请将复杂查询分解为2-4个原子子查询：
+
+原始查询：{original_query}
+
+示例：
+输入：气候变化对环境的影响有哪些？
+输出：
+1. 气候变化如何影响生物多样性？
+2. 海洋系统受到气候变化的哪些影响？
+3. 气候变化对农业生产的具体作用机制？
+4. 极端天气事件与全球变暖的关联性如何？
+
+请为以下查询生成子查询："""
+
+HYDE_TEMPLATE = """基于以下问题生成技术文档用于RAG系统的Hyde：
+根据问题：{original_query}
+生成一份直接回答该问题的假设性文档。该文档应详细且深入。
+文档大小约{text_length}个字符，直接输出假设的文档，不要有其他解释性文字
+"""
+
+
+def clean_response(text: str) -> str:
+    """去除 <think> 推理段与多余空行"""
+    cleaned = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+    return re.sub(r"\n\s*\n", "\n", cleaned).strip()
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询（缓存键）：折叠空白、统一大小写、去除句末标点"""
+    normalized = " ".join(query.split()).casefold()
+    return normalized.rstrip("?？。.!！ ")
+
+
+async def rewrite_query(llm: Any, query: str) -> List[str]:
+    """查询改写"""
+    response = await llm.ainvoke(REWRITE_TEMPLATE.format(original_query=query))
+    rewritten = clean_response(response)
+    return [rewritten] if rewritten else []
+
+
+async def generate_step_back_query(llm: Any, query: str) -> List[str]:
+    """回溯查询（更宽泛的背景问题）"""
+    response = await llm.ainvoke(STEP_BACK_TEMPLATE.format(original_query=query))
+    broader = clean_response(response)
+    return [broader] if broader else []
+
+
+async def decompose_query(llm: Any, query: str) -> List[str]:
+    """查询分解为子查询"""
+    response = await llm.ainvoke(DECOMPOSE_TEMPLATE.format(original_query=query))
+    sub_queries = re.findall(r"\d+[\.、]?\s*(.+?)(?=\n|$)", clean_response(response))
+    return [q.strip() for q in sub_queries if len(q.strip()) > 5]
+
+
+async def generate_hypothetical_doc(
+    llm: Any,
+    query: str,
+    text_length: int = 500,
+) -> List[str]:
+    """HyDE 假设文档"""
+    response = await llm.ainvoke(
+        HYDE_TEMPLATE.format(original_query=query, text_length=text_length),
+    )
+    document = clean_response(response)
+    return [document] if document else []
+
+
+TRANSFORMATIONS: Dict[str, Callable[[Any, str], Awaitable[List[str]]]] = {
+    "rewrite": rewrite_query,
+    "step_back": generate_step_back_query,
+    "decompose": decompose_query,
+    "hyde": generate_hypothetical_doc,
+}
+
+
+class TransformationCache:
+    """
+    变换结果缓存（LRU + TTL）.
+
+    同一键的并发请求共享同一次 LLM 调用, 失败结果不入缓存。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[float, List[str]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, ...], "asyncio.Future[List[str]]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, ...]) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if self.ttl and time.monotonic() - created > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Tuple[str, ...], value: List[str]) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Tuple[str, ...],
+        compute: Callable[[], Awaitable[List[str]]],
+    ) -> List[str]:
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return list(cached)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return list(await asyncio.shield(inflight))
+
+        self.misses += 1
+        future: "asyncio.Future[List[str]]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有等待者时避免 "exception was never retrieved" 警告
+                future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return list(value)
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+async def expand_query(
+    llm: Any,
+    query: str,
+    transformations: Sequence[str],
+    cache: TransformationCache,
+    model_name: str = "",
+    timeout: Optional[float] = None,
+) -> Dict[str, List[str]]:
+    """
+    并发执行所选变换, 返回 {变换名: 生成的查询列表}.
+
+    单个变换失败或超时只记录日志并跳过, 不影响其余变换与原始查询检索。
+    """
+    unknown = [name for name in transformations if name not in TRANSFORMATIONS]
+    if unknown:
+        raise ValueError(f"未知查询变换: {unknown}")
+
+    normalized = normalize_query(query)
+    names = list(dict.fromkeys(transformations))
+
+    async def run(name: str) -> List[str]:
+        def compute() -> Awaitable[List[str]]:
+            return asyncio.wait_for(TRANSFORMATIONS[name](llm, query), timeout)
+
+        return await cache.get_or_compute((name, model_name, normalized), compute)
+
+    results = await asyncio.gather(*(run(name) for name in names), return_exceptions=True)
+
+    expanded: Dict[str, List[str]] = {}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"查询变换 {name} 失败: {result!r}")
+            continue
+        expanded[name] = result
+    return expanded
+
+
+TRANSFORMATION_CACHE = TransformationCache(
+    max_size=settings.QUERY_TRANSFORM_CACHE_SIZE,
+    ttl=settings.QUERY_TRANSFORM_CACHE_TTL,
+)
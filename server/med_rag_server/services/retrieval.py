@@ -0,0 +1,274 @@
+"""
+检索问答流程拆分.
+
+把 RetrievalQA 内部的 向量化 -> 检索 -> 拼装提示词 拆成独立步骤,
+便于分阶段计时, 也便于批量/多查询等场景复用同一套检索逻辑。
+"""
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+from langchain_core.documents import Document
+from langchain_core.prompts import format_document
+
+from med_rag_server.services.metrics import SEARCH_STAGE_SECONDS
+from med_rag_server.services.query_transformations import (
+    TRANSFORMATION_CACHE,
+    expand_query,
+)
+from med_rag_server.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# 假设问题子索引目录名（与 med-rag-flow 入库逻辑保持一致）
+QUESTION_INDEX_DIRNAME = "questions"
+
+
+def get_vectorstore(qa_chain: Any) -> FAISS:
+    """从问答链中取出向量存储"""
+    return qa_chain.retriever.vectorstore
+
+
+def get_search_params(qa_chain: Any) -> Tuple[int, Optional[float]]:
+    """从问答链的检索器配置中取出 (k, score_threshold)"""
+    search_kwargs = qa_chain.retriever.search_kwargs
+    return search_kwargs.get("k", 4), search_kwargs.get("score_threshold")
+
+
+async def embed_query(vectorstore: FAISS, question: str) -> List[float]:
+    """问题向量化"""
+    return await vectorstore.embeddings.aembed_query(question)
+
+
+async def embed_queries(vectorstore: FAISS, questions: List[str]) -> List[List[float]]:
+    """批量向量化（一次嵌入请求）"""
+    return await vectorstore.embeddings.aembed_documents(questions)
+
+
+def search_by_vectors(
+    vectorstore: FAISS,
+    embeddings: List[List[float]],
+    k: int,
+    score_threshold: Optional[float] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    矩阵检索：一次 FAISS search 处理全部查询向量.
+
+    与 similarity_score_threshold 检索方式保持一致：
+    距离先经向量存储的相关度函数换算, 再按阈值过滤。
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectorstore._normalize_L2:
+        dependable_faiss_import().normalize_L2(vectors)
+    distances, indices = vectorstore.index.search(vectors, k)
+    relevance_fn = vectorstore._select_relevance_score_fn()
+
+    results: List[List[Tuple[Document, float]]] = []
+    for row_distances, row_indices in zip(distances, indices):
+        scored = []
+        for distance, index in zip(row_distances, row_indices):
+            if index == -1:
+                continue
+            doc_id = vectorstore.index_to_docstore_id[int(index)]
+            doc = vectorstore.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                continue
+            score = relevance_fn(float(distance))
+            if score_threshold is None or score >= score_threshold:
+                scored.append((doc, score))
+        results.append(scored)
+    return results
+
+
+def load_question_store(vector_path: str, embeddings: Any) -> Optional[FAISS]:
+    """加载假设问题子索引, 未构建时返回 None"""
+    question_path = os.path.join(vector_path, QUESTION_INDEX_DIRNAME)
+    if not os.path.isdir(question_path):
+        return None
+    question_store = FAISS.load_local(
+        folder_path=question_path,
+        embeddings=embeddings,
+        allow_dangerous_deserialization=True,
+    )
+    logger.info(f"加载假设问题索引: {question_path}（{question_store.index.ntotal} 条）")
+    return question_store
+
+
+def search_questions(
+    question_store: FAISS,
+    vectorstore: FAISS,
+    embeddings: List[List[float]],
+    k: int,
+    score_threshold: Optional[float] = None,
+) -> List[List[Tuple[Document, float]]]:
+    """
+    问题-问题匹配：在问题子索引中检索, 按 chunk_id 映射回主索引分块.
+
+    同一分块的多个问题命中时只保留最高分, 每个查询最多返回 k 个分块。
+    """
+    rows = search_by_vectors(question_store, embeddings, k * 3, score_threshold)
+    results: List[List[Tuple[Document, float]]] = []
+    for row in rows:
+        chunks: List[Tuple[Document, float]] = []
+        seen = set()
+        for question, score in row:
+            chunk_id = question.metadata.get("chunk_id")
+            if chunk_id in seen:
+                continue
+            doc = vectorstore.docstore.search(chunk_id)
+            if not isinstance(doc, Document):
+                continue
+            seen.add(chunk_id)
+            chunks.append((doc, score))
+            if len(chunks) >= k:
+                break
+        results.append(chunks)
+    return results
+
+
+def search_by_vector(
+    vectorstore: FAISS,
+    embedding: List[float],
+    k: int,
+    score_threshold: Optional[float] = None,
+) -> List[Tuple[Document, float]]:
+    """单个向量检索"""
+    return search_by_vectors(vectorstore, [embedding], k, score_threshold)[0]
+
+
+async def retrieve_documents(
+    qa_chain: Any,
+    question: str,
+    kb_label: str,
+    question_store: Optional[FAISS] = None,
+) -> Tuple[List[Document], List[float]]:
+    """
+    执行检索（分别记录向量化与向量检索耗时）, 有问题子索引时合并其结果.
+
+    Returns:
+        (文档列表, 查询向量) —— 查询向量供后续阶段（如上下文压缩）复用
+    """
+    vectorstore = get_vectorstore(qa_chain)
+    k, score_threshold = get_search_params(qa_chain)
+
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="query_embedding"):
+        embedding = await embed_query(vectorstore, question)
+
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="vector_search"):
+        scored = search_by_vector(vectorstore, embedding, k, score_threshold)
+
+    if question_store is not None:
+        scored = merge_question_hits(
+            question_store, vectorstore, [embedding], [scored], k, score_threshold, kb_label,
+        )[0]
+
+    return [doc for doc, _ in scored], embedding
+
+
+def merge_question_hits(
+    question_store: FAISS,
+    vectorstore: FAISS,
+    embeddings: List[List[float]],
+    scored_rows: List[List[Tuple[Document, float]]],
+    k: int,
+    score_threshold: Optional[float],
+    kb_label: str,
+) -> List[List[Tuple[Document, float]]]:
+    """复用查询向量检索问题子索引, 与分块检索结果逐行 RRF 融合（分数保留原始相似度）"""
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="question_search"):
+        question_rows = search_questions(
+            question_store, vectorstore, embeddings, k, score_threshold,
+        )
+    return [
+        fuse_results([chunk_hits, question_hits], top_n=k, rrf_k=settings.RRF_K)
+        for chunk_hits, question_hits in zip(scored_rows, question_rows)
+    ]
+
+
+def _document_key(doc: Document) -> str:
+    """文档去重键（来源 + 内容摘要）"""
+    digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+    return f"{doc.metadata.get('source', '')}:{digest}"
+
+
+def fuse_results(
+    ranked_lists: Sequence[List[Tuple[Document, float]]],
+    top_n: int,
+    rrf_k: int = 60,
+) -> List[Tuple[Document, float]]:
+    """
+    倒数排名融合（RRF）：按 Σ 1 / (rrf_k + rank) 排序.
+
+    返回的分数仍是文档在各列表中的最高相似度, 与单路检索的分数含义一致。
+    """
+    fused: Dict[str, List[Any]] = {}
+    for ranked in ranked_lists:
+        for rank, (doc, score) in enumerate(ranked, start=1):
+            key = _document_key(doc)
+            entry = fused.setdefault(key, [doc, 0.0, score])
+            entry[1] += 1.0 / (rrf_k + rank)
+            entry[2] = max(entry[2], score)
+    ordered = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)
+    return [(doc, similarity) for doc, _, similarity in ordered[:top_n]]
+
+
+async def retrieve_documents_multi(
+    qa_chain: Any,
+    question: str,
+    kb_label: str,
+    llm: Any,
+    transformations: Sequence[str],
+    question_store: Optional[FAISS] = None,
+) -> Tuple[List[Document], Dict[str, List[str]], List[float]]:
+    """
+    多查询检索：并发生成查询变体, 一次批量向量化与矩阵检索, 再做 RRF 融合.
+
+    Returns:
+        (融合后的文档列表, {变换名: 变体查询列表}, 原始问题的查询向量)
+    """
+    vectorstore = get_vectorstore(qa_chain)
+    k, score_threshold = get_search_params(qa_chain)
+
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="query_transformation"):
+        variants = await expand_query(
+            llm,
+            question,
+            transformations,
+            TRANSFORMATION_CACHE,
+            model_name=settings.QUERY_TRANSFORM_MODEL,
+            timeout=settings.QUERY_TRANSFORM_TIMEOUT,
+        )
+
+    queries = [question]
+    for generated in variants.values():
+        queries.extend(q for q in generated if q not in queries)
+
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="query_embedding"):
+        embeddings = await embed_queries(vectorstore, queries)
+
+    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="vector_search"):
+        scored_rows = search_by_vectors(vectorstore, embeddings, k, score_threshold)
+
+    if question_store is not None:
+        with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="question_search"):
+            scored_rows += search_questions(
+                question_store, vectorstore, embeddings, k, score_threshold,
+            )
+
+    fused = fuse_results(scored_rows, top_n=k, rrf_k=settings.RRF_K)
+    return [doc for doc, _ in fused], variants, embeddings[0]
+
+
+def build_prompt(qa_chain: Any, question: str, documents: List[Document]) -> str:
+    """按问答链的 stuff 方式拼装最终提示词"""
+    combine_chain = qa_chain.combine_documents_chain
+    context = combine_chain.document_separator.join(
+        format_document(doc, combine_chain.document_prompt) for doc in documents
+    )
+    return combine_chain.llm_chain.prompt.format(
+        **{combine_chain.document_variable_name: context, "question": question},
+    )
@@ -52,6 +52,27 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 1024 * 1024 * 100 * 2
     
     MODELSNAME: str = "bge-m3:latest"
+
+    # 批量问答配置
+    BATCH_QUERY_MAX_QUESTIONS: int = 500
+    BATCH_QUERY_MAX_CONCURRENCY: int = 8
+
+    # 多查询检索（查询变换）配置
+    OLLAMA_BASE_URL: str = "http://host.docker.internal:11434"
+    QUERY_TRANSFORM_MODEL: str = "deepseek-r1:8b"
+    QUERY_TRANSFORM_TIMEOUT: float = 30.0
+    QUERY_TRANSFORM_CACHE_SIZE: int = 1024
+    QUERY_TRANSFORM_CACHE_TTL: float = 3600.0
+    RRF_K: int = 60
+
+    # 父子分块检索：单个父段落与全部上下文的字符上限
+    PARENT_MAX_CHARS: int = 3000
+    PARENT_CONTEXT_MAX_CHARS: int = 6000
+
+    # 上下文压缩：每个片段保留的候选句比例与下限、句子向量缓存条数
+    COMPRESSION_KEEP_RATIO: float = 0.5
+    COMPRESSION_MIN_SENTENCES: int = 2
+    COMPRESSION_CACHE_SIZE: int = 20000
     
     # Prefect 配置
     PREFECT_API_URL: str = "http://prefect-server:4200/api"
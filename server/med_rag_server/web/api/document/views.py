@@ -5,6 +5,7 @@ from enum import Enum
 import json
 from logging import getLogger
 import logging
+import time
 import traceback
 from fastapi import APIRouter, BackgroundTasks, Form, HTTPException, Depends, Request, status, Path, UploadFile, File
 from typing import Any, Dict, List, Optional
@@ -12,6 +13,20 @@ import httpx
 from pydantic import BaseModel, Field
 from med_rag_server.settings import settings
 from med_rag_server.db.dao.document_dao import DocumentDAO
+from med_rag_server.services.compression import compress_context
+from med_rag_server.services.metrics import SEARCH_STAGE_SECONDS
+from med_rag_server.services.retrieval import (
+    build_prompt,
+    embed_queries,
+    get_search_params,
+    get_vectorstore,
+    merge_question_hits,
+    retrieve_documents,
+    retrieve_documents_multi,
+    search_by_vectors,
+)
+from med_rag_server.services.parent_store import expand_to_parents
+from med_rag_server.services.query_transformations import TRANSFORMATIONS
 from med_rag_server.tasks import process_document_task
 from med_rag_server.web.api.document.schema import (
     AsyncTaskResponse,
@@ -37,6 +52,11 @@ class MedicalQuery(BaseModel):
     language: str = "zh"
     require_references: bool = True
     safety_warnings: bool = True
+    transformations: List[str] = Field(
+        default_factory=list,
+        description="多查询检索使用的查询变换（rewrite/step_back/decompose/hyde），为空则单查询检索",
+    )
+    compress_context: bool = Field(False, description="生成前按句子压缩检索上下文")
 
 class MedicalResponse(BaseModel):
     answer: str
@@ -44,6 +64,28 @@ class MedicalResponse(BaseModel):
     timestamp: datetime
     search_metadata: Dict
 
+class MedicalBatchQuery(BaseModel):
+    kb_id: int = Field(..., description="要查询的知识库ID")
+    questions: List[str] = Field(..., min_length=1, description="问题列表")
+    max_concurrency: int = Field(4, ge=1, description="生成阶段的最大并发数")
+    require_references: bool = True
+    compress_context: bool = Field(False, description="生成前按句子压缩检索上下文")
+
+class MedicalBatchItem(BaseModel):
+    index: int
+    question: str
+    answer: Optional[str] = None
+    references: List[Dict] = []
+    error: Optional[str] = None
+    compression: Optional[Dict[str, int]] = None  # 上下文压缩统计
+    timings: Dict[str, float]  # 单条耗时（秒）
+
+class MedicalBatchResponse(BaseModel):
+    kb_id: int
+    items: List[MedicalBatchItem]
+    timestamp: datetime
+    timings: Dict[str, float]  # 批量阶段耗时（秒）
+
 MEDICAL_PROMPT_TEMPLATE = """
 [角色设定]
 您是认证的医疗设备专家，需严格依据医疗文档回答。
@@ -62,16 +104,10 @@ MEDICAL_PROMPT_TEMPLATE = """
 """
 
 from fastapi.responses import StreamingResponse
-from langchain.callbacks import AsyncIteratorCallbackHandler
-
-
-from langchain.callbacks import AsyncIteratorCallbackHandler
-from fastapi.responses import StreamingResponse
-import json
 
 @router.post("/medical-search-stream")
 async def medical_rag_search_stream(request: Request, query: MedicalQuery):
-    """修正版流式医疗RAG接口"""
+    """修正版流式医疗RAG接口（分阶段计时）"""
     try:
         qa_chain = request.app.state.qa_chains.get(query.kb_id)
         if not qa_chain:
@@ -80,42 +116,91 @@ async def medical_rag_search_stream(request: Request, query: MedicalQuery):
                 detail=f"知识库 {query.kb_id} 的问答系统未初始化"
             )
 
-        callback = AsyncIteratorCallbackHandler()
-        
+        unknown = [name for name in query.transformations if name not in TRANSFORMATIONS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"未知查询变换: {unknown}，可选: {list(TRANSFORMATIONS)}"
+            )
+
+        llm = request.app.state.llm
+        kb_label = str(query.kb_id)
+        parent_store = getattr(request.app.state, "parent_stores", {}).get(query.kb_id)
+        question_store = getattr(request.app.state, "question_stores", {}).get(query.kb_id)
+
         async def event_stream():
             try:
-                # 异步任务包装（修正事件触发机制）
-                async def wrap_done(future):
-                    try:
-                        await future
-                    except Exception as e:
-                        callback.done.set()
-                    finally:
-                        callback.done.set()
-
-                task = asyncio.create_task(
-                    qa_chain.acall(
-                        {"query": query.question},
-                        callbacks=[callback]
+                # 检索阶段（向量化 + 向量检索）
+                if query.transformations:
+                    # 多查询检索：变体并发生成 + 批量检索 + 融合
+                    documents, variants, query_vector = await retrieve_documents_multi(
+                        qa_chain,
+                        query.question,
+                        kb_label,
+                        request.app.state.transform_llm,
+                        query.transformations,
+                        question_store=question_store,
+                    )
+                    yield (
+                        f"event: queries\n"
+                        f"data: {json.dumps({'variants': variants}, ensure_ascii=False)}\n\n"
+                    )
+                else:
+                    documents, query_vector = await retrieve_documents(
+                        qa_chain, query.question, kb_label, question_store=question_store,
                     )
-                )
-
-                # 启动异步监控
-                asyncio.create_task(wrap_done(task))
-
-                # 流式传输（兼容Event机制）
-                async for token in callback.aiter():
-                    yield f"event: data\ndata: {json.dumps({'delta': token}, ensure_ascii=False)}\n\n"
 
-                # 添加参考文献处理逻辑
-                if task.done() and not task.exception():
-                    result = task.result()
-                    sources = [doc.metadata.get('source') for doc in result.get('source_documents', [])]
+                # 父子分块：子段落替换为去重后的父段落
+                if parent_store:
+                    with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="parent_expansion"):
+                        documents = expand_to_parents(
+                            documents,
+                            parent_store,
+                            settings.PARENT_MAX_CHARS,
+                            settings.PARENT_CONTEXT_MAX_CHARS,
+                        )
+
+                # 上下文压缩（复用查询向量）
+                if query.compress_context and documents:
+                    documents, stats = await compress_context(
+                        documents,
+                        query_vector,
+                        get_vectorstore(qa_chain).embeddings,
+                        kb_label,
+                    )
                     yield (
-                        f"event: references\n"
-                        f"data: {json.dumps({'sources': sources}, ensure_ascii=False)}\n\n"
+                        f"event: compression\n"
+                        f"data: {json.dumps(stats.as_dict(), ensure_ascii=False)}\n\n"
                     )
 
+                # 提示词拼装
+                with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="prompt_assembly"):
+                    prompt_text = build_prompt(qa_chain, query.question, documents)
+
+                # 流式生成（首 token 耗时 + 总生成耗时）
+                generation_start = time.perf_counter()
+                first_token_seen = False
+                async for token in llm.astream(prompt_text):
+                    if not first_token_seen:
+                        first_token_seen = True
+                        SEARCH_STAGE_SECONDS.observe(
+                            time.perf_counter() - generation_start,
+                            kb_id=kb_label,
+                            stage="time_to_first_token",
+                        )
+                    yield f"event: data\ndata: {json.dumps({'delta': token}, ensure_ascii=False)}\n\n"
+                SEARCH_STAGE_SECONDS.observe(
+                    time.perf_counter() - generation_start,
+                    kb_id=kb_label,
+                    stage="generation",
+                )
+
+                # 参考文献
+                sources = [doc.metadata.get('source') for doc in documents]
+                yield (
+                    f"event: references\n"
+                    f"data: {json.dumps({'sources': sources}, ensure_ascii=False)}\n\n"
+                )
 
             except HTTPException as he:
                 yield f"event: error\ndata: {json.dumps({'error': he.detail}, ensure_ascii=False)}\n\n"
@@ -123,8 +208,6 @@ async def medical_rag_search_stream(request: Request, query: MedicalQuery):
                 error_msg = f"数据流异常: {str(e)}"
                 logger.error(f"{error_msg}\n{traceback.format_exc()}")
                 yield f"event: error\ndata: {json.dumps({'error': error_msg}, ensure_ascii=False)}\n\n"
-            finally:
-                callback.done.set()
 
         return StreamingResponse(
             event_stream(),
@@ -141,6 +224,134 @@ async def medical_rag_search_stream(request: Request, query: MedicalQuery):
         logger.critical(f"接口严重错误: {str(e)}", exc_info=True)
         raise HTTPException(500, "系统处理失败") from e
 
+@router.post("/medical-search-batch", response_model=MedicalBatchResponse)
+async def medical_rag_search_batch(request: Request, query: MedicalBatchQuery):
+    """
+    批量医疗RAG接口（非流式，用于离线评测与批量FAQ生成）
+
+    问题一次性批量向量化并做矩阵检索，生成阶段按 max_concurrency 限流并发。
+    """
+    qa_chain = request.app.state.qa_chains.get(query.kb_id)
+    if not qa_chain:
+        raise HTTPException(
+            status_code=503,
+            detail=f"知识库 {query.kb_id} 的问答系统未初始化"
+        )
+    if len(query.questions) > settings.BATCH_QUERY_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"单次最多 {settings.BATCH_QUERY_MAX_QUESTIONS} 个问题"
+        )
+
+    llm = request.app.state.llm
+    kb_label = str(query.kb_id)
+    parent_store = getattr(request.app.state, "parent_stores", {}).get(query.kb_id)
+    question_store = getattr(request.app.state, "question_stores", {}).get(query.kb_id)
+    vectorstore = get_vectorstore(qa_chain)
+    k, score_threshold = get_search_params(qa_chain)
+    batch_start = time.perf_counter()
+
+    try:
+        # 阶段1: 批量向量化
+        with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="batch_query_embedding"):
+            embed_start = time.perf_counter()
+            embeddings = await embed_queries(vectorstore, query.questions)
+            embed_seconds = time.perf_counter() - embed_start
+
+        # 阶段2: 矩阵检索
+        with SEARCH_STAGE_SECONDS.time(kb_id=kb_label, stage="batch_vector_search"):
+            search_start = time.perf_counter()
+            scored_rows = search_by_vectors(vectorstore, embeddings, k, score_threshold)
+            if question_store is not None:
+                scored_rows = merge_question_hits(
+                    question_store, vectorstore, embeddings, scored_rows,
+                    k, score_threshold, kb_label,
+                )
+            search_seconds = time.perf_counter() - search_start
+    except Exception as e:
+        logger.error(f"批量检索失败: {str(e)}", exc_info=True)
+        raise HTTPException(500, f"批量检索失败: {str(e)}") from e
+
+    # 阶段3: 限流并发生成
+    semaphore = asyncio.Semaphore(
+        min(query.max_concurrency, settings.BATCH_QUERY_MAX_CONCURRENCY)
+    )
+
+    async def answer_one(
+        index: int,
+        question: str,
+        query_vector: List[float],
+        scored,
+    ) -> MedicalBatchItem:
+        item_start = time.perf_counter()
+        documents = expand_to_parents(
+            [doc for doc, _ in scored],
+            parent_store,
+            settings.PARENT_MAX_CHARS,
+            settings.PARENT_CONTEXT_MAX_CHARS,
+        )
+        references = [
+            {"source": doc.metadata.get("source"), "score": round(score, 4)}
+            for doc, score in scored
+        ] if query.require_references else []
+        compression = None
+        try:
+            async with semaphore:
+                wait_seconds = time.perf_counter() - item_start
+                if query.compress_context and documents:
+                    documents, stats = await compress_context(
+                        documents, query_vector, vectorstore.embeddings, kb_label,
+                    )
+                    compression = stats.as_dict()
+                prompt_start = time.perf_counter()
+                prompt_text = build_prompt(qa_chain, question, documents)
+                prompt_seconds = time.perf_counter() - prompt_start
+
+                generation_start = time.perf_counter()
+                answer = await llm.ainvoke(prompt_text)
+                generation_seconds = time.perf_counter() - generation_start
+            SEARCH_STAGE_SECONDS.observe(generation_seconds, kb_id=kb_label, stage="generation")
+            return MedicalBatchItem(
+                index=index,
+                question=question,
+                answer=answer,
+                references=references,
+                compression=compression,
+                timings={
+                    "queue_wait": round(wait_seconds, 4),
+                    "prompt_assembly": round(prompt_seconds, 4),
+                    "generation": round(generation_seconds, 4),
+                    "total": round(time.perf_counter() - item_start, 4),
+                },
+            )
+        except Exception as e:
+            logger.warning(f"批量问答第 {index} 条失败: {str(e)}")
+            return MedicalBatchItem(
+                index=index,
+                question=question,
+                references=references,
+                error=str(e),
+                timings={"total": round(time.perf_counter() - item_start, 4)},
+            )
+
+    items = await asyncio.gather(*(
+        answer_one(index, question, query_vector, scored)
+        for index, (question, query_vector, scored) in enumerate(
+            zip(query.questions, embeddings, scored_rows)
+        )
+    ))
+
+    return MedicalBatchResponse(
+        kb_id=query.kb_id,
+        items=list(items),
+        timestamp=datetime.now(),
+        timings={
+            "query_embedding": round(embed_seconds, 4),
+            "vector_search": round(search_seconds, 4),
+            "total": round(time.perf_counter() - batch_start, 4),
+        },
+    )
+
 class TaskStatus(str, Enum):
     PENDING = "pending"
     SUCCESS = "success"
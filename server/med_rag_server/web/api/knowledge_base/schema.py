@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional
+from typing import List, Optional
 
 class KnowledgeBaseDTO(BaseModel):
     """知识库响应结构"""
@@ -52,4 +52,28 @@ class VectorPathUpdateDTO(BaseModel):
 class PrefectDeploymentResponse(BaseModel):
     id: str
     name: str
-    status: str
\ No newline at end of file
+    status: str
+class FileProgressDTO(BaseModel):
+    """单个文件的处理进度"""
+    file: str
+    pages: int = 0
+    status: str = Field(..., description="queued / running / completed / failed")
+    etaSeconds: Optional[float] = Field(None, alias="eta_seconds")
+    seconds: Optional[float] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+class ProcessingProgressDTO(BaseModel):
+    """入库处理进度（由处理流程上报，ETA 按上报后经过的时间递减）"""
+    policy: str
+    totalFiles: int = Field(alias="total_files")
+    completedFiles: int = Field(0, alias="completed_files")
+    failedFiles: int = Field(0, alias="failed_files")
+    totalPages: int = Field(0, alias="total_pages")
+    completedPages: int = Field(0, alias="completed_pages")
+    pagesPerSec: Optional[float] = Field(None, alias="pages_per_sec")
+    etaSeconds: Optional[float] = Field(None, alias="eta_seconds")
+    files: List[FileProgressDTO] = []
+    updatedAt: Optional[datetime] = Field(None, alias="updated_at")
+
+    model_config = ConfigDict(populate_by_name=True)
@@ -11,9 +11,14 @@ from med_rag_server.web.api.knowledge_base.schema import (
     KnowledgeBaseDTO,
     KnowledgeBaseInputDTO,
     KnowledgeBaseUpdateDTO,
+    ProcessingProgressDTO,
     ProcessingStatusUpdateDTO,
     VectorPathUpdateDTO
 )
+from med_rag_server.services.metrics import PREFECT_REQUEST_SECONDS
+from med_rag_server.services.parent_store import load_parent_store
+from med_rag_server.services.processing_progress import current_progress, record_progress
+from med_rag_server.services.retrieval import load_question_store
 from med_rag_server.settings import settings
 from langchain_community.vectorstores import FAISS
 from langchain.prompts import PromptTemplate
@@ -33,10 +38,11 @@ async def get_prefect_deployment_id(deployment_name: str) -> str:
             
             print(api_path)
             
-            response = await client.get(
-                api_path,
-                timeout=15.0
-            )
+            with PREFECT_REQUEST_SECONDS.time(operation="get_deployment"):
+                response = await client.get(
+                    api_path,
+                    timeout=15.0
+                )
             
             if response.status_code != 200:
                 raise HTTPException(
@@ -87,23 +93,24 @@ async def trigger_document_processing(
 
         # 4. 调用 Prefect 运行接口
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.PREFECT_API_URL}/deployments/{deployment_id}/create_flow_run",
-                json={
-                    "parameters": processing_params,
-                    "state": {
-                        "type": "SCHEDULED",
-                        "message": "由 MedRAG 系统触发",
-                        "state_details": {}
+            with PREFECT_REQUEST_SECONDS.time(operation="create_flow_run"):
+                response = await client.post(
+                    f"{settings.PREFECT_API_URL}/deployments/{deployment_id}/create_flow_run",
+                    json={
+                        "parameters": processing_params,
+                        "state": {
+                            "type": "SCHEDULED",
+                            "message": "由 MedRAG 系统触发",
+                            "state_details": {}
+                        },
+                        "enforce_parameter_schema": True
                     },
-                    "enforce_parameter_schema": True
-                },
-                headers={
-                    # "Authorization": f"Bearer {settings.PREFECT_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                timeout=10.0
-            )
+                    headers={
+                        # "Authorization": f"Bearer {settings.PREFECT_API_KEY}",
+                        "Content-Type": "application/json"
+                    },
+                    timeout=10.0
+                )
 
             if response.status_code != 201:
                 raise HTTPException(
@@ -205,6 +212,8 @@ async def update_processing_status(
             
             # 存储到应用状态
             request.app.state.qa_chains[kb_id] = qa_chain
+            request.app.state.parent_stores[kb_id] = load_parent_store(vector_path)
+            request.app.state.question_stores[kb_id] = load_question_store(vector_path, embeddings)
             logger.info(f"Initialized QA chain for KB {kb_id}")
 
         except Exception as e:
@@ -231,6 +240,28 @@ async def update_vector_path(
         raise HTTPException(status_code=404, detail="Knowledge base not found")
     return kb
 
+@router.put("/{kb_id}/processing-progress", response_model=ProcessingProgressDTO)
+async def update_processing_progress(
+    kb_id: int,
+    request: Request,
+    data: ProcessingProgressDTO,
+):
+    """上报处理进度（处理流程每完成一个文件调用一次）"""
+    progress = data.model_dump(by_alias=True, mode="json")
+    record_progress(request.app.state.processing_progress, kb_id, progress)
+    return progress
+
+@router.get("/{kb_id}/processing-progress", response_model=ProcessingProgressDTO)
+async def get_processing_progress(
+    kb_id: int,
+    request: Request,
+):
+    """获取处理进度（每个文件的状态与预计完成秒数）"""
+    progress = current_progress(request.app.state.processing_progress, kb_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No processing progress for knowledge base")
+    return progress
+
 @router.get("/{kb_id}", response_model=KnowledgeBaseDTO)
 async def get_knowledge_base(
     kb_id: int,
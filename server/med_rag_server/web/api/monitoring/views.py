@@ -1,4 +1,7 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from med_rag_server.services.metrics import CONTENT_TYPE_LATEST, REGISTRY
 
 router = APIRouter()
 
@@ -10,3 +13,13 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/monitoring/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """
+    Exposes collected metrics in Prometheus text format.
+
+    Search stages are labelled per knowledge base (``kb_id``).
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
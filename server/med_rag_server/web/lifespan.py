@@ -16,7 +16,6 @@ from langchain_community.vectorstores import FAISS
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from tenacity import stop_after_attempt, wait_exponential
-from langchain.callbacks import AsyncIteratorCallbackHandler
 logger = logging.getLogger(__name__)
 
 
@@ -27,7 +26,6 @@ async def _get_llm() -> OllamaLLM:
         return OllamaLLM(
             model='deepseek-r1:8b',
             base_url='http://host.docker.internal:11434',
-            callbacks=[AsyncIteratorCallbackHandler()],
             streaming=True
         )
     
@@ -86,6 +84,12 @@ async def _create_tables() -> None:  # pragma: no cover
 async def _init_llm_async(app: FastAPI):
     app.state.llm = await _get_llm()  # ✅ 添加await
     logger.info(f"LLM模型 {settings.MODELSNAME} 初始化完成")
+    # 查询变换使用独立的非流式模型（可配置为更小的模型）
+    app.state.transform_llm = OllamaLLM(
+        model=settings.QUERY_TRANSFORM_MODEL,
+        base_url=settings.OLLAMA_BASE_URL,
+        temperature=0,
+    )
 
 @asynccontextmanager
 async def lifespan_setup(
@@ -109,6 +113,12 @@ async def lifespan_setup(
     
     # 初始化 QA Chains 字典
     app.state.qa_chains = {}
+    # 父子分块的父段落存储（按知识库）
+    app.state.parent_stores = {}
+    # 假设问题子索引（按知识库）
+    app.state.question_stores = {}
+    # 入库处理进度（按知识库，处理流程上报）
+    app.state.processing_progress = {}
             
     _setup_db(app)
     await _create_tables()
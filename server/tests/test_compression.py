@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.documents import Document
+
+from benchmarks.stubs import StubEmbeddings
+from med_rag_server.services.compression import (
+    SentenceVectorCache,
+    compress_documents,
+    estimate_tokens,
+    split_segments,
+)
+
+CHUNK = """---
+h1: 维护
+---
+
+<!--page-{12}-->
+## 探头清洁
+使用软布擦拭探头表面。不要使用含酒精的清洁剂。清洁后自然晾干。设备每年需要校准一次。
+| 部件 | 周期 |
+| --- | --- |
+| 探头 | 每日 |
+![探头示意图](http://127.0.0.1:9090/static/images/1/images_abc.jpg)
+<!--page-{13}-->
+断电后再进行清洁。"""
+
+
+def test_split_segments() -> None:
+    """Front matter and page markers are removed; tables, images and headers are kept."""
+    segments, pages = split_segments(CHUNK)
+
+    kept = [s.text for s in segments if s.keep]
+    sentences = [s.text for s in segments if not s.keep]
+    assert pages == ["12", "13"]
+    assert kept[0] == "## 探头清洁"
+    assert kept[1].startswith("| 部件 | 周期 |") and kept[1].endswith("| 探头 | 每日 |")
+    assert kept[2].startswith("![探头示意图]")
+    assert len(sentences) == 5
+    assert all("h1: 维护" not in text and text != "---" for text in kept + sentences)
+    assert all("<!--" not in text for text in kept + sentences)
+
+
+
+def test_split_segments_english() -> None:
+    """English sentences split on periods followed by whitespace; decimals stay whole."""
+    segments, _ = split_segments("Clean the probe. Do not use alcohol.\nLet it dry at 2.5 °C before use.")
+
+    assert [s.text for s in segments] == [
+        "Clean the probe.",
+        "Do not use alcohol.",
+        "Let it dry at 2.5 °C before use.",
+    ]
+
+
+@pytest.mark.anyio
+async def test_compress_documents() -> None:
+    """Top sentences are kept in order with a citation and tokens saved are reported."""
+    embeddings = StubEmbeddings()
+    doc = Document(page_content=CHUNK, metadata={"source": "/data/manual.md"})
+    query_vector = embeddings.embed_query("不要使用含酒精的清洁剂。")
+
+    compressed, stats = await compress_documents(
+        [doc], query_vector, embeddings, SentenceVectorCache(), keep_ratio=0.4, min_sentences=1,
+    )
+
+    content = compressed[0].page_content
+    assert content.startswith("[来源: manual.md 第12-13页]")
+    assert "不要使用含酒精的清洁剂。" in content
+    assert "| 探头 | 每日 |" in content and "![探头示意图]" in content
+    assert stats.sentences_total == 5 and stats.sentences_kept == 2
+    assert stats.tokens_saved == stats.tokens_before - estimate_tokens(content) > 0
+    assert compressed[0].metadata == doc.metadata
+
+
+@pytest.mark.anyio
+async def test_compress_documents_breaks_ties_by_position() -> None:
+    """Equal scores never keep more than keep_count sentences; earlier ones win."""
+    embeddings = StubEmbeddings()
+    doc = Document(page_content="清洁探头。清洁探头。清洁探头。清洁探头。", metadata={"source": "a.md"})
+    query_vector = embeddings.embed_query("清洁探头。")
+
+    compressed, stats = await compress_documents(
+        [doc], query_vector, embeddings, SentenceVectorCache(), keep_ratio=0.5, min_sentences=1,
+    )
+
+    assert stats.sentences_total == 4 and stats.sentences_kept == 2
+    assert compressed[0].page_content.count("清洁探头。") == 2
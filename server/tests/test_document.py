@@ -0,0 +1,41 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from langchain_community.vectorstores import FAISS
+from starlette import status
+
+from benchmarks.stubs import StubEmbeddings, StubStreamingLLM
+from med_rag_server.web.api.knowledge_base.views import create_qa_chain
+
+
+@pytest.mark.anyio
+async def test_medical_search_batch(fastapi_app: FastAPI, client: AsyncClient) -> None:
+    """
+    Tests batch answering with stub embedder and LLM.
+
+    :param fastapi_app: current application.
+    :param client: client for the app.
+    """
+    questions = ["除颤器使用前如何检查电极", "CT 扫描前的校准步骤"]
+    vectorstore = FAISS.from_texts(
+        questions,
+        StubEmbeddings(),
+        metadatas=[{"source": "a.md"}, {"source": "b.md"}],
+    )
+    llm = StubStreamingLLM(first_token_latency=0, token_latency=0, num_tokens=3)
+    fastapi_app.state.llm = llm
+    fastapi_app.state.qa_chains = {1: create_qa_chain(vectorstore=vectorstore, llm=llm)}
+
+    url = fastapi_app.url_path_for("medical_rag_search_batch")
+    response = await client.post(
+        url,
+        json={"kb_id": 1, "questions": questions, "max_concurrency": 2},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()["items"]
+    assert [item["index"] for item in items] == [0, 1]
+    assert items[0]["answer"] == "t0 t1 t2 "
+    assert items[0]["references"][0]["source"] == "a.md"
+    assert items[1]["references"][0]["source"] == "b.md"
+    assert "generation" in items[0]["timings"]
@@ -15,3 +15,18 @@ async def test_health(client: AsyncClient, fastapi_app: FastAPI) -> None:
     url = fastapi_app.url_path_for("health_check")
     response = await client.get(url)
     assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.anyio
+async def test_metrics(client: AsyncClient, fastapi_app: FastAPI) -> None:
+    """
+    Checks that the metrics endpoint exposes Prometheus text format.
+
+    :param client: client for the app.
+    :param fastapi_app: current FastAPI application.
+    """
+    url = fastapi_app.url_path_for("metrics")
+    response = await client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE med_rag_search_stage_seconds histogram" in response.text
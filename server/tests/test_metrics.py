@@ -0,0 +1,26 @@
+import pytest
+
+from med_rag_server.services.metrics import Histogram
+
+
+def test_histogram_render() -> None:
+    """Tests cumulative buckets, sum and count in the text output."""
+    histogram = Histogram("test_seconds", "test", ["kb_id"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, kb_id="1")
+    histogram.observe(0.5, kb_id="1")
+    histogram.observe(5, kb_id="1")
+
+    lines = histogram.collect()
+
+    assert 'test_seconds_bucket{kb_id="1",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{kb_id="1",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{kb_id="1",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{kb_id="1"} 5.55' in lines
+    assert 'test_seconds_count{kb_id="1"} 3' in lines
+
+
+def test_histogram_requires_all_labels() -> None:
+    """Tests that observations with missing labels are rejected."""
+    histogram = Histogram("test_seconds", "test", ["kb_id", "stage"])
+    with pytest.raises(ValueError):
+        histogram.observe(1.0, kb_id="1")
@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from med_rag_server.services.parent_store import (
+    PARENT_STORE_FILENAME,
+    expand_to_parents,
+    load_parent_store,
+)
+
+PARENT_STORE = {
+    "p1": {"source": "a.md", "header_path": "校准 > 探头", "content": "# 探头\n" + "甲" * 50},
+    "p2": {"source": "a.md", "header_path": "清洁", "content": "# 清洁\n" + "乙" * 50},
+    "big": {"source": "a.md", "header_path": "附录", "content": "丙" * 500},
+}
+
+
+def _child(parent_id: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"source": "a.md", "parent_id": parent_id})
+
+
+def test_load_parent_store(tmp_path: Path) -> None:
+    """parents.json is optional; older stores load as None."""
+    assert load_parent_store(str(tmp_path)) is None
+
+    (tmp_path / PARENT_STORE_FILENAME).write_text(json.dumps(PARENT_STORE), encoding="utf-8")
+    assert load_parent_store(str(tmp_path)) == PARENT_STORE
+
+
+def test_expand_to_parents_deduplicates() -> None:
+    """Children sharing a parent collapse into one parent passage, in rank order."""
+    children = [_child("p1", "c1"), _child("p2", "c2"), _child("p1", "c3")]
+
+    expanded = expand_to_parents(children, PARENT_STORE, 100, 1000)
+
+    assert [doc.metadata["header_path"] for doc in expanded] == ["校准 > 探头", "清洁"]
+    assert expanded[0].page_content == PARENT_STORE["p1"]["content"]
+
+
+def test_expand_to_parents_respects_limits() -> None:
+    """Oversized parents keep the child; the total budget stops expansion."""
+    children = [_child("big", "c1"), _child("big", "c2"), _child("p1", "c3")]
+
+    expanded = expand_to_parents(children, PARENT_STORE, 100, 6)
+
+    assert [doc.page_content for doc in expanded] == ["c1", "c2"]
+    assert expand_to_parents(children, None, 100, 6) == children
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from med_rag_server.services.processing_progress import current_progress, record_progress
+
+RECEIVED_AT = datetime(2024, 1, 1, 12, 0, 0)
+
+PROGRESS = {
+    "policy": "sjf",
+    "total_files": 3,
+    "completed_files": 1,
+    "eta_seconds": 100.0,
+    "files": [
+        {"file": "a.pdf", "pages": 2, "status": "completed", "eta_seconds": None, "seconds": 4.0},
+        {"file": "b.pdf", "pages": 10, "status": "running", "eta_seconds": 20.0, "seconds": None},
+        {"file": "c.pdf", "pages": 900, "status": "queued", "eta_seconds": 100.0, "seconds": None},
+    ],
+}
+
+
+def test_current_progress_missing() -> None:
+    """Knowledge bases without a report return None."""
+    assert current_progress({}, 1) is None
+
+
+def test_current_progress_ages_eta() -> None:
+    """Pending ETAs count down from the report time and never go negative."""
+    store: dict = {}
+    record_progress(store, 1, PROGRESS, received_at=RECEIVED_AT)
+
+    progress = current_progress(store, 1, now=RECEIVED_AT + timedelta(seconds=30))
+
+    assert progress is not None
+    assert [item["eta_seconds"] for item in progress["files"]] == [None, 0.0, 70.0]
+    assert progress["eta_seconds"] == 70.0
+    # 原始快照不被修改
+    assert store[1]["progress"]["files"][2]["eta_seconds"] == 100.0
+
+
+def test_record_progress_replaces_previous() -> None:
+    """A new report overwrites the previous snapshot."""
+    store: dict = {}
+    record_progress(store, 1, PROGRESS, received_at=RECEIVED_AT)
+    record_progress(store, 1, {**PROGRESS, "completed_files": 3, "eta_seconds": 0.0, "files": []})
+
+    progress = current_progress(store, 1)
+
+    assert progress is not None
+    assert progress["completed_files"] == 3
+    assert progress["eta_seconds"] == 0.0
@@ -0,0 +1,63 @@
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+
+from med_rag_server.services.query_transformations import (
+    TransformationCache,
+    expand_query,
+    normalize_query,
+)
+from med_rag_server.services.retrieval import fuse_results
+
+
+class CountingLLM:
+    """Records prompts and returns a canned answer."""
+
+    def __init__(self, answer: str) -> None:
+        self.answer = answer
+        self.prompts: List[str] = []
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.answer
+
+
+def test_normalize_query() -> None:
+    """Whitespace, case and trailing punctuation do not change the cache key."""
+    assert normalize_query("  CT  校准步骤？ ") == normalize_query("ct 校准步骤")
+
+
+@pytest.mark.anyio
+async def test_expand_query_uses_cache() -> None:
+    """Repeated questions are answered from cache without calling the LLM."""
+    llm = CountingLLM("<think>...</think>\n1. 探头如何校准\n2. 校准前需要哪些准备")
+    cache = TransformationCache()
+
+    first = await expand_query(llm, "探头怎么校准?", ["rewrite", "decompose"], cache)
+    second = await expand_query(llm, "探头怎么校准", ["rewrite", "decompose"], cache)
+
+    assert first == second
+    assert first["decompose"] == ["探头如何校准", "校准前需要哪些准备"]
+    assert len(llm.prompts) == 2
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.anyio
+async def test_expand_query_rejects_unknown() -> None:
+    """Unknown transformation names raise ValueError."""
+    with pytest.raises(ValueError):
+        await expand_query(CountingLLM(""), "q", ["unknown"], TransformationCache())
+
+
+def test_fuse_results() -> None:
+    """Documents found by several variants rank first and are deduplicated."""
+    a = Document(page_content="a", metadata={"source": "a.md"})
+    b = Document(page_content="b", metadata={"source": "b.md"})
+    c = Document(page_content="c", metadata={"source": "c.md"})
+
+    fused = fuse_results([[(a, 0.9), (b, 0.8)], [(b, 0.9), (c, 0.7)]], top_n=2)
+
+    assert [doc.page_content for doc, _ in fused] == ["b", "a"]
+    # 分数为各列表中的最高相似度, 而非 RRF 分数
+    assert [score for _, score in fused] == [0.9, 0.9]
@@ -0,0 +1,47 @@
+from langchain_community.vectorstores import FAISS
+
+from benchmarks.stubs import StubEmbeddings
+from med_rag_server.services.retrieval import (
+    merge_question_hits,
+    search_by_vectors,
+    search_questions,
+)
+
+
+def _stores():
+    embeddings = StubEmbeddings()
+    vectorstore = FAISS.from_texts(
+        ["探头校准步骤", "日常清洁方法"],
+        embeddings,
+        metadatas=[{"source": "a.md"}, {"source": "b.md"}],
+        ids=["c1", "c2"],
+    )
+    question_store = FAISS.from_texts(
+        ["如何清洁设备外壳", "清洁时用什么消毒剂"],
+        embeddings,
+        metadatas=[{"chunk_id": "c2"}, {"chunk_id": "c2"}],
+    )
+    return embeddings, vectorstore, question_store
+
+
+def test_search_questions_maps_to_chunks() -> None:
+    """Question hits map back to their chunk and are deduplicated."""
+    embeddings, vectorstore, question_store = _stores()
+    query = embeddings.embed_query("如何清洁设备外壳")
+
+    rows = search_questions(question_store, vectorstore, [query], k=2)
+
+    assert [doc.metadata["source"] for doc, _ in rows[0]] == ["b.md"]
+
+
+def test_merge_question_hits() -> None:
+    """Chunks matched only through questions are fused into the chunk results."""
+    embeddings, vectorstore, question_store = _stores()
+    query = embeddings.embed_query("如何清洁设备外壳")
+    chunk_rows = search_by_vectors(vectorstore, [query], k=1)
+
+    merged = merge_question_hits(
+        question_store, vectorstore, [query], chunk_rows, 2, None, "1",
+    )
+
+    assert "b.md" in {doc.metadata["source"] for doc, _ in merged[0]}